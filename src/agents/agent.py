@@ -1,9 +1,11 @@
 from abc import ABC, abstractmethod
 import numpy as np
-from copy import deepcopy
 import random
 
-from argumentation.classes import ArgumentationFramework, ValuebasedArgumentationFramework
+from argumentation.classes import ArgumentationFramework, ArgumentationFrameworkView, ValuebasedArgumentationFramework
+from argumentation.semantics import grounded_extension, grounded_mask
+from argumentation.policy import CompiledPolicy, compile_policy
+from argumentation.rules import ArgumentRules
 class Agent(ABC):
     """Abstract Agent class for RL agents
     """
@@ -130,6 +132,10 @@ class AAAgent(ABC):
         self.args_actions = args_actions
         self.observation_to_premises = observation_to_premises
         self.premises_to_arguments = premises_to_arguments
+        # (vaf, version, policy) of the last compiled policy.
+        self._policy = None
+        # Number of random actions taken because the grounded extension was empty (the only source of randomness).
+        self.n_random_actions = 0
         self.reset_memory()
 
     def select_action(self, obs) ->int:
@@ -147,6 +153,32 @@ class AAAgent(ABC):
         self.update_memory(obs, action)
         return action
     
+    def select_actions(self, obs_batch, memories: list = None) -> np.ndarray:
+        """Select an action for each observation in a batch, computing all the grounded extensions at once.
+        The memory of the agent is not updated: use update_memory if the actions are actually performed.
+
+        Args:
+            obs_batch (_type_): sequence of observations of the game.
+            memories (list, optional): memory to use with each observation (e.g., one per environment). Defaults to None (the agent's memory for all of them).
+
+        Returns:
+            np.ndarray: index of the selected action for each observation.
+        """
+        if memories is None:
+            memories = [self.memory] * len(obs_batch)
+        valid = np.zeros((len(obs_batch), len(self.vaf.args)), dtype=bool)
+        for row, (obs, memory) in enumerate(zip(obs_batch, memories)):
+            valid[row] = self.valid_mask(self.observation_to_premises(obs, memory))
+        ext = grounded_mask(self.vaf.defeats, valid)
+        return self.get_extension_actions(ext)
+
+    @property
+    def policy(self) -> CompiledPolicy:
+        """The policy induced by the current VAF. It is compiled again whenever the VAF (or its order) changes."""
+        if self._policy is None or self._policy[0] is not self.vaf or self._policy[1] != self.vaf.version:
+            self._policy = (self.vaf, self.vaf.version, compile_policy(self.vaf, self.args_actions))
+        return self._policy[2]
+
     @abstractmethod
     def reset_memory(self):
         """Forget about the actions performed in given the previous observations.
@@ -163,36 +195,44 @@ class AAAgent(ABC):
         """
         pass
 
-    def get_vsaf(self, obs) -> ValuebasedArgumentationFramework:
+    def get_vsaf(self, obs) -> ArgumentationFrameworkView:
         """Get the value-based situation-specific argumentation framework (VSAF) given the current observation of the game.
+        The VSAF is a view of the VAF where only the valid arguments are active: nothing is copied.
 
         Args:
             obs (_type_): current observation of the game.
 
         Returns:
-            ValuebasedArgumentationFramework: the VSAF.
+            ArgumentationFrameworkView: the VSAF.
         """
-        vsaf = deepcopy(self.vaf)
         prems = self.observation_to_premises(obs, self.memory)
-        valid_args = self.premises_to_arguments(prems)
-        invalid_args = set(vsaf.args) - set(valid_args)
-        vsaf.remove_arguments(invalid_args)
-        return vsaf
+        return self.vaf.view(self.valid_mask(prems))
+
+    def valid_mask(self, prems) -> np.ndarray:
+        """Boolean mask over the arguments of the VAF with the arguments that are valid given the premises.
+        Compiled ArgumentRules produce the mask directly, without listing the arguments.
+
+        Args:
+            prems (_type_): premises extracted from the observation.
+
+        Returns:
+            np.ndarray: the mask of valid arguments.
+        """
+        if isinstance(self.premises_to_arguments, ArgumentRules):
+            return self.premises_to_arguments.mask(prems, self.vaf.args)
+        return self.vaf.mask(self.premises_to_arguments(prems))
 
     @staticmethod
-    def get_extension(vsaf: ValuebasedArgumentationFramework):
-        """Returns the grounded extension. In a total strict order (such as as ours), the grounded extension contains always one argument.
+    def get_extension(vsaf: ArgumentationFrameworkView):
+        """Returns the grounded extension. With a total strict order and attacks between all arguments that promote different actions (such as ours), all the arguments in the grounded extension promote the same action.
 
         Args:
-            vsaf (ValuebasedArgumentationFramework): the VSAF given the current observation of the game.
+            vsaf (ArgumentationFrameworkView): the VSAF given the current observation of the game.
 
         Returns:
             _type_: arguments in the grounded extension.
         """
-        sum_cols = vsaf.mat.sum(axis=0)
-        indices = np.nonzero(sum_cols==0)
-        ext = np.take(vsaf.args, indices)[0]
-        return ext
+        return grounded_extension(vsaf)
         
     def get_extension_action(self, ext: list) -> int:
         """Gets the action promoted by the arguments in the grounded extension. 
@@ -205,5 +245,22 @@ class AAAgent(ABC):
         """
         if len(ext) == 0:
             # print("No extension: performing random action...")
+            self.n_random_actions += 1
             return random.sample(sorted(self.args_actions.values()), 1)[0]
-        return self.args_actions[ext[0]]
\ No newline at end of file
+        return self.args_actions[ext[0]]
+
+    def get_extension_actions(self, ext: np.ndarray) -> np.ndarray:
+        """Batched version of get_extension_action.
+
+        Args:
+            ext (np.ndarray): Boolean matrix (batch x arguments of the VAF) with one grounded extension per row.
+
+        Returns:
+            np.ndarray: index of the promoted action for each row.
+        """
+        arg_actions = np.array([self.args_actions[arg] for arg in self.vaf.args], dtype=int)
+        # As in get_extension_action, the first argument of the extension (in the order of vaf.args) decides.
+        actions = arg_actions[np.argmax(ext, axis=1)] if len(arg_actions) else np.zeros(len(ext), dtype=int)
+        for row in np.flatnonzero(~ext.any(axis=1)):
+            actions[row] = self.get_extension_action([])
+        return actions
\ No newline at end of file
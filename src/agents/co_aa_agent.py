@@ -3,7 +3,7 @@ import gym
 import numpy as np
 from agents.agent import Agent
 from argumentation.classes import ArgumentationFramework, ValuebasedArgumentationFramework
-from argumentation.utils import order_to_matrix
+from argumentation.utils import OrderEncoder
 from typing import List
 
 class COAAAgent(Agent):
@@ -83,8 +83,9 @@ class COAAAgent(Agent):
         """
 
 
-        mask = np.sum(next_state, axis=1) == len(next_state)
-        allowed_actions = np.argwhere(mask).flatten().tolist()
+        # The allowed actions are the rows of the encoding that are all True.
+        mask = next_state.all(axis=1)
+        allowed_actions = np.flatnonzero(mask).tolist()
         # allowed_actions = None
         next_action = self.select_action(next_state, False, allowed_actions=allowed_actions)
 
@@ -107,11 +108,11 @@ class COAAAgent(Agent):
             list: the decoded ordered arguments
         """
         order = []
+        encoder = OrderEncoder(self.args)
         for _ in range(len(self.args)):
-            encoded_order = order_to_matrix(order, self.args, True)
-            mask = np.sum(encoded_order, axis=1) == len(encoded_order)
-            allowed_actions = np.argwhere(mask).flatten().tolist()
-            action = self.select_action(encoded_order, is_greedy=True, allowed_actions=allowed_actions)
+            allowed_actions = np.flatnonzero(encoder.allowed).tolist()
+            action = self.select_action(encoder.encoding, is_greedy=True, allowed_actions=allowed_actions)
+            encoder.append(action)
             order.append(self.args[action])
 
         return order
@@ -1,8 +1,8 @@
 from agents.agent import Agent, AAAgent
+from argumentation.policy import NO_EXTENSION
 
 import numpy as np
-import matplotlib.pyplot as plt
-from environments.frozen_lake.utils import FLActions, FLObservation, fl_safe_cells
+from environments.frozen_lake.utils import FLActions, FLObservation, fl_safe_cells, fl_is_compact, fl_observation_tile, fl_observation_neighbours, FLVisitMemory
 
 import gym
 
@@ -31,41 +31,47 @@ class FrozenLakeAgent(Agent):
         self.w = np.zeros(self.W_SHAPE)
         self.e = np.zeros(self.W_SHAPE)
 
+    def features(self, observation) -> np.ndarray:
+        """Indices of the active features (rows of w) of an observation, either full or compact."""
+        if fl_is_compact(observation):
+            tile = fl_observation_tile(observation)
+            if self.W_SHAPE[0] == self.map_size*self.map_size:
+                return np.array([tile])
+            return np.append(np.flatnonzero(fl_observation_neighbours(observation)), 24 + tile)
+        return np.flatnonzero(observation[-self.W_SHAPE[0]:])
+
     # Return estimated action value of given state and action
     def value(self, observation: FLObservation, action: FLActions):
         if self.is_goal_reached(observation):
             return 0.0
-        return np.sum(self.w[observation[-self.W_SHAPE[0]:], action])
+        return np.sum(self.w[self.features(observation), action])
 
     # Return vector of estimated action values of given state, for each action
     def values(self, observation):
         if self.is_goal_reached(observation):
             return np.zeros(len(FLActions))
-        return np.sum(self.w[observation[-self.W_SHAPE[0]:],:], axis=0)
+        return np.sum(self.w[self.features(observation),:], axis=0)
 
 
     # learn with given state, action and target
     def learn(self, state: FLObservation, action: FLActions, next_state: FLObservation, reward: float, done: bool = False):
 
-        state = state[-self.W_SHAPE[0]:]
-        next_state = next_state[-self.W_SHAPE[0]:]
+        features = self.features(state)
 
         next_action = self.select_action(next_state, False)
 
         if done:
-            self.w[state, action] += self.alpha * (reward - self.value(state, action))
+            self.w[features, action] += self.alpha * (reward - self.value(state, action))
             return None
         
         #Either SARSA or Q-learning can be used, although Q-learning seems to converge faster.
-        # self.w[state, action] += self.alpha * (reward + self.gamma*self.value(next_state, next_action) - self.value(state, action))
-        self.w[state, action] += self.alpha * (reward + self.gamma*self.state_value(next_state) - self.value(state, action))
+        # self.w[features, action] += self.alpha * (reward + self.gamma*self.value(next_state, next_action) - self.value(state, action))
+        self.w[features, action] += self.alpha * (reward + self.gamma*self.state_value(next_state) - self.value(state, action))
         return next_action
 
     def is_goal_reached(self, state: FLObservation):
-
-        if state[-1]:
-            return True
-        return False
+        # The goal is the last tile of the map.
+        return fl_observation_tile(state) == self.map_size*self.map_size - 1
 
     # Plot the state value estimates
     def plot_state_values(self):
@@ -74,6 +80,8 @@ class FrozenLakeAgent(Agent):
         Returns:
             _type_: the plot
         """
+        import matplotlib.pyplot as plt
+
         v = np.zeros(self.W_SHAPE[0:1])
         for x in range(self.map_size*self.map_size):
             v[x] = self.state_value((x))
@@ -81,6 +89,52 @@ class FrozenLakeAgent(Agent):
         plt.colorbar()
         return plt.show()
 
+class FrozenLakeSparseAgent(FrozenLakeAgent):
+    """FrozenLakeAgent that works with the indices of the (about 10) active features, so the cost of a step does not
+    depend on the map size (with compact observations). Only the touched rows of the float32 weights are updated.
+    With hashed_features, the tile features are hashed into a fixed number of rows, for very large maps.
+    """
+    def __init__(self, map_size: int, alpha: float, gamma: float, epsilon: float, full=False, hashed_features: int = None):
+        """Initialise FrozenLakeSparseAgent
+
+        Args:
+            map_size (int): width of the (squared) map
+            alpha (float): learning rate
+            gamma (float): discount factor
+            epsilon (float): exploration rate
+            full (bool, optional): if True, it uses the entire game observation, otherwise, just the tile index. Defaults to False.
+            hashed_features (int, optional): number of rows for the tile features. Defaults to None (one row per tile).
+        """
+        Agent.__init__(self, alpha, gamma, epsilon)
+        self.map_size = map_size
+        self.full = full
+        self.hashed_features = hashed_features
+        n_tiles = map_size*map_size if hashed_features is None else hashed_features
+        self.W_SHAPE = (24*full + n_tiles, len(FLActions))
+        self.w = np.zeros(self.W_SHAPE, dtype=np.float32)
+
+    def features(self, observation) -> np.ndarray:
+        tile = fl_observation_tile(observation)
+        if self.hashed_features is not None:
+            # Multiplicative (Knuth) hashing of the tile index.
+            tile = (tile * 2654435761) % 2**32 % self.hashed_features
+        if not self.full:
+            return np.array([tile])
+        return np.append(np.flatnonzero(fl_observation_neighbours(observation)), 24 + tile)
+
+    def learn(self, state: FLObservation, action: FLActions, next_state: FLObservation, reward: float, done: bool = False):
+        features = self.features(state)
+        value = 0.0 if self.is_goal_reached(state) else np.sum(self.w[features, action])
+
+        next_action = self.select_action(next_state, False)
+
+        target = reward if done else reward + self.gamma*self.state_value(next_state)
+        # add.at, so that hashed features that collide are updated once per occurrence.
+        np.add.at(self.w, (features, action), self.alpha * (target - value))
+        if done:
+            return None
+        return next_action
+
 class FLRandomAgent(Agent):
     """A completely random agent.
     """
@@ -111,6 +165,7 @@ class FLRandomAwareAgent(Agent):
     
     def select_action(self, state, is_greedy: bool = True) -> int:
         actions = []
+        state = fl_observation_neighbours(state)
 
         if state[0]:
             actions.append(FLActions.LEFT)
@@ -143,6 +198,7 @@ class FLHandcraftedAgent(FLRandomAgent):
         """
     def select_action(self, state, is_greedy: bool = True) -> int:
         actions = []
+        state = fl_observation_neighbours(state)
         if state[4]:
             actions.append(FLActions.RIGHT)
         if state[6]:
@@ -169,17 +225,51 @@ class FLHandcraftedAgent(FLRandomAgent):
         return action
 
 class FLAAAgent(AAAgent):
-    def __init__(self, vaf, args_actions, obs_to_prems, prems_to_args, map_size):
+    def __init__(self, vaf, args_actions, obs_to_prems, prems_to_args, map_size, memory_format='dense'):
+        """Initialise FLAAAgent.
+
+        Args:
+            memory_format (str, optional): 'dense' for a (map_size**2, 4) Boolean table, or 'packed' / 'sparse' for a
+                FLVisitMemory, whose reset does not depend on the map size. Defaults to 'dense'.
+            (see AAAgent for the rest)
+        """
+        assert memory_format in ('dense', 'packed', 'sparse'), "unknown memory format {}".format(memory_format)
         self.map_size = map_size
+        self.memory_format = memory_format
         super().__init__(vaf, args_actions, obs_to_prems, prems_to_args)
 
+    def select_action(self, obs) -> int:
+        """Select an action looking up the policy compiled from the VAF. The action is the same as the one chosen through the VSAF and its grounded extension.
+
+        Args:
+            obs (_type_): observation of the game.
+
+        Returns:
+            int: index of the selected action.
+        """
+        valid = self.valid_mask(self.observation_to_premises(obs, self.memory))
+        action = self.policy.lookup(valid)
+        if action == NO_EXTENSION:
+            action = self.get_extension_action([])
+        self.update_memory(obs, action)
+        return action
+
     def reset_memory(self):
         # We want an array where for each tile, we can store what actions we took.
         # There are map_size x map_size x #actions bits to store.
         # Table format is chosen because map tiles are identified by tile index.
-        self.memory = np.zeros((self.map_size*self.map_size, len(FLActions)), dtype=bool)
+        # A packed or sparse FLVisitMemory is allocated once and only clears the tiles that were visited.
+        if self.memory_format == 'dense':
+            self.memory = np.zeros((self.map_size*self.map_size, len(FLActions)), dtype=bool)
+        elif not isinstance(getattr(self, 'memory', None), FLVisitMemory):
+            self.memory = FLVisitMemory(self.map_size, sparse=self.memory_format == 'sparse')
+        else:
+            self.memory.clear()
 
     def update_memory(self, obs, action):
         # Make memory[tile_index][action] = True, 
         # to remember what actions were aready taken in the current tile.
-        self.memory[obs[24:]==True, action] = True
+        if isinstance(self.memory, FLVisitMemory):
+            self.memory.add(fl_observation_tile(obs), action)
+        else:
+            self.memory[fl_observation_tile(obs), action] = True
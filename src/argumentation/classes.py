@@ -1,13 +1,22 @@
 from abc import ABC, abstractmethod
+import warnings
 
 import numpy as np
-import networkx as nx
 from typing import Tuple, List
 
 # Attacks are just tupples (attacker, attacked).
 # An Attack type is created for convenience.
 Attack = Tuple[str,str]
 
+def _draw(mat: np.ndarray, args: List[str]):
+    # networkx is only needed to draw, so it is not imported by headless workers.
+    import networkx as nx
+    G = nx.from_numpy_array(
+        mat,
+        create_using=nx.DiGraph)
+    G = nx.relabel_nodes(G, lambda x: args[x])
+    nx.draw(G, with_labels = True)
+
 class ArgumentationFramework:
     """An Argumentation Framework (AF) à la Dung.
     """
@@ -22,94 +31,335 @@ class ArgumentationFramework:
             atts (List[Attack], optional): List of attacks in the AF. Defaults to [].
         """
         self.args = []
-        self.atts = []
-        # The entire AF can be represented with a binary matrix NxN, where mat[attacker, attacked] = 1
-        self.mat = np.zeros((0, 0))
+        # Argument -> index in self.args (and in the rows/columns of the matrix).
+        self._index = {}
+        # Attacks are stored as the keys of a dict: hashed like a set, but keeping the insertion order of a list.
+        # None means that the attacks have to be read from the matrix (e.g., after a bulk operation).
+        self._atts = {}
+        # The entire AF can be represented with a binary matrix NxN, where mat[attacker, attacked] = 1.
+        # The matrix lives in a larger buffer that grows geometrically, so adding arguments is amortised O(1).
+        self._buf = np.zeros((0, 0), dtype=bool)
+        # Increased on every modification, so that derived data (e.g., the defeats of a VAF) can be cached.
+        self._version = 0
         self.add_arguments(args)
         self.add_attacks(atts)
 
+    @classmethod
+    def from_adjacency(cls,
+        args: List[str],
+        adjacency: np.ndarray,
+        copy: bool = True,
+        **kwargs
+    ):
+        """Create an AF from a Boolean adjacency matrix, where adjacency[attacker, attacked] = True.
+
+        Args:
+            args (List[str]): list of arguments. The indices of the matrix follow this list.
+            adjacency (np.ndarray): NxN Boolean matrix with the attacks.
+            copy (bool, optional): if False, a Boolean adjacency is used as the matrix of the AF without copying it (e.g., a memory-mapped file). Defaults to True.
+            **kwargs: any other keyword argument accepted by the constructor (e.g., the order of a VAF).
+
+        Returns:
+            ArgumentationFramework: the new AF.
+        """
+        adjacency = np.asarray(adjacency, dtype=bool)
+        assert adjacency.shape == (len(args), len(args)), "adjacency must be a {0}x{0} matrix".format(len(args))
+        if copy:
+            af = cls(args, **kwargs)
+            af._set_mat(adjacency)
+            return af
+        # The arguments are set directly, so that no NxN buffer is allocated before adopting the adjacency.
+        # The matrix grows into a new buffer if more arguments are added.
+        af = cls([], **kwargs)
+        args = list(args)
+        assert len(set(args)) == len(args), "repeated arguments"
+        af.args = args
+        af._index = {arg: i for i, arg in enumerate(args)}
+        af._buf = adjacency
+        af._atts = None
+        af._version += 1
+        return af
+
+    @classmethod
+    def from_edge_arrays(cls,
+        args: List[str],
+        src_idx: np.ndarray,
+        dst_idx: np.ndarray,
+        **kwargs
+    ):
+        """Create an AF from two arrays of argument indices, where args[src_idx[k]] attacks args[dst_idx[k]].
+
+        Args:
+            args (List[str]): list of arguments.
+            src_idx (np.ndarray): indices of the attackers.
+            dst_idx (np.ndarray): indices of the attacked arguments.
+            **kwargs: any other keyword argument accepted by the constructor (e.g., the order of a VAF).
+
+        Returns:
+            ArgumentationFramework: the new AF.
+        """
+        af = cls(args, **kwargs)
+        af.add_attacks_by_index(src_idx, dst_idx)
+        return af
+
+    @property
+    def mat(self) -> np.ndarray:
+        """Attack matrix, where mat[attacker, attacked] = True. This is a view of the internal buffer.
+        It always holds all the attacks: in a VAF, the attacks that succeed given the order are in defeats."""
+        n = len(self.args)
+        return self._buf[:n, :n]
+
+    @property
+    def version(self) -> int:
+        """Counter that changes every time the AF (or the order of a VAF) is modified."""
+        return self._version
+
+    @property
+    def defeats(self) -> np.ndarray:
+        """Defeat relation used to compute extensions. In a plain AF, every attack is a defeat."""
+        return self.mat
+
+    @property
+    def atts(self) -> List[Attack]:
+        """List of attacks in the AF, in insertion order (or in matrix order, after a bulk operation)."""
+        if self._atts is None:
+            attackers, attacked = np.nonzero(self.mat)
+            self._atts = dict.fromkeys(zip([self.args[i] for i in attackers], [self.args[i] for i in attacked]))
+        return list(self._atts)
+
+    def index(self,
+        argument: str
+    ) -> int:
+        """Index of an argument in self.args and in the rows/columns of self.mat."""
+        return self._index[argument]
+
+    def mask(self,
+        arguments: List[str]
+    ) -> np.ndarray:
+        """Boolean mask over self.args with the given arguments. Arguments that are not in the AF are ignored.
+
+        Args:
+            arguments (List[str]): the arguments to mark.
+
+        Returns:
+            np.ndarray: Boolean vector where mask[i] is True if self.args[i] is in arguments.
+        """
+        mask = np.zeros(len(self.args), dtype=bool)
+        mask[[self._index[arg] for arg in arguments if arg in self._index]] = True
+        return mask
+
+    def view(self,
+        active: np.ndarray
+    ):
+        """Returns a view of the AF restricted to the arguments in the active mask, without copying the AF.
+
+        Args:
+            active (np.ndarray): Boolean mask over self.args with the arguments that are present.
+
+        Returns:
+            ArgumentationFrameworkView: the restricted AF.
+        """
+        return ArgumentationFrameworkView(self, active)
+
     def add_argument(self,
         argument: str
     ):
-        assert argument not in self.args, "{} already in arguments".format(argument)
+        assert argument not in self._index, "{} already in arguments".format(argument)
+        self.expand_mat(len(self.args) + 1)
+        self._index[argument] = len(self.args)
         self.args.append(argument)
-        self.expand_mat()
+        self._version += 1
 
     def add_arguments(self,
         arguments: List[str]
     ):
+        arguments = list(arguments)
+        self.expand_mat(len(self.args) + len(arguments))
         for arg in arguments:
             self.add_argument(arg)
 
     def add_attacks(self,
         attacks: List[Attack]
     ):
-        for att in attacks:
-            self.add_attack(att)
+        """Add a batch of attacks with a single write to the matrix. Unknown arguments are added first.
+
+        Args:
+            attacks (List[Attack]): the attacks to add.
+        """
+        attacks = list(attacks)
+        if len(attacks) == 0:
+            return
+        new_args = dict.fromkeys(arg for att in attacks for arg in att if arg not in self._index)
+        self.add_arguments(new_args)
+        attackers = [self._index[att[0]] for att in attacks]
+        attacked = [self._index[att[1]] for att in attacks]
+        self._buf[attackers, attacked] = True
+        if self._atts is not None:
+            self._atts.update(dict.fromkeys(attacks))
+        self._version += 1
+
+    def add_attacks_by_index(self,
+        src_idx: np.ndarray,
+        dst_idx: np.ndarray
+    ):
+        """Add a batch of attacks given as arrays of argument indices, where args[src_idx[k]] attacks args[dst_idx[k]].
+
+        Args:
+            src_idx (np.ndarray): indices of the attackers.
+            dst_idx (np.ndarray): indices of the attacked arguments.
+        """
+        self._buf[np.asarray(src_idx, dtype=int), np.asarray(dst_idx, dtype=int)] = True
+        self._atts = None
+        self._version += 1
 
     def add_attack(self,
         attack: Attack
     ):
         for arg in attack:
-            if arg not in self.args:
-                self.args.append(arg)
-        self.expand_mat()
-        attacker = self.args.index(attack[0])
-        attacked = self.args.index(attack[1])
-        if attack not in self.atts:
-            self.atts.append(attack)
-            self.mat[attacker, attacked] = 1
+            if arg not in self._index:
+                self.add_argument(arg)
+        attacker = self._index[attack[0]]
+        attacked = self._index[attack[1]]
+        self._buf[attacker, attacked] = True
+        if self._atts is not None:
+            self._atts[attack] = None
+        self._version += 1
 
     def remove_attack(self,
         attack: Attack
     ):
-        i_attacker = self.args.index(attack[0])
-        i_attacked = self.args.index(attack[1])
-        self.mat[i_attacker, i_attacked] = 0
-        self.atts.remove(attack)
+        """Remove an attack. Raises ValueError if it is not in the AF."""
+        self.remove_attacks([attack])
 
     def remove_attacks(self,
         attacks: List[Attack]
     ):
-        for att in attacks:
-            self.remove_attack(att)
+        """Remove a batch of attacks with a single write to the matrix.
+        Raises ValueError (and removes nothing) if any of them is not in the AF.
+
+        Args:
+            attacks (List[Attack]): the attacks to remove.
+        """
+        attacks = list(attacks)
+        missing = [att for att in attacks if not (att[0] in self._index and att[1] in self._index
+            and self._buf[self._index[att[0]], self._index[att[1]]])]
+        if missing:
+            raise ValueError("{} not in attacks".format(missing[0]))
+        attackers = [self._index[att[0]] for att in attacks]
+        attacked = [self._index[att[1]] for att in attacks]
+        self._buf[attackers, attacked] = False
+        if self._atts is not None:
+            for att in attacks:
+                self._atts.pop(att, None)
+        self._version += 1
 
     def remove_argument(self,
         argument: str
     ):
-        i_arg = self.args.index(argument)
-        self.mat = np.delete(self.mat, i_arg, 0)
-        self.mat = np.delete(self.mat, i_arg, 1)
-        self.args.remove(argument)
+        """Remove an argument and all the attacks it is involved in. The order of the other arguments is preserved
+        (code that relies on indices into self.args, such as the actions of COAAenv, keeps working).
+
+        Args:
+            argument (str): the argument to remove.
+        """
+        if argument not in self._index:
+            raise ValueError("{} not in arguments".format(argument))
+        self.remove_arguments([argument])
+
+    def swap_remove_argument(self,
+        argument: str
+    ):
+        """Remove an argument and all the attacks it is involved in, in O(len(args)) instead of O(len(args)**2).
+        The last argument is moved into the freed slot, so the order of self.args changes: only use it when no index into
+        self.args (e.g., an OrderEncoder or the actions of COAAenv) has to stay valid.
+
+        Args:
+            argument (str): the argument to remove.
+        """
+        if argument not in self._index:
+            raise ValueError("{} not in arguments".format(argument))
+        n = len(self.args)
+        i_arg = self._index.pop(argument)
+        if self._atts is not None:
+            for i_other in np.flatnonzero(self._buf[i_arg, :n]):
+                self._atts.pop((argument, self.args[i_other]), None)
+            for i_other in np.flatnonzero(self._buf[:n, i_arg]):
+                self._atts.pop((self.args[i_other], argument), None)
+
+        i_last = n - 1
+        if i_arg != i_last:
+            # Row first, then column: this way mat[i_arg, i_arg] ends up with mat[i_last, i_last].
+            self._buf[i_arg, :n] = self._buf[i_last, :n]
+            self._buf[:n, i_arg] = self._buf[:n, i_last]
+            last = self.args[i_last]
+            self.args[i_arg] = last
+            self._index[last] = i_arg
+        # Leave the freed row and column clean for the next argument.
+        self._buf[i_last, :n] = False
+        self._buf[:n, i_last] = False
+        self.args.pop()
+        self._version += 1
 
     def remove_arguments(self,
         arguments: List[str]
     ):
-        for arg in arguments:
-            self.remove_argument(arg)
-
-    def expand_mat(self):
-        """The matrix needs to be expanded when a new argument is added."""
-        nA = len(self.args)
-        nM = len(self.mat)
-        diff = nA - nM
-        if diff == 0:
+        """Remove a batch of arguments (and their attacks) compacting the matrix once.
+        The relative order of the remaining arguments is preserved.
+
+        Args:
+            arguments (List[str]): the arguments to remove.
+        """
+        removed = set(arguments)
+        if len(removed) == 0:
             return
-        padding = np.zeros((diff, nM))
-        self.mat = np.vstack((self.mat, padding))
-        padding = np.zeros((nA, diff))
-        self.mat = np.hstack((self.mat, padding))
+        n = len(self.args)
+        keep = np.ones(n, dtype=bool)
+        keep[[self._index[arg] for arg in removed]] = False
+        kept = np.flatnonzero(keep)
+        self._set_mat(self.mat[np.ix_(kept, kept)])
+        self.args = [self.args[i] for i in kept]
+        self._index = {arg: i for i, arg in enumerate(self.args)}
+        self._version += 1
+
+    def expand_mat(self,
+        size: int = None
+    ):
+        """The matrix needs to be expanded when a new argument is added.
+        The capacity is at least doubled, so that the cost of the copy is amortised.
 
+        Args:
+            size (int, optional): number of arguments the matrix must be able to hold. Defaults to len(self.args).
+        """
+        if size is None:
+            size = len(self.args)
+        capacity = len(self._buf)
+        if size <= capacity:
+            return
+        n = len(self.args)
+        buf = np.zeros((max(size, 2*capacity),)*2, dtype=bool)
+        buf[:n, :n] = self._buf[:n, :n]
+        self._buf = buf
+
+    def _set_mat(self,
+        mat: np.ndarray
+    ):
+        """Overwrite the top-left corner of the buffer with mat and clear the rest of the matrix."""
+        n = len(self.args)
+        k = len(mat)
+        self._buf[:k, :k] = mat
+        self._buf[k:n, :n] = False
+        self._buf[:k, k:n] = False
+        self._atts = None
+        self._version += 1
 
     def draw(self):
-        G = nx.from_numpy_array(
-            self.mat,
-            create_using=nx.DiGraph)
-        G = nx.relabel_nodes(G, lambda x: self.args[x])
-        nx.draw(G, with_labels = True)
+        """Draws the AF with networkx."""
+        _draw(self.mat, self.args)
 
 class ValuebasedArgumentationFramework(ArgumentationFramework):
     """The value-based argumentation framework. This is actually a preference-based AF, since the ordering is strict. 
+    The attacks are kept untouched: mat (and atts) hold all the attacks, and the order only determines which of them
+    succeed as defeats (see defeats, which is what the extensions and draw use).
 
     Args:
         ArgumentationFramework (_type_): the original AF
@@ -119,7 +369,7 @@ class ValuebasedArgumentationFramework(ArgumentationFramework):
         args: List[str] = [],
         atts: List[Attack] = [],
         order : List[str] = [],
-        update_on_init: bool = True
+        update_on_init: bool = None
     ):
         """Initialise the VAF
 
@@ -127,18 +377,122 @@ class ValuebasedArgumentationFramework(ArgumentationFramework):
             args (List[str], optional): list of arguments that comprise the AF. Defaults to [].
             atts (List[Attack], optional): list of attacks in the AF. Defaults to [].
             order (List[str], optional): order of arguments. Defaults to [].
-            update_on_init (bool, optional): whether to update the attacks of the AF on initialisation. Defaults to True.
+            update_on_init (bool, optional): deprecated and ignored: the defeats are always computed lazily from the order. Defaults to None.
         """
+        if update_on_init is not None:
+            warnings.warn("update_on_init is deprecated and ignored: the defeats of a VAF are always computed from its order",
+                DeprecationWarning, stacklevel=2)
         super().__init__(args, atts)
         self.order = order
-        if update_on_init:
-            self.update_vaf()
+        # (version, rank, defeats) of the last computed defeat relation.
+        self._cache = None
+
+    @property
+    def order(self) -> List[str]:
+        """Order of arguments, from the most preferred to the least preferred."""
+        return self._order
+
+    @order.setter
+    def order(self,
+        order: List[str]
+    ):
+        # Reordering only invalidates the ranks and the defeats: the AF itself is not rebuilt.
+        # Setting the same order again keeps the version, so cached data (e.g., compiled policies) stays valid.
+        order = list(order)
+        if order != getattr(self, '_order', None):
+            self._order = order
+            self._version += 1
+
+    @property
+    def rank(self) -> np.ndarray:
+        """Position of each argument in the order. Arguments that are not in the order get len(order) (least preferred)."""
+        return self._get_cache()[1]
+
+    @property
+    def defeats(self) -> np.ndarray:
+        """Defeat relation: defeats[a, b] is True if a attacks b and rank[a] <= rank[b]. The returned matrix is cached and must not be modified."""
+        return self._get_cache()[2]
+
+    def draw(self):
+        """Draws the defeat relation of the VAF (the attacks that succeed given the order) with networkx."""
+        _draw(self.defeats, self.args)
 
     def update_vaf(self):
-        """Remove the attacks of all arguments with lower preference.
+        """Recompute the defeats of the VAF. This is only needed if the matrix has been modified directly.
+        """
+        self._version += 1
+
+    def _get_cache(self):
+        if self._cache is None or self._cache[0] != self._version:
+            rank = np.full(len(self.args), len(self._order), dtype=int)
+            for position, arg in enumerate(self._order):
+                i_arg = self._index.get(arg)
+                if i_arg is not None:
+                    rank[i_arg] = position
+            defeats = self.mat & (rank[:, None] <= rank[None, :])
+            defeats.flags.writeable = False
+            self._cache = (self._version, rank, defeats)
+        return self._cache
+
+class ArgumentationFrameworkView:
+    """Read-only restriction of an AF (or VAF) to a subset of its arguments, such as a situation-specific AF.
+    The view shares the matrices of the parent (parent_args, parent_mat and parent_defeats), and active marks the
+    arguments of the parent that are present. The extensions in argumentation.semantics are computed on these, without copying.
+    args, mat, defeats and atts only contain the active arguments, as in the restricted AF itself: they are built on access.
+    """
+    def __init__(self,
+        af: ArgumentationFramework,
+        active: np.ndarray
+    ):
+        """Initialise the view
+
+        Args:
+            af (ArgumentationFramework): the parent AF.
+            active (np.ndarray): Boolean mask over af.args with the arguments that are present.
         """
-        for i_order, arg in enumerate(self.order):
-            i_arg = self.args.index(arg)
-            higher = self.order[0:i_order+1]
-            mask = np.isin(self.args, higher, invert=True)
-            self.mat[:, i_arg][mask] = 0
+        self.af = af
+        self.active = np.asarray(active, dtype=bool)
+
+    @property
+    def parent_args(self) -> List[str]:
+        """Arguments of the parent AF. active is a mask over this list."""
+        return self.af.args
+
+    @property
+    def parent_mat(self) -> np.ndarray:
+        """Attack matrix of the parent AF (including the attacks of the arguments that are not active)."""
+        return self.af.mat
+
+    @property
+    def parent_defeats(self) -> np.ndarray:
+        """Defeat relation of the parent AF (including the defeats of the arguments that are not active)."""
+        return self.af.defeats
+
+    @property
+    def args(self) -> List[str]:
+        """Arguments that are present in the view, in the order of the parent."""
+        return [self.af.args[i] for i in np.flatnonzero(self.active)]
+
+    # Kept for backwards compatibility: the same as args.
+    active_args = args
+
+    @property
+    def mat(self) -> np.ndarray:
+        """Attack matrix restricted to the active arguments (indices follow args)."""
+        kept = np.flatnonzero(self.active)
+        return self.af.mat[np.ix_(kept, kept)]
+
+    @property
+    def defeats(self) -> np.ndarray:
+        """Defeat relation restricted to the active arguments (indices follow args)."""
+        kept = np.flatnonzero(self.active)
+        return self.af.defeats[np.ix_(kept, kept)]
+
+    @property
+    def atts(self) -> List[Attack]:
+        """Attacks among the active arguments, in the order of the parent."""
+        return [att for att in self.af.atts if self.active[self.af.index(att[0])] and self.active[self.af.index(att[1])]]
+
+    def draw(self):
+        """Draws the restricted defeat relation (the restricted attacks, if the parent is a plain AF) with networkx."""
+        _draw(self.defeats, self.args)
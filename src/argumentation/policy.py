@@ -0,0 +1,179 @@
+import hashlib
+import numpy as np
+from typing import List
+
+from .semantics import grounded_mask
+
+# Action stored for the sets of valid arguments with an empty grounded extension.
+NO_EXTENSION = -1
+
+class CompiledPolicy:
+    """The policy induced by a VAF: the action chosen for every set of valid arguments.
+    It only depends on NumPy, so that a learned policy can be served without the argumentation classes.
+
+    The policy is stored in one of three forms:
+    - table: dense array indexed by the bitmask of valid arguments (bit i is args[i]).
+    - priority: decision list with the indices of the arguments, from the most preferred. The action is the one promoted by the first valid argument.
+    - defeats: the defeat relation itself. Grounded extensions are computed (and memoised) on demand.
+    """
+    def __init__(self,
+        args: List[str],
+        actions: np.ndarray,
+        table: np.ndarray = None,
+        priority: np.ndarray = None,
+        defeats: np.ndarray = None
+    ):
+        """Initialise the CompiledPolicy. Exactly one of table, priority and defeats must be given.
+
+        Args:
+            args (List[str]): arguments of the VAF. Their indices define the bits of the masks.
+            actions (np.ndarray): action promoted by each argument.
+            table (np.ndarray, optional): action for every bitmask of valid arguments. Defaults to None.
+            priority (np.ndarray, optional): indices of the arguments, from the most preferred. Defaults to None.
+            defeats (np.ndarray, optional): defeat relation of the VAF. Defaults to None.
+        """
+        assert sum(x is not None for x in (table, priority, defeats)) == 1, "exactly one of table, priority and defeats must be given"
+        self.args = list(args)
+        self.actions = np.asarray(actions, dtype=int)
+        self.table = table
+        self.priority = priority
+        self.defeats = defeats
+        self._weights = 1 << np.arange(len(self.args), dtype=np.int64) if len(self.args) < 63 else None
+        if priority is not None:
+            # Position of each argument in the decision list.
+            self._position = np.empty(len(self.args), dtype=int)
+            self._position[priority] = np.arange(len(priority))
+        self._memo = {}
+
+    @property
+    def kind(self) -> str:
+        if self.table is not None:
+            return 'table'
+        if self.priority is not None:
+            return 'priority'
+        return 'defeats'
+
+    def bits(self, valid: np.ndarray) -> int:
+        """Bitmask of a Boolean mask of valid arguments."""
+        if self._weights is not None:
+            return int(np.asarray(valid, dtype=np.int64) @ self._weights)
+        return int.from_bytes(np.packbits(valid, bitorder='little').tobytes(), 'little')
+
+    def lookup(self, valid: np.ndarray) -> int:
+        """Action for a set of valid arguments.
+
+        Args:
+            valid (np.ndarray): Boolean mask over self.args with the valid arguments.
+
+        Returns:
+            int: the action, or NO_EXTENSION if the grounded extension is empty.
+        """
+        if self.table is not None:
+            return int(self.table[self.bits(valid)])
+        if self.priority is not None:
+            positions = self._position[np.asarray(valid, dtype=bool)]
+            if len(positions) == 0:
+                return NO_EXTENSION
+            return int(self.actions[self.priority[positions.min()]])
+        key = self.bits(valid)
+        if key not in self._memo:
+            self._memo[key] = int(self.lookup_batch(np.asarray(valid, dtype=bool)[None, :])[0])
+        return self._memo[key]
+
+    def lookup_batch(self, valid: np.ndarray) -> np.ndarray:
+        """Actions for a batch of sets of valid arguments.
+
+        Args:
+            valid (np.ndarray): Boolean matrix (batch x arguments) with the valid arguments.
+
+        Returns:
+            np.ndarray: the action for each row, or NO_EXTENSION if the grounded extension is empty.
+        """
+        valid = np.asarray(valid, dtype=bool)
+        if self.table is not None:
+            return self.table[valid.astype(np.int64) @ self._weights].astype(int)
+        if self.priority is not None:
+            positions = np.where(valid, self._position, len(self.args))
+            first = positions.argmin(axis=1)
+            return np.where(valid.any(axis=1), self.actions[first], NO_EXTENSION)
+        return _extension_actions(grounded_mask(self.defeats, valid), self.actions)
+
+    def fingerprint(self) -> bytes:
+        """Canonical digest of the policy, e.g. to cache results per policy.
+        Policies with the same arguments that choose the same action for every set of valid arguments get the same digest
+        when they are tables. Decision lists are canonicalised by sorting the runs of consecutive arguments that promote
+        the same action (their order within a run never changes the chosen action).
+
+        Returns:
+            bytes: 16-byte digest.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.kind.encode())
+        digest.update('\0'.join(map(str, self.args)).encode())
+        digest.update(self.actions.astype(np.int64).tobytes())
+        if self.table is not None:
+            digest.update(self.table.astype(np.int64).tobytes())
+        elif self.priority is not None:
+            priority = np.asarray(self.priority)
+            starts = np.flatnonzero(np.diff(self.actions[priority], prepend=NO_EXTENSION - 1))
+            runs = np.split(priority, starts[1:])
+            digest.update(np.concatenate([np.sort(run) for run in runs] or [priority]).astype(np.int64).tobytes())
+        else:
+            digest.update(np.packbits(np.asarray(self.defeats, dtype=bool)).tobytes())
+        return digest.digest()
+
+    def save(self, path: str):
+        """Saves the policy as a .npz file that can be loaded with NumPy alone."""
+        arrays = {'args': np.array(self.args, dtype=str), 'actions': self.actions}
+        arrays[self.kind] = getattr(self, self.kind)
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str):
+        """Loads a policy saved with save."""
+        with np.load(path) as data:
+            kwargs = {kind: data[kind] for kind in ('table', 'priority', 'defeats') if kind in data}
+            return cls(data['args'].tolist(), data['actions'], **kwargs)
+
+def compile_policy(vaf, args_actions: dict, max_table_args: int = 16) -> CompiledPolicy:
+    """Compiles the policy induced by a VAF.
+
+    If the VAF has at most max_table_args arguments, the grounded extension of every subset of arguments is computed
+    (in batches) and stored in a dense table. Otherwise, if the order is total and every pair of arguments that promote
+    different actions attack each other (as with construct_all_attacks), the policy is a decision list: the most
+    preferred valid argument always wins. Otherwise, the defeats are kept and extensions are computed on demand.
+
+    Args:
+        vaf (ValuebasedArgumentationFramework): the VAF (a plain AF is also accepted).
+        args_actions (dict): dictionary of arguments with the index of their corresponding action.
+        max_table_args (int, optional): maximum number of arguments for the dense table. Defaults to 16.
+
+    Returns:
+        CompiledPolicy: the compiled policy.
+    """
+    n = len(vaf.args)
+    actions = np.array([args_actions[arg] for arg in vaf.args], dtype=int)
+    defeats = np.array(vaf.defeats, dtype=bool)
+
+    if n <= max_table_args:
+        table = np.empty(1 << n, dtype=np.int8 if actions.max(initial=0) < 127 else int)
+        chunk = 1 << 14
+        shifts = np.arange(n)
+        for start in range(0, 1 << n, chunk):
+            masks = ((np.arange(start, min(start + chunk, 1 << n))[:, None] >> shifts) & 1).astype(bool)
+            table[start:start + len(masks)] = _extension_actions(grounded_mask(defeats, masks), actions)
+        return CompiledPolicy(vaf.args, actions, table=table)
+
+    rank = getattr(vaf, 'rank', None)
+    different = actions[:, None] != actions[None, :]
+    if (rank is not None and len(np.unique(rank)) == n
+            and np.all(vaf.mat[different]) and not np.any(np.diag(vaf.mat))):
+        return CompiledPolicy(vaf.args, actions, priority=np.argsort(rank))
+
+    return CompiledPolicy(vaf.args, actions, defeats=defeats)
+
+def _extension_actions(ext: np.ndarray, actions: np.ndarray) -> np.ndarray:
+    """Action of the first argument of each grounded extension (rows of ext), or NO_EXTENSION if it is empty."""
+    if len(actions) == 0:
+        return np.full(len(ext), NO_EXTENSION)
+    return np.where(ext.any(axis=1), actions[np.argmax(ext, axis=1)], NO_EXTENSION)
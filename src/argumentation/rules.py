@@ -0,0 +1,127 @@
+import numpy as np
+from typing import Dict, Iterable, List, Union
+
+# Declarative rules that say when an argument is valid: each argument is a conjunction of premise literals.
+# A literal is the name of a premise, which must hold, or its name preceded by '~', which must not hold. E.g.:
+#   {'U': ['safe_up'], 'nU': ['safe_up', '~visited_up']}
+# The rules are compiled into two bitmasks per argument (required and forbidden premises), so all the arguments are
+# checked at once for a premise bitmask, or for a batch of them.
+
+class ArgumentRules:
+    """Compiled set of argument rules. It can be used wherever a premises_to_arguments function is expected.
+    """
+    def __init__(self,
+        rules: Dict[str, Iterable[str]],
+        premises: List[str] = None
+    ):
+        """Compile the rules.
+
+        Args:
+            rules (Dict[str, Iterable[str]]): conjunction of premise literals of each argument.
+            premises (List[str], optional): premise names. Bit i of a premise bitmask stands for premises[i].
+                Defaults to None (the premises mentioned by the rules, in order of appearance).
+        """
+        self.args = list(rules)
+        literals = {arg: [lit.strip() for lit in rule] for arg, rule in rules.items()}
+        if premises is None:
+            premises = list(dict.fromkeys(lit.lstrip('~') for rule in literals.values() for lit in rule))
+        self.premises = list(premises)
+        self._premise_index = {premise: i for i, premise in enumerate(self.premises)}
+
+        self.required = np.zeros((len(self.args), len(self.premises)), dtype=bool)
+        self.forbidden = np.zeros((len(self.args), len(self.premises)), dtype=bool)
+        for i_arg, arg in enumerate(self.args):
+            for lit in literals[arg]:
+                negated = lit.startswith('~')
+                premise = lit.lstrip('~')
+                assert premise in self._premise_index, "unknown premise {} in the rule of {}".format(premise, arg)
+                (self.forbidden if negated else self.required)[i_arg, self._premise_index[premise]] = True
+        # With up to 63 premises, the rules are checked on int64 bitmasks. Otherwise, on Boolean matrices.
+        if len(self.premises) < 64:
+            self._weights = 1 << np.arange(len(self.premises), dtype=np.int64)
+            self._required_bits = self.required.astype(np.int64) @ self._weights
+            self._forbidden_bits = self.forbidden.astype(np.int64) @ self._weights
+        else:
+            self._weights = None
+        # Position of each argument of self.args in other lists of arguments (e.g., the arguments of a VAF).
+        self._positions = {}
+
+    def premise_bits(self, premises: dict) -> np.ndarray:
+        """Boolean vector over self.premises with the premises that hold. Missing premises do not hold."""
+        return np.array([bool(premises.get(premise, False)) for premise in self.premises], dtype=bool)
+
+    def evaluate(self, premises: Union[dict, np.ndarray]) -> np.ndarray:
+        """Valid arguments for one or many sets of premises.
+
+        Args:
+            premises (Union[dict, np.ndarray]): a premises dict, or a Boolean vector (P,) or matrix (B, P) over self.premises.
+
+        Returns:
+            np.ndarray: Boolean mask over self.args, of shape (A,) or (B, A).
+        """
+        if isinstance(premises, dict):
+            premises = self.premise_bits(premises)
+        premises = np.asarray(premises, dtype=bool)
+        if self._weights is not None:
+            bits = (premises.astype(np.int64) @ self._weights)[..., None]
+            return ((bits & self._required_bits) == self._required_bits) & ((bits & self._forbidden_bits) == 0)
+        violations = (~premises).astype(np.int32) @ self.required.T + premises.astype(np.int32) @ self.forbidden.T
+        return violations == 0
+
+    def mask(self, premises: Union[dict, np.ndarray], args: List[str]) -> np.ndarray:
+        """Like evaluate, but the mask is over args (e.g., the arguments of a VAF). Arguments without a rule are never valid.
+
+        Args:
+            premises (Union[dict, np.ndarray]): see evaluate.
+            args (List[str]): the arguments of the returned mask.
+
+        Returns:
+            np.ndarray: Boolean mask over args, of shape (len(args),) or (B, len(args)).
+        """
+        key = tuple(args)
+        if key not in self._positions:
+            index = {arg: i for i, arg in enumerate(self.args)}
+            # Arguments without a rule point to an extra column that is always False.
+            self._positions[key] = np.array([index.get(arg, len(self.args)) for arg in args], dtype=int)
+        valid = self.evaluate(premises)
+        valid = np.concatenate([valid, np.zeros((*valid.shape[:-1], 1), dtype=bool)], axis=-1)
+        return valid[..., self._positions[key]]
+
+    def implications(self, args: List[str]) -> np.ndarray:
+        """Which arguments are valid whenever another one is, as far as the rules tell (i.e., syntactically).
+
+        Args:
+            args (List[str]): the arguments of the matrix (e.g., the arguments of a VAF).
+
+        Returns:
+            np.ndarray: Boolean matrix, where [a, b] is True if b is valid whenever a is valid: every literal of the rule
+                of b is in the rule of a. Arguments that are never valid (no rule, or contradictory rules) imply all the others.
+        """
+        index = {arg: i for i, arg in enumerate(self.args)}
+        never = ~np.array([arg in index and not np.any(self.required[index[arg]] & self.forbidden[index[arg]]) for arg in args])
+        rows = np.array([index.get(arg, 0) for arg in args], dtype=int)
+        required, forbidden = self.required[rows], self.forbidden[rows]
+        # b's literals are a subset of a's: no literal of b is missing from a.
+        implied = ~((required[None, :, :] & ~required[:, None, :]).any(axis=2) | (forbidden[None, :, :] & ~forbidden[:, None, :]).any(axis=2))
+        implied &= ~never[None, :]
+        implied[never] = True
+        return implied
+
+    def __call__(self, premises: dict) -> List[str]:
+        """Valid arguments given a premises dict, in the order of the rules (as a premises_to_arguments function)."""
+        return [self.args[i] for i in np.flatnonzero(self.evaluate(premises))]
+
+def compile_rules(
+        rules: Dict[str, Iterable[str]],
+        premises: List[str] = None
+    ) -> ArgumentRules:
+    """Compiles declarative argument rules (see ArgumentRules).
+
+    Args:
+        rules (Dict[str, Iterable[str]]): conjunction of premise literals of each argument, e.g. {'nU': ['safe_up', '~visited_up']}.
+        premises (List[str], optional): premise names, which define the bits of premise vectors. Defaults to None.
+
+    Returns:
+        ArgumentRules: the compiled rules.
+    """
+    return ArgumentRules(rules, premises)
@@ -0,0 +1,228 @@
+import numpy as np
+from typing import List
+
+# Extension-based semantics à la Dung.
+# The grounded extension is computed with Boolean matrix products, so that it can be vectorised over many
+# situations at once. The enumeration of complete, preferred and stable extensions works on packed bitsets
+# (Python ints), where bit i stands for the i-th argument of the AF.
+
+def grounded_mask(
+        defeats: np.ndarray,
+        active: np.ndarray = None
+    ) -> np.ndarray:
+    """Computes the grounded extension as the least fixpoint of the characteristic function.
+    It labels IN the arguments whose defeaters are all OUT, and OUT the arguments defeated by an IN argument, until nothing changes.
+
+    Args:
+        defeats (np.ndarray): NxN Boolean matrix, where defeats[attacker, attacked] = True.
+        active (np.ndarray, optional): Boolean mask of shape (N,) or (B, N) with the arguments that are present.
+            A batch of masks computes B grounded extensions at once. Defaults to None (all arguments).
+
+    Returns:
+        np.ndarray: Boolean mask with the same shape as active (or (N,)) with the arguments in the grounded extension.
+    """
+    n = len(defeats)
+    if active is None:
+        active = np.ones(n, dtype=bool)
+    active = np.asarray(active, dtype=bool)
+    batch = np.atleast_2d(active)
+    # float32 products go through BLAS and are exact for any realistic number of arguments.
+    mat = np.asarray(defeats, dtype=np.float32)
+
+    undecided = batch.copy()
+    labelled_in = np.zeros_like(batch)
+    n_defeaters = batch.astype(np.float32) @ mat
+    new_in = undecided & (n_defeaters == 0)
+    while new_in.any():
+        labelled_in |= new_in
+        undecided &= ~new_in
+        new_out = undecided & ((new_in.astype(np.float32) @ mat) > 0)
+        undecided &= ~new_out
+        n_defeaters -= new_out.astype(np.float32) @ mat
+        new_in = undecided & (n_defeaters == 0)
+
+    return labelled_in.reshape(active.shape)
+
+def grounded_extension(af, active: np.ndarray = None) -> List[str]:
+    """Returns the grounded extension of an AF.
+
+    Args:
+        af (ArgumentationFramework): the AF (or VAF, in which case its defeats are used).
+        active (np.ndarray, optional): Boolean mask with the arguments that are present. Defaults to None (all arguments, or the active ones if af is a view, in which case the mask is over af.parent_args).
+
+    Returns:
+        List[str]: arguments in the grounded extension, in the order of af.args.
+    """
+    defeats, active, args = _restriction(af, active)
+    return [args[i] for i in np.flatnonzero(grounded_mask(defeats, active))]
+
+def complete_extensions(af, active: np.ndarray = None) -> List[List[str]]:
+    """Enumerates the complete extensions of an AF.
+
+    Args:
+        af (ArgumentationFramework): the AF (or VAF, in which case its defeats are used).
+        active (np.ndarray, optional): Boolean mask with the arguments that are present. Defaults to None (all arguments, or the active ones if af is a view, in which case the mask is over af.parent_args).
+
+    Returns:
+        List[List[str]]: the complete extensions. The first one is always the grounded extension.
+    """
+    defeats, active, args = _restriction(af, active)
+    return [_to_args(args, ext) for ext in _enumerate(defeats, active)]
+
+def preferred_extensions(af, active: np.ndarray = None) -> List[List[str]]:
+    """Enumerates the preferred extensions (maximal complete extensions) of an AF.
+
+    Args:
+        af (ArgumentationFramework): the AF (or VAF, in which case its defeats are used).
+        active (np.ndarray, optional): Boolean mask with the arguments that are present. Defaults to None (all arguments, or the active ones if af is a view, in which case the mask is over af.parent_args).
+
+    Returns:
+        List[List[str]]: the preferred extensions.
+    """
+    defeats, active, args = _restriction(af, active)
+    exts = sorted(_enumerate(defeats, active), key=_popcount, reverse=True)
+    maximal = []
+    for ext in exts:
+        if all(ext & other != ext for other in maximal):
+            maximal.append(ext)
+    return [_to_args(args, ext) for ext in maximal]
+
+def stable_extensions(af, active: np.ndarray = None) -> List[List[str]]:
+    """Enumerates the stable extensions of an AF.
+
+    Args:
+        af (ArgumentationFramework): the AF (or VAF, in which case its defeats are used).
+        active (np.ndarray, optional): Boolean mask with the arguments that are present. Defaults to None (all arguments, or the active ones if af is a view, in which case the mask is over af.parent_args).
+
+    Returns:
+        List[List[str]]: the stable extensions (possibly none).
+    """
+    defeats, active, args = _restriction(af, active)
+    return [_to_args(args, ext) for ext in _enumerate(defeats, active, stable=True)]
+
+def _to_bits(mask: np.ndarray) -> int:
+    """Packs a Boolean vector into an int, where bit i is mask[i]."""
+    return int.from_bytes(np.packbits(mask, bitorder='little').tobytes(), 'little')
+
+def _popcount(bits: int) -> int:
+    return bin(bits).count('1')
+
+def _restriction(af, active: np.ndarray = None):
+    """Defeats, mask of present arguments and arguments to compute the extensions of af.
+    A view is not materialised: the matrices of its parent are used with the mask of active arguments."""
+    if hasattr(af, 'parent_defeats'):
+        return af.parent_defeats, af.active if active is None else active, af.parent_args
+    return af.defeats, active, af.args
+
+def _to_args(args: List[str], bits: int) -> List[str]:
+    return [arg for i, arg in enumerate(args) if bits >> i & 1]
+
+def _indices(bits: int):
+    """Yields the indices of the bits that are set."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+def _enumerate(defeats: np.ndarray, active: np.ndarray = None, stable: bool = False) -> List[int]:
+    """Enumerates the complete (or stable) extensions as bitsets.
+
+    The search starts from the grounded labelling (every complete extension contains the grounded extension and
+    excludes whatever it defeats) and branches on including or excluding the remaining arguments. After every
+    decision the constraints are propagated: arguments in conflict with the extension are excluded, defended
+    arguments are included, a defeater of the extension with a single possible counter-attacker forces it in, and
+    an excluded argument with a single live defeater forces out whatever could defeat it. A branch is pruned as
+    soon as a defeater of the extension can no longer be counter-attacked, as soon as an excluded argument is
+    defended by the extension, or, for stable extensions, as soon as an excluded argument can no longer be defeated.
+    """
+    n = len(defeats)
+    if active is None:
+        active = np.ones(n, dtype=bool)
+    active = np.asarray(active, dtype=bool)
+    defeats = np.asarray(defeats, dtype=bool) & active[:, None] & active[None, :]
+
+    all_bits = _to_bits(active)
+    defeaters = [_to_bits(defeats[:, i]) for i in range(n)]
+    defeated = [_to_bits(defeats[i, :]) for i in range(n)]
+    conflicts = [defeaters[i] | defeated[i] for i in range(n)]
+
+    def union(bits, table):
+        res = 0
+        for i in _indices(bits):
+            res |= table[i]
+        return res
+
+    def defended(bits, ext_defeated):
+        """Arguments in bits whose defeaters are all defeated by the extension."""
+        res = 0
+        for i in _indices(bits):
+            if not defeaters[i] & ~ext_defeated:
+                res |= 1 << i
+        return res
+
+    extensions = []
+
+    def search(ext, undecided, excluded):
+        ext_defeated = union(ext, defeated)
+        while True:
+            # Undecided arguments in conflict with the extension can no longer join it.
+            conflicting = undecided & (union(ext, conflicts) | ext_defeated)
+            excluded |= conflicting
+            undecided &= ~conflicting
+
+            # Arguments defended by the extension must join it.
+            forced_in = defended(undecided, ext_defeated)
+            forced_out = 0
+            # Every defeater of the extension must be defeated by some argument that can still join it.
+            targets = union(ext, defeaters) & ~ext_defeated
+            # In a stable extension, every excluded argument must be defeated too.
+            if stable:
+                targets |= excluded & ~ext_defeated
+            for i in _indices(targets):
+                options = defeaters[i] & undecided
+                if not options:
+                    return
+                if not options & (options - 1):
+                    forced_in |= options
+            # An excluded argument must keep a defeater that the extension does not defeat.
+            for i in _indices(excluded):
+                live = defeaters[i] & ~ext_defeated
+                if not live:
+                    return
+                if not live & (live - 1):
+                    forced_out |= union(live, defeaters) & undecided
+
+            if not forced_in and not forced_out:
+                break
+            if forced_in & forced_out or union(forced_in, conflicts) & (forced_in | ext):
+                return
+            ext |= forced_in
+            excluded |= forced_out
+            undecided &= ~(forced_in | forced_out)
+            ext_defeated = union(ext, defeated)
+
+        ext_defeaters = union(ext, defeaters)
+        if not undecided:
+            if ext_defeaters & ~ext_defeated:
+                return
+            if stable and ext | ext_defeated != all_bits:
+                return
+            extensions.append(ext)
+            return
+
+        # Prefer an argument that counter-attacks a defeater of the extension that is not defeated yet.
+        uncountered = ext_defeaters & ~ext_defeated
+        c = next((i for i in _indices(undecided) if defeated[i] & uncountered), None)
+        if c is None:
+            c = next(_indices(undecided))
+        search(ext | 1 << c, undecided & ~(1 << c), excluded)
+        search(ext, undecided & ~(1 << c), excluded | 1 << c)
+
+    grounded = _to_bits(grounded_mask(defeats, active))
+    # Self-defeating arguments can never be in a conflict-free set.
+    self_defeating = 0
+    for i in _indices(all_bits):
+        if defeated[i] >> i & 1:
+            self_defeating |= 1 << i
+    search(grounded, all_bits & ~grounded & ~self_defeating, self_defeating)
+    return extensions
@@ -0,0 +1,155 @@
+import re
+import struct
+import numpy as np
+from typing import List
+
+from .classes import ArgumentationFramework, ValuebasedArgumentationFramework
+
+# Binary layout of a saved AF (all integers little-endian, every section aligned to 8 bytes):
+# - header: magic (8 bytes), number of arguments N (uint64), flags (uint64), size of the argument names in bytes (uint64).
+# - argument table: N+1 offsets (uint64) into the UTF-8 blob that follows, with the names one after the other.
+# - adjacency: N rows of ceil(N/8) bytes with the bits of each row (little bit order) if packed, otherwise N rows of N bytes.
+# - ranks (only VAFs): position of each argument in the order (int64), -1 for the arguments that are not ordered.
+_MAGIC = b'RLAAAF01'
+_HEADER = struct.Struct('<8sQQQ')
+_FLAG_PACKED = 1
+_FLAG_VAF = 2
+
+def _align(offset: int) -> int:
+    return (offset + 7) // 8 * 8
+
+def save_af(af: ArgumentationFramework, path: str, packed: bool = True):
+    """Saves an AF (or a VAF, including its order) in a compact binary file that can be memory-mapped by load_af.
+
+    Args:
+        af (ArgumentationFramework): the AF or VAF to save.
+        path (str): path of the file.
+        packed (bool, optional): whether to bit-pack the adjacency. An unpacked adjacency takes 8 times more space, but load_af can use it without copying. Defaults to True.
+    """
+    n = len(af.args)
+    names = [arg.encode('utf-8') for arg in af.args]
+    offsets = np.zeros(n + 1, dtype='<u8')
+    offsets[1:] = np.cumsum([len(name) for name in names])
+    blob = b''.join(names)
+
+    mat = af.mat
+    adjacency = np.packbits(mat, axis=1, bitorder='little') if packed else mat.astype(np.uint8)
+    is_vaf = isinstance(af, ValuebasedArgumentationFramework)
+    flags = (_FLAG_PACKED if packed else 0) | (_FLAG_VAF if is_vaf else 0)
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, n, flags, len(blob)))
+        f.write(offsets.tobytes())
+        f.write(blob)
+        f.write(b'\0' * (_align(f.tell()) - f.tell()))
+        f.write(np.ascontiguousarray(adjacency).tobytes())
+        f.write(b'\0' * (_align(f.tell()) - f.tell()))
+        if is_vaf:
+            ranks = np.where(af.rank < len(af.order), af.rank, -1).astype('<i8')
+            f.write(ranks.tobytes())
+
+def load_af(path: str, mmap: bool = True) -> ArgumentationFramework:
+    """Loads an AF (or a VAF) saved with save_af.
+
+    Args:
+        path (str): path of the file.
+        mmap (bool, optional): whether to memory-map the file instead of reading it. An unpacked adjacency is then used as the matrix
+            of the AF without copying it (copy-on-write), so that many processes can share it. Defaults to True.
+
+    Returns:
+        ArgumentationFramework: the AF, or a ValuebasedArgumentationFramework if a VAF was saved.
+    """
+    data = np.memmap(path, dtype=np.uint8, mode='c') if mmap else np.fromfile(path, dtype=np.uint8)
+    magic, n, flags, blob_size = _HEADER.unpack(data[:_HEADER.size].tobytes())
+    assert magic == _MAGIC, "{} is not an AF file".format(path)
+
+    offset = _HEADER.size
+    offsets = data[offset:offset + 8*(n+1)].view('<u8')
+    offset += 8*(n+1)
+    blob = data[offset:offset + blob_size].tobytes()
+    args = [blob[offsets[i]:offsets[i+1]].decode('utf-8') for i in range(n)]
+    offset = _align(offset + blob_size)
+
+    if flags & _FLAG_PACKED:
+        row_size = (n + 7) // 8
+        packed = data[offset:offset + n*row_size].reshape(n, row_size)
+        adjacency = np.unpackbits(packed, axis=1, count=n, bitorder='little').view(bool)
+        offset = _align(offset + n*row_size)
+    else:
+        adjacency = data[offset:offset + n*n].reshape(n, n).view(bool)
+        offset = _align(offset + n*n)
+
+    if flags & _FLAG_VAF:
+        ranks = data[offset:offset + 8*n].view('<i8')
+        order = [args[i] for i in np.argsort(ranks, kind='stable') if ranks[i] >= 0]
+        return ValuebasedArgumentationFramework.from_adjacency(args, adjacency, copy=False, order=order)
+    return ArgumentationFramework.from_adjacency(args, adjacency, copy=False)
+
+def write_apx(af: ArgumentationFramework, path: str):
+    """Exports the attacks of an AF in the ICCMA apx format (arg(a). att(a,b).)."""
+    with open(path, 'w') as f:
+        for arg in af.args:
+            f.write('arg({}).\n'.format(arg))
+        for attacker, attacked in zip(*np.nonzero(af.mat)):
+            f.write('att({},{}).\n'.format(af.args[attacker], af.args[attacked]))
+
+def read_apx(path: str, cls: type = ArgumentationFramework, **kwargs) -> ArgumentationFramework:
+    """Imports an AF in the ICCMA apx format.
+
+    Args:
+        path (str): path of the file.
+        cls (type, optional): class of the returned AF. Defaults to ArgumentationFramework.
+        **kwargs: any other keyword argument accepted by the constructor of cls (e.g., the order of a VAF).
+
+    Returns:
+        ArgumentationFramework: the AF.
+    """
+    with open(path) as f:
+        text = f.read()
+    args = re.findall(r'\barg\(\s*([^,()\s]+)\s*\)\s*\.', text)
+    atts = re.findall(r'\batt\(\s*([^,()\s]+)\s*,\s*([^,()\s]+)\s*\)\s*\.', text)
+    return _from_names(cls, args, atts, **kwargs)
+
+def write_tgf(af: ArgumentationFramework, path: str):
+    """Exports the attacks of an AF in the trivial graph format (one argument per line, '#', one attack per line)."""
+    with open(path, 'w') as f:
+        for arg in af.args:
+            f.write('{}\n'.format(arg))
+        f.write('#\n')
+        for attacker, attacked in zip(*np.nonzero(af.mat)):
+            f.write('{} {}\n'.format(af.args[attacker], af.args[attacked]))
+
+def read_tgf(path: str, cls: type = ArgumentationFramework, **kwargs) -> ArgumentationFramework:
+    """Imports an AF in the trivial graph format.
+
+    Args:
+        path (str): path of the file.
+        cls (type, optional): class of the returned AF. Defaults to ArgumentationFramework.
+        **kwargs: any other keyword argument accepted by the constructor of cls (e.g., the order of a VAF).
+
+    Returns:
+        ArgumentationFramework: the AF.
+    """
+    args, atts = [], []
+    with open(path) as f:
+        lines = iter(f)
+        for line in lines:
+            if line.strip() == '#':
+                break
+            if line.strip():
+                args.append(line.split()[0])
+        for line in lines:
+            if line.strip():
+                atts.append(tuple(line.split()[:2]))
+    return _from_names(cls, args, atts, **kwargs)
+
+def _from_names(cls: type, args: List[str], atts: list, **kwargs) -> ArgumentationFramework:
+    """Builds an AF with a single write of the attacks. Arguments that only appear in the attacks are appended."""
+    index = dict.fromkeys(args)
+    for att in atts:
+        index.update(dict.fromkeys(att))
+    args = list(index)
+    index = {arg: i for i, arg in enumerate(args)}
+    src_idx = np.array([index[att[0]] for att in atts], dtype=int)
+    dst_idx = np.array([index[att[1]] for att in atts], dtype=int)
+    return cls.from_edge_arrays(args, src_idx, dst_idx, **kwargs)
@@ -1,5 +1,5 @@
 import numpy as np
-from typing import List, Tuple, MutableSet
+from typing import Callable, Iterable, List, Tuple, MutableSet
 
 def order_to_matrix(
         order: List[str], 
@@ -32,6 +32,124 @@ def order_to_matrix(
             return mat.astype(bool)
         return mat
 
+class OrderEncoder:
+    """Incremental version of order_to_matrix(order, args, as_bool=True), together with the mask of allowed actions
+    (the rows of the encoding that are all True). Appending an argument costs O(len(args)).
+
+    The encoding is double-buffered: the views returned by encoding and allowed are read-only and stay valid until the
+    next-but-one call to append (or until reset). Copy them if they have to be kept for longer.
+    """
+    def __init__(self, args: List[str]):
+        """Initialise the OrderEncoder
+
+        Args:
+            args (List[str]): full list of arguments. The encoding preserves indices with this list.
+        """
+        self.args = list(args)
+        n = len(self.args)
+        self._encodings = np.ones((2, n, n), dtype=bool)
+        self._allowed = np.ones((2, n), dtype=bool)
+        self._encoding_views = [self._read_only(mat) for mat in self._encodings]
+        self._allowed_views = [self._read_only(mask) for mask in self._allowed]
+        # Position of each argument in the order (len(args) if it is not ordered yet).
+        self._rank = np.full(n, n)
+        self.order_idx = []
+        # Number of arguments of the order already written into each buffer.
+        self._written = [0, 0]
+        self._current = 0
+
+    @staticmethod
+    def _read_only(arr: np.ndarray) -> np.ndarray:
+        view = arr.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def encoding(self) -> np.ndarray:
+        """Encoded (partial) ordering, as returned by order_to_matrix(order, args, True)."""
+        return self._encoding_views[self._current]
+
+    @property
+    def allowed(self) -> np.ndarray:
+        """Boolean mask of the arguments whose row of the encoding is all True (i.e., the allowed actions)."""
+        return self._allowed_views[self._current]
+
+    def append(self, idx: int):
+        """Append an argument to the order.
+
+        Args:
+            idx (int): index of the argument in args.
+        """
+        assert self._rank[idx] == len(self.args), "{} already in the order".format(self.args[idx])
+        n = len(self.args)
+        self._rank[idx] = len(self.order_idx)
+        self.order_idx.append(idx)
+        self._current = 1 - self._current
+        # Bring the other buffer up to date: it is at most two arguments behind.
+        encoding, allowed = self._encodings[self._current], self._allowed[self._current]
+        for position in range(self._written[self._current], len(self.order_idx)):
+            i_arg = self.order_idx[position]
+            encoding[i_arg] = self._rank <= position
+            allowed[i_arg] = position == n - 1
+        self._written[self._current] = len(self.order_idx)
+
+    def reset(self):
+        """Empty the order."""
+        for encoding, allowed, written in zip(self._encodings, self._allowed, self._written):
+            rows = self.order_idx[:written]
+            encoding[rows] = True
+            allowed[rows] = True
+        self._rank[:] = len(self.args)
+        self.order_idx = []
+        self._written = [0, 0]
+
+def construct_attack_matrix(
+        arg_actions: dict,
+        rule: Callable = np.not_equal
+    ) -> Tuple[List[str], np.ndarray]:
+    """Given a dictionary of arguments and their promoted action, returns the attack matrix among them.
+    By default, two arguments attack each other if they promote different actions.
+    The result can be passed straight to ArgumentationFramework.from_adjacency(*construct_attack_matrix(arg_actions)).
+
+    Args:
+        arg_actions (dict): dictionary in the format {argument: action}
+        rule (Callable, optional): vectorised predicate rule(attacker_actions, attacked_actions) that says whether an argument attacks another one given their actions.
+            It is called once with broadcastable arrays of shape (N, 1) and (1, N). Defaults to np.not_equal.
+
+    Returns:
+        Tuple[List[str], np.ndarray]: list of arguments and NxN Boolean matrix, where mat[attacker, attacked] = True.
+    """
+    args = list(arg_actions)
+    actions = np.array([arg_actions[arg] for arg in args])
+    mat = np.asarray(rule(actions[:, None], actions[None, :]), dtype=bool)
+    return args, np.broadcast_to(mat, (len(args), len(args))).copy()
+
+def construct_conflict_matrix(
+        arg_actions: dict,
+        conflicts: Iterable[Tuple],
+        symmetric: bool = True
+    ) -> Tuple[List[str], np.ndarray]:
+    """Given a dictionary of arguments and their promoted action, returns the attack matrix where an argument attacks another one if their actions are in conflict.
+
+    Args:
+        arg_actions (dict): dictionary in the format {argument: action}
+        conflicts (Iterable[Tuple]): pairs of actions (attacker action, attacked action) that are in conflict.
+        symmetric (bool, optional): whether every conflict also holds in the opposite direction. Defaults to True.
+
+    Returns:
+        Tuple[List[str], np.ndarray]: list of arguments and NxN Boolean matrix, where mat[attacker, attacked] = True.
+    """
+    args = list(arg_actions)
+    codes = {}
+    labels = np.array([codes.setdefault(arg_actions[arg], len(codes)) for arg in args], dtype=int)
+    table = np.zeros((len(codes), len(codes)), dtype=bool)
+    for action1, action2 in conflicts:
+        if action1 in codes and action2 in codes:
+            table[codes[action1], codes[action2]] = True
+            if symmetric:
+                table[codes[action2], codes[action1]] = True
+    return args, table[labels[:, None], labels[None, :]]
+
 def construct_all_attacks(arg_actions: dict) -> MutableSet[Tuple[str, str]]:
     """Given a dictionary of arguments and their promoted action, returns a set with all attacks among them.
 
@@ -41,10 +159,5 @@ def construct_all_attacks(arg_actions: dict) -> MutableSet[Tuple[str, str]]:
     Returns:
         MutableSet[Tuple[str, str]]: set of attacks among
     """
-    attacks = set()
-    for arg1 in arg_actions:
-        for arg2 in arg_actions:
-            if arg_actions[arg1] != arg_actions[arg2]:
-                attacks.add((arg1, arg2))
-                attacks.add((arg2, arg1))      
-    return attacks
\ No newline at end of file
+    args, mat = construct_attack_matrix(arg_actions)
+    return {(args[i], args[j]) for i, j in zip(*np.nonzero(mat))}
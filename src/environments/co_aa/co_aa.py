@@ -1,4 +1,5 @@
 from copy import deepcopy
+from functools import partial
 import gym
 import numpy as np
 from typing import Callable, Optional, List
@@ -6,9 +7,45 @@ import time
 import random
 
 from argumentation.classes import ArgumentationFramework, ValuebasedArgumentationFramework
-from argumentation.utils import order_to_matrix
+from argumentation.utils import OrderEncoder
 
 from agents.agent import AAAgent
+from environments.co_aa.reward_cache import RewardCache
+from environments.frozen_lake.evaluation import evaluate_policy
+from environments.frozen_lake.utils import fl_observation_to_premises
+from environments.frozen_lake.vec_env import FrozenLakeVecEnv
+
+def play_game(env: gym.Env, aa_agent: AAAgent, render: bool = False, lapse: float = 0.25) -> float:
+    """Plays an episode of the game with the AAAgent and returns the total reward.
+
+    Args:
+        env (gym.Env): the game.
+        aa_agent (AAAgent): the agent, with the VAF to evaluate.
+        render (bool, optional): whether to render this run or not. Defaults to False.
+        lapse (float, optional): if render is True, this will be the time between frames. Defaults to 0.25.
+
+    Returns:
+        float: the total reward.
+    """
+    current_state = env.reset()
+    total_reward = 0
+
+    done = False
+    while not done:
+        current_action = aa_agent.select_action(current_state)
+        if render:
+            env.render()
+            time.sleep(lapse)
+        current_state, reward, done, _ = env.step(current_action)
+        total_reward += reward
+
+    aa_agent.reset_memory()
+    return total_reward
+
+def _cache_rollout(cache: RewardCache, key, future):
+    """Caches the reward of a finished rollout if it was deterministic (see COAAenv._get_game_reward)."""
+    if future.exception() is None and future.result().n_random_actions == 0:
+        cache.put(key, future.result().reward)
 
 class COAAenv(gym.Env):
     """Combinatorial-Optimisation Abstract-Argumentation environment.
@@ -25,7 +62,11 @@ class COAAenv(gym.Env):
         env: gym.Env, 
         observation_to_premises: Callable,
         premises_to_args: Callable,
-        aa_agent: AAAgent
+        aa_agent: AAAgent,
+        reward_cache: RewardCache = None,
+        rollout_pool = None,
+        game_maps: List = None,
+        deferred_reward: bool = False
     ):
         """Initialise COAAenv
 
@@ -37,6 +78,16 @@ class COAAenv(gym.Env):
             observation_to_premises (Callable): function that transforms a game observation into a list of premises
             premises_to_args (Callable): function that transforms a list of premises into a list of valid arguments
             aa_agent (AAAgent): the agent that will use the VAF as its inference engine
+            reward_cache (RewardCache, optional): cache of game rewards (it can be shared by many COAAenv). The game is
+                only played if the policy of the VAF has not been evaluated on the same map. Defaults to None.
+            rollout_pool (RolloutPool, optional): if given, the game is played in a worker process. Defaults to None.
+            game_maps (List, optional): K Frozen Lake maps of the same size. If given, the reward is the mean reward of the
+                VAF over all of them, played at once (see evaluate_policy), instead of the reward of a game of env. It
+                requires observation_to_premises to be fl_observation_to_premises.
+                Use set_game_maps to change them (e.g., K new maps every episode). Defaults to None.
+            deferred_reward (bool, optional): with a rollout_pool, the final step does not wait for the game: it returns a
+                reward of 0 and info['reward_future'], a future of the RolloutResult, which the caller must collect (see
+                run_episodes_async). Otherwise, the final step waits for the reward. Defaults to False.
         """
     
         self._args = args
@@ -46,9 +97,22 @@ class COAAenv(gym.Env):
         self._observation_to_premises = observation_to_premises
         self._premises_to_args = premises_to_args
         self._aa_agent = aa_agent
+        self._reward_cache = reward_cache
+        self._rollout_pool = rollout_pool
+        assert not deferred_reward or rollout_pool is not None, "deferred_reward requires a rollout_pool"
+        self._deferred_reward = deferred_reward
+        self._reward_future = None
+        assert game_maps is None or rollout_pool is None, "game_maps and rollout_pool cannot be used together"
+        self._game_env = None
+        if game_maps is not None:
+            self.set_game_maps(game_maps)
         self._size = len(args)
         self._order = []
         self._order_idx = []
+        # The observation is updated in place every time an argument is appended.
+        self._encoder = OrderEncoder(args)
+        # The VAF is built once: at the end of every episode only its order is updated.
+        self._vaf = ValuebasedArgumentationFramework.from_adjacency(af.args, af.mat)
 
         self.observation_space = gym.spaces.Box(-1, self._size-1, (1,self._size), 'int')
 
@@ -70,12 +134,18 @@ class COAAenv(gym.Env):
         else:
             self._order_idx.append(action)
             self._order.append(self._args[action])
+            self._encoder.append(action)
             done = (len(self._order) == self._size)
 
             if done:
-                vaf = ValuebasedArgumentationFramework(self._af.args, self._af.atts, self._order)
-                self._aa_agent.vaf = vaf
-                reward = self._get_game_reward()
+                self._vaf.order = self._order
+                self._aa_agent.vaf = self._vaf
+                if self._game_env is not None:
+                    reward = self._get_mean_game_reward()
+                elif self._rollout_pool is None:
+                    reward = self._get_game_reward()
+                else:
+                    reward = self._submit_game()
             else:
                 reward = 0
 
@@ -93,27 +163,70 @@ class COAAenv(gym.Env):
         Returns:
             _type_: the reward output by the game
         """
-        current_state = self._env.reset()
-        total_reward = 0
-
-        done = False
-        while not done:
-            current_action = self._aa_agent.select_action(current_state)
-            if render:
-                self._env.render()
-                time.sleep(lapse)
-            current_state, reward, done, _ = self._env.step(current_action)
-            total_reward += reward
-
-        self._aa_agent.reset_memory()
+        # Deterministic rollouts are cached by (policy, map). The game has a map if it has a desc (e.g., Frozen Lake).
+        key = None
+        if self._reward_cache is not None and not render and getattr(self._env, 'desc', None) is not None:
+            key = self._reward_cache.key(self._aa_agent.policy, self._env.desc)
+            reward = self._reward_cache.get(key)
+            if reward is not None:
+                return reward
+        n_random_actions = self._aa_agent.n_random_actions
+        total_reward = play_game(self._env, self._aa_agent, render, lapse)
+        # A rollout that took a random action might not be reproducible.
+        if key is not None and self._aa_agent.n_random_actions == n_random_actions:
+            self._reward_cache.put(key, total_reward)
         return total_reward
 
+    def set_game_maps(self, maps: List):
+        """Sets the K maps whose mean reward is the reward of the episode (see game_maps). They are played by a single
+        FrozenLakeVecEnv, with the multiple_visits and max_episode_steps of env (if it has them)."""
+        # evaluate_policy computes the premises of all the maps at once, as fl_observation_to_premises does.
+        assert self._observation_to_premises is fl_observation_to_premises, \
+            "game_maps requires observation_to_premises to be fl_observation_to_premises"
+        if self._game_env is None:
+            self._game_env = FrozenLakeVecEnv(maps, getattr(self._env, 'multiple_visits', True),
+                getattr(self._env, 'max_episode_steps', 100), compact=True)
+        else:
+            self._game_env.set_maps(maps)
+
+    def _get_mean_game_reward(self) -> float:
+        """Mean reward of the policy of the VAF over the game maps."""
+        rewards = evaluate_policy(self._aa_agent.policy, self._game_env, self._premises_to_args).rewards
+        return float(np.mean(rewards))
+
+    def _submit_game(self) -> float:
+        """Submits the game to the rollout pool. Returns the cached reward on a hit. Otherwise, with deferred_reward it
+        returns 0 and keeps the future of the reward, and without it waits for the reward."""
+        key = None
+        if self._reward_cache is not None and getattr(self._env, 'desc', None) is not None:
+            key = self._reward_cache.key(self._aa_agent.policy, self._env.desc)
+            reward = self._reward_cache.get(key)
+            if reward is not None:
+                return reward
+        # self._order_idx indexes self._args, which may differ from the arguments of the pool (af.args): submit the names.
+        future = self._rollout_pool.submit(self._order, self._env.desc)
+        if key is not None:
+            future.add_done_callback(partial(_cache_rollout, self._reward_cache, key))
+        if not self._deferred_reward:
+            return future.result().reward
+        self._reward_future = future
+        return 0
+
     def _get_obs(self):
-        """ The observation of this environment is the encoded (partial) ordering of arguments."""
-        return order_to_matrix(self._order, self._args, True)
+        """ The observation of this environment is the encoded (partial) ordering of arguments (see order_to_matrix).
+        It is a read-only view that is only valid until the next-but-one step: copy it if it has to be kept."""
+        return self._encoder.encoding
+
+    @property
+    def allowed_actions(self) -> np.ndarray:
+        """Read-only mask of the arguments that can still be appended (same lifetime as the observation)."""
+        return self._encoder.allowed
 
     def _get_info(self):
-        return {'order' : self._order}
+        info = {'order' : self._order, 'allowed_actions': self.allowed_actions}
+        if self._reward_future is not None:
+            info['reward_future'] = self._reward_future
+        return info
 
     def update_agent_vaf(self, vaf):
         """Updates the VAF of the AAAgent to use in the game when the final reward is computed."""
@@ -133,6 +246,8 @@ class COAAenv(gym.Env):
         super().reset(seed=seed)
         self._order = []
         self._order_idx = []
+        self._reward_future = None
+        self._encoder.reset()
         self._aa_agent.reset_memory()
 
         self._env.reset()
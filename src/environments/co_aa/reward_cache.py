@@ -0,0 +1,85 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+import numpy as np
+
+from argumentation.policy import CompiledPolicy
+
+# Key of a cached game reward: (policy fingerprint, map fingerprint).
+RewardKey = Tuple[bytes, bytes]
+
+def map_fingerprint(desc) -> bytes:
+    """Digest of a Frozen Lake map (e.g., env.desc).
+
+    Args:
+        desc (Union[List[str], np.ndarray]): the map, as a list of strings or an array of characters/bytes.
+
+    Returns:
+        bytes: 16-byte digest.
+    """
+    desc = np.asarray(desc, dtype='c')
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.array(desc.shape, dtype=np.int64).tobytes())
+    digest.update(desc.tobytes())
+    return digest.digest()
+
+class RewardCache:
+    """Bounded LRU cache of game rewards keyed by (policy, map).
+
+    The inner games are deterministic, and so is the policy of the AAAgent as long as the random action for an empty
+    grounded extension is never taken. The reward of such a rollout only depends on the policy (up to equivalence, see
+    CompiledPolicy.fingerprint) and the map, so it can be reused instead of playing the game again.
+    The same cache can be shared by many COAAenv instances (e.g., one per episode), and it is thread-safe (rewards of a
+    RolloutPool are stored from the thread that completes their futures).
+    """
+    def __init__(self, max_size: int = 100000):
+        """Initialise the RewardCache.
+
+        Args:
+            max_size (int, optional): maximum number of rewards. The least recently used one is evicted first. Defaults to 100000.
+        """
+        self.max_size = max_size
+        self._rewards = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._rewards)
+
+    @staticmethod
+    def key(policy: CompiledPolicy, desc) -> RewardKey:
+        """Key of the reward of playing a map with a policy."""
+        return policy.fingerprint(), map_fingerprint(desc)
+
+    def get(self, key: RewardKey) -> Optional[float]:
+        """Cached reward, or None (a miss)."""
+        with self._lock:
+            reward = self._rewards.get(key)
+            if reward is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._rewards.move_to_end(key)
+            return reward
+
+    def put(self, key: RewardKey, reward: float):
+        """Stores a reward, evicting the least recently used one if the cache is full."""
+        with self._lock:
+            self._rewards[key] = reward
+            self._rewards.move_to_end(key)
+            while len(self._rewards) > self.max_size:
+                self._rewards.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        """Removes all the rewards and resets the counters."""
+        with self._lock:
+            self._rewards.clear()
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,120 @@
+import random
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, List, NamedTuple
+
+import numpy as np
+
+from argumentation.classes import ArgumentationFramework, ValuebasedArgumentationFramework
+from agents.frozen_lake_agent import FLAAAgent
+from environments.co_aa.co_aa import play_game
+from environments.frozen_lake.frozen_lake import FrozenLakeEnv
+
+class RolloutResult(NamedTuple):
+    reward: float
+    # Random actions taken because the grounded extension was empty (0 means that the rollout is reproducible).
+    n_random_actions: int
+
+# State of each worker process, set once by _init_worker.
+_worker = {}
+
+def _init_worker(args, mat, arg_actions, observation_to_premises, premises_to_args, multiple_visits, memory_format):
+    _worker['vaf'] = ValuebasedArgumentationFramework.from_adjacency(args, mat)
+    _worker['arg_actions'] = arg_actions
+    _worker['observation_to_premises'] = observation_to_premises
+    _worker['premises_to_args'] = premises_to_args
+    _worker['multiple_visits'] = multiple_visits
+    _worker['memory_format'] = memory_format
+    _worker['agents'] = {}
+
+def _rollout(order_idx: bytes, map_bytes: bytes, map_shape: tuple, seed: int) -> RolloutResult:
+    vaf = _worker['vaf']
+    vaf.order = [vaf.args[i] for i in np.frombuffer(order_idx, dtype=np.int32)]
+    # The only randomness of a rollout is the action taken when the grounded extension is empty.
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    desc = np.frombuffer(map_bytes, dtype='S1').reshape(map_shape)
+    # One agent per map size, reused across rollouts (its policy is compiled again when the order changes).
+    agents = _worker['agents']
+    if map_shape[0] not in agents:
+        agents[map_shape[0]] = FLAAAgent(vaf, _worker['arg_actions'], _worker['observation_to_premises'],
+            _worker['premises_to_args'], map_shape[0], memory_format=_worker['memory_format'])
+    agent = agents[map_shape[0]]
+    agent.reset_memory()
+    n_random_actions = agent.n_random_actions
+    reward = play_game(FrozenLakeEnv(desc, multiple_visits=_worker['multiple_visits']), agent)
+    return RolloutResult(reward, agent.n_random_actions - n_random_actions)
+
+class RolloutPool:
+    """Plays Frozen Lake rollouts of VAFs in a pool of worker processes.
+
+    Every worker builds the VAF of the AF once: a task only ships the order (as int32 argument indices) and the map
+    (as bytes). Each task gets its own seed, drawn from a SeedSequence in submission order, so the results are
+    reproducible whatever the number of workers and the order in which they run the tasks.
+    observation_to_premises and premises_to_args must be picklable (e.g., module-level functions or ArgumentRules).
+    """
+    def __init__(self,
+        af: ArgumentationFramework,
+        arg_actions: dict,
+        observation_to_premises: Callable,
+        premises_to_args: Callable,
+        processes: int = None,
+        seed: int = None,
+        multiple_visits: bool = True,
+        memory_format: str = 'packed'
+    ):
+        """Initialise the RolloutPool.
+
+        Args:
+            af (ArgumentationFramework): AF whose orderings are evaluated.
+            arg_actions (dict): action promoted by each argument.
+            observation_to_premises (Callable): function that transforms a game observation into premises.
+            premises_to_args (Callable): function that transforms premises into valid arguments.
+            processes (int, optional): number of worker processes. Defaults to None (one per CPU).
+            seed (int, optional): seed of the SeedSequence of the tasks. Defaults to None (fresh entropy).
+            multiple_visits (bool, optional): see FrozenLakeEnv. Defaults to True.
+            memory_format (str, optional): memory of the FLAAAgent of the workers. Defaults to 'packed'.
+        """
+        self.args = list(af.args)
+        self._seed_sequence = np.random.SeedSequence(seed)
+        self._executor = ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(
+            self.args, np.array(af.mat, dtype=bool), arg_actions, observation_to_premises, premises_to_args,
+            multiple_visits, memory_format))
+
+    def submit(self, order, desc) -> Future:
+        """Submits a rollout.
+
+        Args:
+            order (Sequence[Union[str, int]]): the order, as argument names or as indices into af.args.
+            desc (np.ndarray): the map (e.g., env.desc).
+
+        Returns:
+            Future: future of the RolloutResult.
+        """
+        order = list(order)
+        if len(order) > 0 and isinstance(order[0], str):
+            order = [self.args.index(arg) for arg in order]
+        desc = np.asarray(desc, dtype='c')
+        seed = int(self._seed_sequence.spawn(1)[0].generate_state(1, dtype=np.uint64)[0])
+        return self._executor.submit(_rollout, np.asarray(order, dtype=np.int32).tobytes(), desc.tobytes(), desc.shape, seed)
+
+    def evaluate(self, orders: List, maps: List) -> np.ndarray:
+        """Plays every order on its map (in parallel) and waits for the rewards.
+
+        Args:
+            orders (List): the orders (see submit).
+            maps (List): the map of each order.
+
+        Returns:
+            np.ndarray: the reward of each rollout.
+        """
+        futures = [self.submit(order, desc) for order, desc in zip(orders, maps)]
+        return np.array([future.result().reward for future in futures])
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
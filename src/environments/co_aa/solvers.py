@@ -0,0 +1,388 @@
+import math
+import time
+import numpy as np
+from typing import Callable, List, NamedTuple, Sequence
+
+from argumentation.classes import ArgumentationFramework
+from argumentation.policy import CompiledPolicy
+from argumentation.rules import ArgumentRules
+from environments.frozen_lake.evaluation import VAFEvaluation, evaluate_policy
+from environments.frozen_lake.utils import fl_rules
+from environments.frozen_lake.vec_env import FrozenLakeVecEnv
+
+# Solvers of the ordering problem of COAAenv that do not learn: they search the orderings of the arguments directly,
+# scoring them on a fixed set of Frozen Lake maps.
+
+class OrderingSolution(NamedTuple):
+    order: List[str]
+    # Mean reward of the VAF of the order over the maps.
+    score: float
+    # Number of (partial) orderings evaluated.
+    n_evaluated: int
+    # Whether the search finished, rather than being stopped by its budget. Then the order is optimal on the maps
+    # (solve_ordering), or the best one did not improve for patience iterations (local_search).
+    complete: bool
+
+class OrderingEvaluator:
+    """Scores orderings of the arguments of an AF: the mean reward of the VAF of the order over a fixed set of maps.
+
+    The policies are decision lists, which requires that all the arguments that promote different actions attack each
+    other (as with construct_all_attacks): the most preferred valid argument always wins. The games are played at once by
+    one FrozenLakeVecEnv per map size, which are reused by all the evaluations. Random actions (empty grounded
+    extensions) are drawn from a generator seeded again for every evaluation, so the score of an order never changes.
+    """
+    def __init__(self,
+        af: ArgumentationFramework,
+        arg_actions: dict,
+        maps: List,
+        premises_to_args: Callable = fl_rules,
+        multiple_visits: bool = True,
+        max_episode_steps: int = 100,
+        seed: int = 0
+    ):
+        """Initialise the OrderingEvaluator.
+
+        Args:
+            af (ArgumentationFramework): the AF whose arguments are ordered.
+            arg_actions (dict): action promoted by each argument.
+            maps (List): the maps (e.g., generate_random_map outputs or env.desc), of one or more sizes.
+            premises_to_args (Callable, optional): see evaluate_policy. Defaults to fl_rules.
+            multiple_visits (bool, optional): see FrozenLakeVecEnv. Defaults to True.
+            max_episode_steps (int, optional): see FrozenLakeVecEnv. Defaults to 100.
+            seed (int, optional): seed of the random actions. Defaults to 0.
+        """
+        self.args = list(af.args)
+        self.actions = np.array([arg_actions[arg] for arg in self.args], dtype=int)
+        mat = np.asarray(af.mat, dtype=bool)
+        assert np.all(mat[self.actions[:, None] != self.actions[None, :]]) and not np.any(np.diag(mat)), \
+            "the arguments that promote different actions must attack each other"
+        self.premises_to_args = premises_to_args
+        self.seed = seed
+        self.n_maps = len(maps)
+        sizes = np.array([len(desc) for desc in maps])
+        # (indices of the maps, environment) of each map size.
+        self._groups = [(np.flatnonzero(sizes == size), FrozenLakeVecEnv([maps[i] for i in np.flatnonzero(sizes == size)],
+            multiple_visits, max_episode_steps, compact=True)) for size in np.unique(sizes)]
+        self.n_evaluated = 0
+
+    def policy(self, order_idx: Sequence[int]) -> CompiledPolicy:
+        """Decision list of an order, given as a permutation of the indices of the arguments."""
+        return CompiledPolicy(self.args, self.actions, priority=np.asarray(order_idx, dtype=int))
+
+    def evaluate(self, order_idx: Sequence[int], n_fixed: int = None, maps: np.ndarray = None, valid_log: list = None) -> VAFEvaluation:
+        """Plays an order on all the maps, or on some of them.
+
+        Args:
+            order_idx (Sequence[int]): permutation of the indices of the arguments, from the most preferred.
+            n_fixed (int, optional): if given, only the first n_fixed arguments are fixed, and the games stop as soon as
+                they depend on the others (see evaluate_policy). Defaults to None (all of them).
+            maps (np.ndarray, optional): indices of the maps to play. Defaults to None (all of them).
+            valid_log (list, optional): see evaluate_policy (with the indices of the maps of the evaluator). Defaults to None.
+
+        Returns:
+            VAFEvaluation: the results on the maps that were played, in increasing index order.
+        """
+        self.n_evaluated += 1
+        policy = self.policy(order_idx)
+        free_args = None
+        if n_fixed is not None and n_fixed < len(order_idx):
+            free_args = np.zeros(len(self.args), dtype=bool)
+            free_args[np.asarray(order_idx[n_fixed:], dtype=int)] = True
+        selected = np.ones(self.n_maps, dtype=bool)
+        if maps is not None:
+            selected[:] = False
+            selected[maps] = True
+        rng = np.random.default_rng(self.seed)
+        results = [np.zeros(self.n_maps), np.zeros(self.n_maps, dtype=bool), np.zeros(self.n_maps, dtype=int), np.zeros(self.n_maps, dtype=bool)]
+        for group, env in self._groups:
+            local = np.flatnonzero(selected[group])
+            if len(local) == 0:
+                continue
+            if len(local) < len(group):
+                env = FrozenLakeVecEnv(env.tiles[local], env.multiple_visits, env.max_episode_steps, compact=True)
+            log = None if valid_log is None else []
+            result = evaluate_policy(policy, env, self.premises_to_args, rng=rng, free_args=free_args, valid_log=log)
+            for column, values in zip(results, result):
+                column[group[local]] = values
+            if log is not None:
+                valid_log.extend((group[local][envs], valid) for envs, valid in log)
+        return VAFEvaluation(*(column[selected] for column in results))
+
+    def score(self, order_idx: Sequence[int]) -> float:
+        """Mean reward of an order over the maps."""
+        return self.evaluate(order_idx).mean_reward
+
+    def indices(self, order: List[str]) -> List[int]:
+        """Indices of the arguments of an order."""
+        return [self.args.index(arg) for arg in order]
+
+def solve_ordering(
+        evaluator: OrderingEvaluator,
+        max_reward: float = 1.0,
+        initial_order: List[str] = None,
+        max_evaluations: int = None,
+        time_budget: float = None
+    ) -> OrderingSolution:
+    """Finds the order with the highest score with a depth-first branch and bound over the prefixes of the orders.
+
+    A prefix is played with its arguments ahead of the rest: a game stops as soon as its action depends on the rest, so the
+    score of the prefix is bounded by the rewards of the finished games plus max_reward for each stopped one. The search
+    space is reduced without losing optimal orders:
+    - A prefix whose games are all finished is a leaf, as the order of the rest does not change its score.
+    - Arguments that are dominated by the prefix (valid only when one of its arguments is, see ArgumentRules.implications)
+      never decide an action, so they are not branched on.
+    - Consecutive arguments that promote the same action can be swapped, so they are only placed in increasing index order.
+    Compare n_evaluated with arrangements(len(af.args)) to see how much was pruned.
+
+    Args:
+        evaluator (OrderingEvaluator): the scores of the orders.
+        max_reward (float, optional): maximum reward of a game. Defaults to 1.0 (reaching the goal).
+        initial_order (List[str], optional): order whose score is the initial bound (e.g., the result of a local search). Defaults to None.
+        max_evaluations (int, optional): maximum number of evaluations. Defaults to None (no limit).
+        time_budget (float, optional): maximum time in seconds. Defaults to None (no limit).
+
+    Returns:
+        OrderingSolution: the best order found. It is optimal if the search is complete.
+    """
+    n = len(evaluator.args)
+    actions = evaluator.actions
+    if isinstance(evaluator.premises_to_args, ArgumentRules):
+        implies = evaluator.premises_to_args.implications(evaluator.args)
+    else:
+        implies = np.zeros((n, n), dtype=bool)
+    n_evaluated = evaluator.n_evaluated
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+
+    def out_of_budget():
+        return ((max_evaluations is not None and evaluator.n_evaluated - n_evaluated >= max_evaluations)
+            or (deadline is not None and time.perf_counter() > deadline))
+
+    def completion(prefix, placed):
+        return prefix + [i for i in range(n) if not placed[i]]
+
+    def bound(result):
+        return (result.rewards[result.determined].sum() + max_reward * np.count_nonzero(~result.determined)) / len(result.rewards)
+
+    initial = list(range(n)) if initial_order is None else evaluator.indices(initial_order)
+    best = [evaluator.score(initial), initial]
+    complete = True
+
+    def search(prefix, placed, result):
+        nonlocal complete
+        if result.determined.all():
+            order = completion(prefix, placed)
+            # Random actions are drawn in a different sequence when some games stop early: score the whole order again.
+            score = result.mean_reward if not result.n_random_actions.any() else evaluator.score(order)
+            if score > best[0]:
+                best[:] = [score, order]
+            return
+        candidates = [i for i in np.flatnonzero(~placed) if not implies[i, placed].any()
+            and (not prefix or actions[i] != actions[prefix[-1]] or i > prefix[-1])]
+        children = []
+        for i in candidates:
+            if out_of_budget():
+                complete = False
+                return
+            child, child_placed = prefix + [int(i)], placed.copy()
+            child_placed[i] = True
+            child_result = evaluator.evaluate(completion(child, child_placed), len(child))
+            child_bound = bound(child_result)
+            if child_bound > best[0]:
+                children.append((child_bound, child, child_placed, child_result))
+        # Most promising children first, so that the bound improves sooner.
+        for child_bound, child, child_placed, child_result in sorted(children, key=lambda c: -c[0]):
+            if child_bound > best[0]:
+                search(child, child_placed, child_result)
+            if not complete:
+                return
+
+    placed = np.zeros(n, dtype=bool)
+    search([], placed, evaluator.evaluate(completion([], placed), 0))
+    return OrderingSolution([evaluator.args[i] for i in best[1]], float(best[0]), evaluator.n_evaluated - n_evaluated, complete)
+
+class _IncrementalScore:
+    """Score of the current order of a local search, which only replays the maps whose outcome a move may change.
+
+    The outcome on a map only depends on the actions chosen for the sets of valid arguments of its decisions. They are
+    kept (as ids of distinct sets) for every map, so a candidate order only replays the maps where it changes the action
+    of one of their sets. Maps with random actions are always replayed.
+    """
+    def __init__(self, evaluator: OrderingEvaluator, order_idx: List[int]):
+        self.evaluator = evaluator
+        self._set_ids = {}
+        self._sets = []
+        # Action of the current order for each set.
+        self._actions = np.zeros(0, dtype=int)
+        n_maps = evaluator.n_maps
+        self.rewards = np.zeros(n_maps)
+        self._random = np.zeros(n_maps, dtype=bool)
+        self._map_sets = [np.zeros(0, dtype=int)] * n_maps
+        self.order = list(order_idx)
+        self.commit(self._play(self.order, np.arange(n_maps)))
+
+    @property
+    def score(self) -> float:
+        return float(np.mean(self.rewards))
+
+    def _play(self, order_idx, maps):
+        log = []
+        result = self.evaluator.evaluate(order_idx, maps=maps, valid_log=log)
+        map_sets = {k: np.zeros(0, dtype=int) for k in maps}
+        if log:
+            envs = np.concatenate([envs for envs, _ in log])
+            valid = np.concatenate([valid for _, valid in log])
+            rows, first, inverse = np.unique(np.packbits(valid, axis=1), axis=0, return_index=True, return_inverse=True)
+            ids = np.array([self._set_id(row, valid[i]) for row, i in zip(rows, first)])
+            # Distinct (map, set) pairs, sorted by map.
+            pairs = np.unique(np.stack([envs, ids[inverse.ravel()]], axis=1), axis=0)
+            starts = np.flatnonzero(np.diff(pairs[:, 0], prepend=-1))
+            for k, sets in zip(pairs[starts, 0], np.split(pairs[:, 1], starts[1:])):
+                map_sets[k] = sets
+        return order_idx, maps, result, map_sets
+
+    def _set_id(self, packed: np.ndarray, valid: np.ndarray) -> int:
+        key = packed.tobytes()
+        if key not in self._set_ids:
+            self._set_ids[key] = len(self._sets)
+            self._sets.append(valid)
+        return self._set_ids[key]
+
+    def _set_actions(self, order_idx) -> np.ndarray:
+        if not self._sets:
+            return np.zeros(0, dtype=int)
+        return self.evaluator.policy(order_idx).lookup_batch(np.array(self._sets))
+
+    def propose(self, order_idx: List[int]):
+        """Score of a candidate order, and the changes to commit if it is accepted."""
+        if len(self._actions) < len(self._sets):
+            self._actions = self._set_actions(self.order)
+        changed = self._set_actions(order_idx) != self._actions
+        affected = np.flatnonzero([self._random[k] or changed[sets].any() for k, sets in enumerate(self._map_sets)])
+        if len(affected) == 0:
+            return self.score, (order_idx, affected, None, {})
+        play = self._play(order_idx, affected)
+        rewards = self.rewards.copy()
+        rewards[affected] = play[2].rewards
+        return float(np.mean(rewards)), play
+
+    def commit(self, play):
+        """Makes a proposed order the current one."""
+        order_idx, maps, result, map_sets = play
+        self.order = list(order_idx)
+        if result is not None:
+            self.rewards[maps] = result.rewards
+            self._random[maps] = result.n_random_actions > 0
+        for k, sets in map_sets.items():
+            self._map_sets[k] = sets
+        self._actions = self._set_actions(self.order)
+
+def _random_move(order: List[int], actions: np.ndarray, rng: np.random.Generator):
+    """Applies a random adjacent swap or insertion. Returns the new order and the moved argument, or None for a move
+    that cannot change the policy (swapping arguments that promote the same action)."""
+    n = len(order)
+    order = list(order)
+    if n < 2:
+        return None
+    if rng.random() < 0.5:
+        i = int(rng.integers(n - 1))
+        if actions[order[i]] == actions[order[i + 1]]:
+            return None
+        order[i], order[i + 1] = order[i + 1], order[i]
+        return order, order[i + 1]
+    i, j = rng.choice(n, size=2, replace=False)
+    arg = order.pop(i)
+    order.insert(j, arg)
+    return order, arg
+
+def local_search(
+        evaluator: OrderingEvaluator,
+        method: str = 'annealing',
+        initial_order: List[str] = None,
+        time_budget: float = 60.0,
+        max_evaluations: int = None,
+        patience: int = None,
+        temperature: float = 0.05,
+        cooling: float = 0.999,
+        tabu_tenure: int = None,
+        n_neighbours: int = 16,
+        seed: int = None
+    ) -> OrderingSolution:
+    """Anytime search of a good order with adjacent swaps and insertions (moving an argument to another position).
+    It returns the best order found when its budget runs out, or when it is interrupted (e.g., KeyboardInterrupt).
+
+    With 'annealing', a random move is accepted if it does not worsen the score, or otherwise with probability
+    exp(delta / temperature), and the temperature is multiplied by cooling after every move. With 'tabu', the best of
+    n_neighbours random moves is always taken, except those that move an argument moved in the last tabu_tenure iterations
+    (unless they improve the best order). A move is scored by replaying only the maps whose outcome it may change.
+
+    Args:
+        evaluator (OrderingEvaluator): the scores of the orders.
+        method (str, optional): 'annealing' or 'tabu'. Defaults to 'annealing'.
+        initial_order (List[str], optional): order to start from (e.g., learnt by a COAAAgent). Defaults to None (a random one).
+        time_budget (float, optional): maximum time in seconds. Defaults to 60.0.
+        max_evaluations (int, optional): maximum number of evaluations (of all or some of the maps). Defaults to None (no limit).
+        patience (int, optional): stop after this many iterations without improving the best order. Defaults to None (no limit).
+        temperature (float, optional): initial temperature of 'annealing'. Defaults to 0.05.
+        cooling (float, optional): cooling factor of 'annealing'. Defaults to 0.999.
+        tabu_tenure (int, optional): iterations an argument stays tabu after being moved. Defaults to None (a third of the arguments).
+        n_neighbours (int, optional): moves sampled at every iteration of 'tabu'. Defaults to 16.
+        seed (int, optional): seed of the moves. Defaults to None.
+
+    Returns:
+        OrderingSolution: the best order found.
+    """
+    assert method in ('annealing', 'tabu'), "unknown method {}".format(method)
+    rng = np.random.default_rng(seed)
+    n = len(evaluator.args)
+    actions = evaluator.actions
+    tabu_tenure = max(1, n // 3) if tabu_tenure is None else tabu_tenure
+    n_evaluated = evaluator.n_evaluated
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+
+    initial = list(rng.permutation(n)) if initial_order is None else evaluator.indices(initial_order)
+    state = _IncrementalScore(evaluator, initial)
+    best = [state.score, list(state.order)]
+    # Iteration until which each argument is tabu.
+    tabu_until = np.zeros(n, dtype=int)
+    iteration = since_best = 0
+    complete = False
+    try:
+        while True:
+            if ((deadline is not None and time.perf_counter() > deadline)
+                    or (max_evaluations is not None and evaluator.n_evaluated - n_evaluated >= max_evaluations)):
+                break
+            if patience is not None and since_best >= patience:
+                complete = True
+                break
+            iteration += 1
+            since_best += 1
+            if method == 'annealing':
+                move = _random_move(state.order, actions, rng)
+                if move is None:
+                    continue
+                score, play = state.propose(move[0])
+                delta = score - state.score
+                if delta >= 0 or rng.random() < math.exp(delta / max(temperature, 1e-12)):
+                    state.commit(play)
+                temperature *= cooling
+            else:
+                chosen = None
+                for _ in range(n_neighbours):
+                    move = _random_move(state.order, actions, rng)
+                    if move is None:
+                        continue
+                    score, play = state.propose(move[0])
+                    if tabu_until[move[1]] > iteration and score <= best[0]:
+                        continue
+                    if chosen is None or score > chosen[0]:
+                        chosen = (score, play, move[1])
+                if chosen is None:
+                    continue
+                state.commit(chosen[1])
+                tabu_until[chosen[2]] = iteration + tabu_tenure
+            if state.score > best[0]:
+                best[:] = [state.score, list(state.order)]
+                since_best = 0
+    except KeyboardInterrupt:
+        pass
+    return OrderingSolution([evaluator.args[i] for i in best[1]], float(best[0]), evaluator.n_evaluated - n_evaluated, complete)
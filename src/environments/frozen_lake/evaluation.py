@@ -0,0 +1,138 @@
+import numpy as np
+from typing import Callable, List, NamedTuple, Union
+
+from argumentation.classes import ArgumentationFramework, ValuebasedArgumentationFramework
+from argumentation.policy import NO_EXTENSION, CompiledPolicy, compile_policy
+from argumentation.rules import ArgumentRules
+from environments.frozen_lake.utils import fl_batch_premises, fl_premises, fl_rules
+from environments.frozen_lake.vec_env import FrozenLakeVecEnv
+
+class VAFEvaluation(NamedTuple):
+    # Total reward of the game on each map.
+    rewards: np.ndarray
+    # Whether the goal was reached on each map.
+    success: np.ndarray
+    # Random actions taken on each map because the grounded extension was empty.
+    n_random_actions: np.ndarray
+    # Whether the outcome on each map does not depend on the free arguments (see evaluate_policy).
+    determined: np.ndarray
+
+    @property
+    def mean_reward(self) -> float:
+        return float(np.mean(self.rewards))
+
+    @property
+    def success_rate(self) -> float:
+        return float(np.mean(self.success))
+
+def evaluate_policy(
+        policy: CompiledPolicy,
+        maps: Union[List, FrozenLakeVecEnv],
+        premises_to_args: Callable = fl_rules,
+        multiple_visits: bool = True,
+        max_episode_steps: int = 100,
+        rng: np.random.Generator = None,
+        free_args: np.ndarray = None,
+        valid_log: list = None
+    ) -> VAFEvaluation:
+    """Plays a compiled policy on K Frozen Lake maps at once, as FLAAAgent with fl_observation_to_premises would.
+    Each step computes the premises, the valid arguments and the actions of all the maps with array operations.
+
+    Partial orders are evaluated with free_args, the arguments whose position is not fixed yet, which must be the least
+    preferred ones of the policy (e.g., a decision list that starts with the fixed prefix). The game on a map is stopped,
+    and marked as not determined, as soon as its action depends on the free arguments: some of them are valid, but none
+    of the others. When the grounded extension is empty, the action is drawn from the actions of policy.args, with
+    repetitions (e.g., two arguments that promote the same action make it twice as likely), as AAAgent does.
+
+    Args:
+        policy (CompiledPolicy): the policy (e.g., AAAgent.policy).
+        maps (Union[List, FrozenLakeVecEnv]): maps of the same size (see FrozenLakeVecEnv), or a FrozenLakeVecEnv to reuse.
+        premises_to_args (Callable, optional): ArgumentRules over (some of) fl_premises, or a function of a premises dict. Defaults to fl_rules.
+        multiple_visits (bool, optional): see FrozenLakeVecEnv (ignored if maps is a FrozenLakeVecEnv). Defaults to True.
+        max_episode_steps (int, optional): see FrozenLakeVecEnv (ignored if maps is a FrozenLakeVecEnv). Defaults to 100.
+        rng (np.random.Generator, optional): generator of the random actions. Defaults to None (a new unseeded one).
+        free_args (np.ndarray, optional): Boolean mask over policy.args of the free arguments. Defaults to None (none).
+        valid_log (list, optional): if given, the valid arguments of every decision are appended to it, as pairs (indices
+            of the maps, Boolean matrix over policy.args). The outcome on a map only changes with the policy if the action
+            of one of its sets of valid arguments does. Defaults to None.
+
+    Returns:
+        VAFEvaluation: rewards, successes and random actions of every map (the reward so far on undetermined maps).
+    """
+    env = maps if isinstance(maps, FrozenLakeVecEnv) else FrozenLakeVecEnv(maps, multiple_visits, max_episode_steps, compact=True)
+    rng = np.random.default_rng() if rng is None else rng
+    if isinstance(premises_to_args, ArgumentRules):
+        columns = [fl_premises.index(premise) for premise in premises_to_args.premises]
+    # As in AAAgent.get_extension_action, random actions are drawn from the actions of all the arguments, with repetitions.
+    random_actions = np.sort(policy.actions)
+
+    obs = env.reset()
+    visited = np.zeros((env.num_envs, env.map_size * env.map_size), dtype=bool)
+    rewards = np.zeros(env.num_envs)
+    n_random_actions = np.zeros(env.num_envs, dtype=int)
+    determined = np.ones(env.num_envs, dtype=bool)
+    actions = np.zeros(env.num_envs, dtype=int)
+    while not env.dones.all():
+        live = np.flatnonzero(~env.dones)
+        premises = fl_batch_premises(obs[live], visited[live])
+        if isinstance(premises_to_args, ArgumentRules):
+            valid = premises_to_args.mask(premises[:, columns], policy.args)
+        else:
+            valid = np.array([np.isin(policy.args, premises_to_args(dict(zip(fl_premises, row)))) for row in premises], dtype=bool)
+        if free_args is not None:
+            undetermined = (valid & free_args).any(axis=1) & ~(valid & ~free_args).any(axis=1)
+            if undetermined.any():
+                determined[live[undetermined]] = False
+                env.stop(live[undetermined])
+                live, valid = live[~undetermined], valid[~undetermined]
+                if len(live) == 0:
+                    break
+        if valid_log is not None:
+            valid_log.append((live, valid))
+        live_actions = policy.lookup_batch(valid)
+        empty = live_actions == NO_EXTENSION
+        live_actions[empty] = rng.choice(random_actions, size=int(empty.sum()))
+        n_random_actions[live[empty]] += 1
+        actions[live] = live_actions
+        visited[live, env.s[live]] = True
+        obs, step_rewards, _, _ = env.step(actions)
+        rewards += step_rewards
+    return VAFEvaluation(rewards, env.s == env.map_size * env.map_size - 1, n_random_actions, determined)
+
+def evaluate_vaf(
+        order: List[str],
+        maps: List,
+        af: ArgumentationFramework,
+        arg_actions: dict,
+        premises_to_args: Callable = fl_rules,
+        multiple_visits: bool = True,
+        max_episode_steps: int = 100,
+        rng: np.random.Generator = None
+    ) -> VAFEvaluation:
+    """Plays the VAF of an ordering of the arguments on K Frozen Lake maps at once (see evaluate_policy).
+    The maps can have different sizes: those of the same size are played together.
+
+    Args:
+        order (List[str]): order of the arguments of the VAF, from the most preferred.
+        maps (List): the maps (e.g., generate_random_map outputs or env.desc).
+        af (ArgumentationFramework): the AF whose arguments are ordered.
+        arg_actions (dict): action promoted by each argument.
+        (see evaluate_policy for the rest)
+
+    Returns:
+        VAFEvaluation: rewards, successes and random actions of every map, in the order of maps.
+    """
+    vaf = ValuebasedArgumentationFramework.from_adjacency(af.args, af.mat)
+    vaf.order = list(order)
+    policy = compile_policy(vaf, arg_actions)
+    rng = np.random.default_rng() if rng is None else rng
+
+    sizes = np.array([len(desc) for desc in maps])
+    rewards = np.zeros(len(maps))
+    success = np.zeros(len(maps), dtype=bool)
+    n_random_actions = np.zeros(len(maps), dtype=int)
+    for size in np.unique(sizes):
+        group = np.flatnonzero(sizes == size)
+        result = evaluate_policy(policy, [maps[i] for i in group], premises_to_args, multiple_visits, max_episode_steps, rng)
+        rewards[group], success[group], n_random_actions[group] = result.rewards, result.success, result.n_random_actions
+    return VAFEvaluation(rewards, success, n_random_actions, np.ones(len(maps), dtype=bool))
@@ -1,6 +1,8 @@
 import gym
 import numpy as np
-from environments.frozen_lake.utils import FLActions
+from typing import List
+from gym.envs.toy_text.frozen_lake import generate_random_map
+from environments.frozen_lake.utils import FLActions, FLTile, fl_desc_to_tiles, fl_neighbour_observations, fl_pack_neighbours, fl_transition_table
 
 class FrozenLakeWrapper(gym.Wrapper):
     def __init__(self, env: gym.Env, multiple_visits = True):
@@ -99,19 +101,34 @@ class FrozenLakeMapObservationWrapper(gym.ObservationWrapper):
 
 class FrozenLakeNeighboursObservationWrapper(gym.ObservationWrapper):
     """
-    Includes the neighbours in the observation
+    Includes the neighbours in the observation.
+    The neighbours of every tile are looked up in a (n*n, 24) table, built at the first reset.
+
+    The observation is double-buffered: it is a read-only view that stays valid until the next-but-one step (or reset).
+    Copy it if it has to be kept for longer.
     """
     def __init__(self, env: gym.Env):
         super().__init__(env)
+        self._neighbour_obs = None
+    def reset(self, **kwargs):
+        if self._neighbour_obs is None:
+            self._neighbour_obs = fl_neighbour_observations(fl_desc_to_tiles(self.desc))
+            self._buffers = np.zeros((2, 24 + self.nrow * self.ncol), dtype=bool)
+            self._views = [buffer.view() for buffer in self._buffers]
+            for view in self._views:
+                view.flags.writeable = False
+            # Position bit set in each buffer, and buffer holding the last observation.
+            self._pos = [24, 24]
+            self._current = 0
+        return super().reset(**kwargs)
     def observation(self, obs):
-        neighbours = self.get_neighbours(self.desc, self.s)
-        holes = neighbours == 'H'
-        margin = neighbours == '0'
-        safe = (neighbours == 'F') + (neighbours == 'S') + (neighbours == 'G')
-        pos = np.zeros(self.nrow * self.ncol)
-        pos[self.s] = 1
-        # return np.concatenate([pos]).astype(bool)
-        return np.concatenate([safe, holes, margin,pos]).astype(bool)
+        self._current = 1 - self._current
+        buffer = self._buffers[self._current]
+        buffer[self._pos[self._current]] = False
+        self._pos[self._current] = 24 + self.s
+        buffer[:24] = self._neighbour_obs[self.s]
+        buffer[24 + self.s] = True
+        return self._views[self._current]
     
     @staticmethod
     def get_neighbours(tiles, index):
@@ -125,4 +142,155 @@ class FrozenLakeNeighboursObservationWrapper(gym.ObservationWrapper):
         res[1:4] = padded[row-1, col-1:col+2]
         res[4] = padded[row, col+1]
         res[5:9] = np.flip(padded[row+1, col-1:col+2])
-        return res
\ No newline at end of file
+        return res
+
+class FrozenLakeEnv(gym.Env):
+    """
+    Non-slippery Frozen Lake in a single layer, with the behaviour of new_fl_env's wrapper chain (FrozenLake-v1 +
+    FrozenLakeWrapper + FrozenLakeNeighboursObservationWrapper + FrozenLakeRewardWrapper):
+    - Observations are Boolean vectors concat[safe (8), holes (8), margin (8), one-hot position (n*n)].
+      With compact=True, they are [tile index, neighbour code] instead (see fl_is_compact).
+      They are double-buffered, read-only views that stay valid until the next-but-one step (or reset).
+    - The reward is -1 in a hole, 1 in the goal and 0 otherwise.
+    - An episode ends in a hole, in the goal, after max_episode_steps moves, when the agent loops over the same
+      two tiles for 6 steps, or (if multiple_visits is False) when it repeats an action from the same tile.
+      The last two checks do not count towards max_episode_steps.
+    Tiles are stored as FLTile codes and moves are looked up in a transition table, so a step is integer arithmetic.
+    """
+
+    metadata = {"render_modes": ["human", "ansi"]}
+
+    def __init__(self, desc: List[str] = None, map_size: int = 8, p: float = 0.8, multiple_visits: bool = True, max_episode_steps: int = 100, compact: bool = False):
+        """Initialise the FrozenLakeEnv.
+
+        Args:
+            desc (List[str], optional): the map (e.g., the output of generate_random_map). Defaults to None (a random map).
+            map_size (int, optional): size of the random map, if desc is None. Defaults to 8.
+            p (float, optional): probability of a tile being frozen in the random map, if desc is None. Defaults to 0.8.
+            multiple_visits (bool, optional): if False, repeating an action from the same tile ends the episode. Defaults to True.
+            max_episode_steps (int, optional): maximum number of moves per episode. Defaults to 100.
+            compact (bool, optional): if True, observations are [tile index, neighbour code], whose size does not depend on the map size. Defaults to False.
+        """
+        if desc is None:
+            desc = generate_random_map(map_size, p)
+        self.desc = np.asarray(desc, dtype='c')
+        self.nrow, self.ncol = self.desc.shape
+        self.multiple_visits = multiple_visits
+        self.max_episode_steps = max_episode_steps
+        self.compact = compact
+
+        n_tiles = self.nrow * self.ncol
+        self._tiles = fl_desc_to_tiles(self.desc).ravel()
+        self._start = int(np.argmax(self._tiles == FLTile.START))
+        self._transitions = fl_transition_table(self.nrow).tolist()
+        # Reward and termination of entering each tile.
+        self._rewards = np.where(self._tiles == FLTile.HOLE, -1, np.where(self._tiles == FLTile.GOAL, 1, 0)).tolist()
+        self._terminal = ((self._tiles == FLTile.HOLE) | (self._tiles == FLTile.GOAL)).tolist()
+        self._neighbour_obs = fl_neighbour_observations(self._tiles.reshape(self.nrow, self.ncol))
+        self._neighbour_codes = fl_pack_neighbours(self._neighbour_obs)
+
+        self._buffers = np.zeros((2, 2), dtype=np.int64) if compact else np.zeros((2, 24 + n_tiles), dtype=bool)
+        self._views = [buffer.view() for buffer in self._buffers]
+        for view in self._views:
+            view.flags.writeable = False
+        # Position bit set in each buffer, and buffer holding the last observation.
+        self._pos = [24, 24]
+        self._current = 0
+
+        if compact:
+            self.observation_space = gym.spaces.MultiDiscrete([n_tiles, 1 << 24])
+        else:
+            self.observation_space = gym.spaces.MultiBinary(24 + n_tiles)
+        self.action_space = gym.spaces.Discrete(len(FLActions))
+
+        self.s = self._start
+        self.t = 0
+        self.elapsed_steps = 0
+        self.lastaction = None
+        self._previous_actions = np.zeros((n_tiles, len(FLActions)), dtype=bool)
+        self.hist = []
+
+    @property
+    def previous_actions(self) -> np.ndarray:
+        """(nrow, ncol, 4) Boolean array with the actions already taken from each tile."""
+        return self._previous_actions.reshape(self.nrow, self.ncol, len(FLActions))
+
+    def reset(self, **kwargs):
+        self.s = self._start
+        self.t = 0
+        self.elapsed_steps = 0
+        self.lastaction = None
+        self._previous_actions[:] = False
+        self.hist = []
+        return self._get_obs()
+
+    def step(self, action):
+        action = int(action)
+        self.t += 1
+        # Keep the last 6 positions before each step and end the episode if they alternate between (at most) two tiles.
+        self.hist.append(self.s)
+        if len(self.hist) > 6:
+            del self.hist[0]
+        if self.hist[-2:] == self.hist[-4:-2] == self.hist[-6:-4]:
+            return self._get_obs(), 0, True, self._get_info()
+
+        if not self.multiple_visits and self._previous_actions[self.s, action]:
+            return self._get_obs(), 0, True, self._get_info()
+
+        self._previous_actions[self.s, action] = True
+        self.s = self._transitions[self.s][action]
+        self.lastaction = action
+        self.elapsed_steps += 1
+        done = self._terminal[self.s] or self.elapsed_steps >= self.max_episode_steps
+        return self._get_obs(), self._rewards[self.s], done, self._get_info()
+
+    def index_to_coordinate(self, index):
+        return divmod(index, self.ncol)
+
+    @property
+    def coordinates(self):
+        """
+        Returns the current state in coordinate form.
+        """
+        return divmod(self.s, self.ncol)
+
+    def in_hole(self):
+        """
+        True if the current cell is a hole. False otherwise.
+        """
+        return self._tiles[self.s] == FLTile.HOLE
+
+    def in_goal(self):
+        """
+        True if the current cell is the goal. False otherwise.
+        """
+        return self._tiles[self.s] == FLTile.GOAL
+
+    def render(self, mode="human"):
+        assert mode in self.metadata["render_modes"]
+        rows = [[char.decode() for char in row] for row in self.desc]
+        row, col = self.coordinates
+        rows[row][col] = "\x1b[41m{}\x1b[0m".format(rows[row][col])
+        header = "  ({})\n".format(FLActions(self.lastaction).name.capitalize()) if self.lastaction is not None else "\n"
+        text = header + "\n".join("".join(row) for row in rows) + "\n"
+        if mode == "ansi":
+            return text
+        print(text)
+
+    def _get_obs(self) -> np.ndarray:
+        self._current = 1 - self._current
+        buffer = self._buffers[self._current]
+        if self.compact:
+            buffer[0] = self.s
+            buffer[1] = self._neighbour_codes[self.s]
+            return self._views[self._current]
+        buffer[self._pos[self._current]] = False
+        self._pos[self._current] = 24 + self.s
+        buffer[:24] = self._neighbour_obs[self.s]
+        buffer[24 + self.s] = True
+        return self._views[self._current]
+
+    def _get_info(self):
+        return {
+            't': self.t
+            }
@@ -0,0 +1,230 @@
+import json
+import os
+import numpy as np
+from typing import List, Tuple
+from environments.frozen_lake.utils import FLTile
+
+# Files of a map bank directory.
+_PARAMS_FILE = 'params.json'
+_HOLES_FILE = 'holes.npy'
+_INDEX_FILE = 'index.npy'
+
+# Metadata stored for every map.
+index_dtype = np.dtype([
+    ('hole_density', np.float32),
+    ('shortest_path', np.int16),  # Number of moves from start to goal, or -1 if the goal is unreachable.
+    ('solvable', bool),
+])
+
+def generate_holes(count: int, map_size: int, p: float, rng: np.random.Generator) -> np.ndarray:
+    """Samples the holes of random maps, in the same way as gym's generate_random_map but without rejection.
+
+    Args:
+        count (int): number of maps.
+        map_size (int): size of the maps.
+        p (float): probability that a tile is frozen.
+        rng (np.random.Generator): random generator.
+
+    Returns:
+        np.ndarray: (count, map_size, map_size) Boolean array with the holes. The start (top left) and goal (bottom right) are never holes.
+    """
+    holes = rng.random((count, map_size, map_size)) >= min(1, p)
+    holes[:, 0, 0] = False
+    holes[:, -1, -1] = False
+    return holes
+
+def shortest_paths(holes: np.ndarray) -> np.ndarray:
+    """Length of the shortest path from the start (top left) to the goal (bottom right) of a batch of maps.
+    It runs a breadth-first search on all the maps at once by growing the set of reachable tiles.
+
+    Args:
+        holes (np.ndarray): (K, n, n) Boolean array with the holes.
+
+    Returns:
+        np.ndarray: (K,) number of moves of the shortest path, or -1 if the goal is unreachable.
+    """
+    passable = ~holes
+    reached = np.zeros_like(holes)
+    reached[:, 0, 0] = True
+    lengths = np.full(len(holes), -1, dtype=np.int16)
+    lengths[reached[:, -1, -1]] = 0
+    grown = np.empty_like(reached)
+    for d in range(1, holes.shape[1] * holes.shape[2]):
+        grown[:] = reached
+        grown[:, 1:, :] |= reached[:, :-1, :]
+        grown[:, :-1, :] |= reached[:, 1:, :]
+        grown[:, :, 1:] |= reached[:, :, :-1]
+        grown[:, :, :-1] |= reached[:, :, 1:]
+        grown &= passable
+        if np.array_equal(grown, reached):
+            break
+        lengths[(lengths < 0) & grown[:, -1, -1]] = d
+        reached, grown = grown, reached
+    return lengths
+
+class MapBank:
+    """
+    Bank of pre-generated Frozen Lake maps, stored in a directory:
+    - params.json: map size, p, seed and number of maps.
+    - holes.npy: bit-packed holes of every map (one row of bytes per map), opened as a read-only memory map.
+    - index.npy: metadata of every map (see index_dtype).
+    """
+    def __init__(self, path: str):
+        """Opens a map bank created with MapBank.build.
+
+        Args:
+            path (str): directory of the bank.
+        """
+        self.path = path
+        with open(os.path.join(path, _PARAMS_FILE)) as f:
+            self.params = json.load(f)
+        self.map_size = self.params['map_size']
+        self.holes = np.load(os.path.join(path, _HOLES_FILE), mmap_mode='r')
+        self.index = np.load(os.path.join(path, _INDEX_FILE))
+
+    @classmethod
+    def build(cls,
+        path: str,
+        count: int,
+        map_size: int = 8,
+        p: float = 0.8,
+        seed: int = 0,
+        only_solvable: bool = True,
+        batch_size: int = 4096
+    ):
+        """Generates a bank of maps. The same (count, map_size, p, seed, only_solvable) always produce the same bank.
+
+        Args:
+            path (str): directory of the bank. It is created if it does not exist.
+            count (int): number of maps.
+            map_size (int, optional): size of the maps. Defaults to 8.
+            p (float, optional): probability that a tile is frozen. Defaults to 0.8.
+            seed (int, optional): seed of the random generator. Defaults to 0.
+            only_solvable (bool, optional): keep only maps where the goal is reachable, like generate_random_map. Defaults to True.
+            batch_size (int, optional): number of maps generated at once. Defaults to 4096.
+
+        Returns:
+            MapBank: the bank.
+        """
+        os.makedirs(path, exist_ok=True)
+        n_bytes = (map_size * map_size + 7) // 8
+        holes = np.lib.format.open_memmap(os.path.join(path, _HOLES_FILE), mode='w+', dtype=np.uint8, shape=(count, n_bytes))
+        index = np.zeros(count, dtype=index_dtype)
+        rng = np.random.default_rng(seed)
+
+        filled = 0
+        while filled < count:
+            batch = generate_holes(batch_size, map_size, p, rng)
+            lengths = shortest_paths(batch)
+            if only_solvable:
+                batch, lengths = batch[lengths >= 0], lengths[lengths >= 0]
+            batch, lengths = batch[:count - filled], lengths[:count - filled]
+            new = slice(filled, filled + len(batch))
+            holes[new] = np.packbits(batch.reshape(len(batch), -1), axis=1)
+            index['hole_density'][new] = batch.mean(axis=(1, 2))
+            index['shortest_path'][new] = lengths
+            index['solvable'][new] = lengths >= 0
+            filled += len(batch)
+        holes.flush()
+        del holes
+
+        np.save(os.path.join(path, _INDEX_FILE), index)
+        params = {'map_size': map_size, 'p': p, 'seed': seed, 'count': count, 'only_solvable': only_solvable}
+        with open(os.path.join(path, _PARAMS_FILE), 'w') as f:
+            json.dump(params, f)
+        return cls(path)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def tiles(self, indices) -> np.ndarray:
+        """FLTile codes of some maps (e.g., for FrozenLakeVecEnv).
+
+        Args:
+            indices: index or indices of the maps.
+
+        Returns:
+            np.ndarray: (k, n, n) array of FLTile codes (or (n, n) for a single index).
+        """
+        n = self.map_size
+        packed = self.holes[indices]
+        holes = np.unpackbits(np.atleast_2d(packed), axis=1, count=n * n).reshape(-1, n, n).astype(bool)
+        tiles = np.where(holes, FLTile.HOLE, FLTile.FROZEN).astype(np.int8)
+        tiles[:, 0, 0] = FLTile.START
+        tiles[:, -1, -1] = FLTile.GOAL
+        return tiles if packed.ndim == 2 else tiles[0]
+
+    def desc(self, index: int) -> List[str]:
+        """Description of a map, in the format of generate_random_map (e.g., for new_fl_env)."""
+        chars = np.array(['0', 'S', 'F', 'H', 'G'])[self.tiles(index)]
+        return [''.join(row) for row in chars]
+
+    def filter(self,
+        solvable: bool = None,
+        min_density: float = None,
+        max_density: float = None,
+        min_path: int = None,
+        max_path: int = None
+    ) -> np.ndarray:
+        """Indices of the maps whose metadata satisfy all the given conditions (bounds are inclusive)."""
+        keep = np.ones(len(self), dtype=bool)
+        if solvable is not None:
+            keep &= self.index['solvable'] == solvable
+        if min_density is not None:
+            keep &= self.index['hole_density'] >= min_density
+        if max_density is not None:
+            keep &= self.index['hole_density'] <= max_density
+        if min_path is not None:
+            keep &= self.index['shortest_path'] >= min_path
+        if max_path is not None:
+            keep &= self.index['shortest_path'] <= max_path
+        return np.flatnonzero(keep)
+
+    def sample(self, count: int, rng: np.random.Generator = None, indices: np.ndarray = None, replace: bool = True) -> np.ndarray:
+        """Samples maps uniformly.
+
+        Args:
+            count (int): number of maps.
+            rng (np.random.Generator, optional): random generator. Defaults to None (a new unseeded one).
+            indices (np.ndarray, optional): candidate maps (e.g., the output of filter). Defaults to None (all maps).
+            replace (bool, optional): sample with replacement. Defaults to True.
+
+        Returns:
+            np.ndarray: indices of the sampled maps.
+        """
+        rng = np.random.default_rng() if rng is None else rng
+        indices = np.arange(len(self)) if indices is None else np.asarray(indices)
+        return rng.choice(indices, size=count, replace=replace)
+
+    def stratified_sample(self,
+        count: int,
+        key: str = 'shortest_path',
+        bins: int = 4,
+        rng: np.random.Generator = None,
+        indices: np.ndarray = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Samples (with replacement) the same number of maps from each quantile bin of a metadata attribute.
+
+        Args:
+            count (int): number of maps per bin.
+            key (str, optional): attribute of the index ('hole_density' or 'shortest_path'). Defaults to 'shortest_path'.
+            bins (int, optional): number of bins. Defaults to 4.
+            rng (np.random.Generator, optional): random generator. Defaults to None (a new unseeded one).
+            indices (np.ndarray, optional): candidate maps. Defaults to None (all maps).
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: indices of the sampled maps and the bin of each of them. Empty bins are skipped.
+        """
+        rng = np.random.default_rng() if rng is None else rng
+        indices = np.arange(len(self)) if indices is None else np.asarray(indices)
+        values = self.index[key][indices]
+        # Repeated edges (ties in the attribute) are merged, so there may be fewer bins.
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+        strata = np.searchsorted(edges, values, side='left')
+        sampled, labels = [], []
+        for b in range(len(edges) + 1):
+            candidates = indices[strata == b]
+            if len(candidates):
+                sampled.append(rng.choice(candidates, size=count))
+                labels.append(np.full(count, b))
+        return np.concatenate(sampled), np.concatenate(labels)
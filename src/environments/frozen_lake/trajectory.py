@@ -0,0 +1,140 @@
+import numpy as np
+from typing import Iterator, List
+from environments.frozen_lake.utils import FLActions, fl_observation_tile, fl_plot_run
+
+# Action recorded for the terminal state (no action is taken).
+NO_ACTION = -1
+
+class Trajectory:
+    """Struct-of-arrays record of a Frozen Lake episode (clear it to record the next one): the tile of the agent, the action it took from there, the reward
+    it received and the time step. The buffers are preallocated and grow geometrically, so recording is cheap enough to
+    leave on. Rendering is decoupled from recording: frames are only produced on demand (see frames and render_ansi).
+    """
+    def __init__(self, desc=None, capacity: int = 128):
+        """Initialise the Trajectory.
+
+        Args:
+            desc (optional): map of the episode (e.g., env.desc), only needed to render. Defaults to None.
+            capacity (int, optional): initial number of steps of the buffers. Defaults to 128.
+        """
+        self.desc = None if desc is None else np.asarray(desc, dtype='c')
+        self._tile = np.empty(capacity, dtype=np.int32)
+        self._action = np.empty(capacity, dtype=np.int8)
+        self._reward = np.empty(capacity, dtype=np.float32)
+        self._t = np.empty(capacity, dtype=np.int32)
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    @property
+    def tile(self) -> np.ndarray:
+        return self._tile[:self._len]
+
+    @property
+    def action(self) -> np.ndarray:
+        """Action taken from each tile (NO_ACTION in terminal states)."""
+        return self._action[:self._len]
+
+    @property
+    def reward(self) -> np.ndarray:
+        return self._reward[:self._len]
+
+    @property
+    def t(self) -> np.ndarray:
+        return self._t[:self._len]
+
+    def record(self, observation, action: int, reward: float, t: int):
+        """Appends a step.
+
+        Args:
+            observation (_type_): observation (full or compact) of the tile the action was taken from.
+            action (int): the action (or NO_ACTION / None in a terminal state).
+            reward (float): the reward received after the action.
+            t (int): the time step.
+        """
+        if self._len == len(self._tile):
+            self._grow()
+        i = self._len
+        self._tile[i] = fl_observation_tile(observation)
+        self._action[i] = NO_ACTION if action is None else action
+        self._reward[i] = reward
+        self._t[i] = t
+        self._len += 1
+
+    def clear(self):
+        """Forgets all the steps (the buffers are kept)."""
+        self._len = 0
+
+    def _grow(self):
+        capacity = 2 * max(len(self._tile), 1)
+        for name in ('_tile', '_action', '_reward', '_t'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._len] = old[:self._len]
+            setattr(self, name, new)
+
+    def save(self, path: str):
+        """Saves the trajectory (and its map, if any) as a .npz file."""
+        arrays = {'tile': self.tile, 'action': self.action, 'reward': self.reward, 't': self.t}
+        if self.desc is not None:
+            arrays['desc'] = self.desc
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str):
+        """Loads a trajectory saved with save."""
+        with np.load(path) as data:
+            trajectory = cls(data['desc'] if 'desc' in data else None, capacity=max(len(data['tile']), 1))
+            n = len(data['tile'])
+            trajectory._tile[:n] = data['tile']
+            trajectory._action[:n] = data['action']
+            trajectory._reward[:n] = data['reward']
+            trajectory._t[:n] = data['t']
+            trajectory._len = n
+        return trajectory
+
+    def render_ansi(self, i: int) -> str:
+        """Text frame of step i: the map with the agent highlighted, followed by the step information.
+
+        Args:
+            i (int): index of the step.
+
+        Returns:
+            str: the frame, with ANSI colour codes.
+        """
+        assert self.desc is not None, "a map is needed to render"
+        ncol = self.desc.shape[1]
+        rows = [[char.decode() for char in row] for row in self.desc]
+        row, col = divmod(int(self._tile[i]), ncol)
+        rows[row][col] = "\x1b[41m{}\x1b[0m".format(rows[row][col])
+        action = int(self._action[i])
+        action_str = 'None' if action == NO_ACTION else FLActions(action).name
+        total_reward = float(np.sum(self._reward[:i+1]))
+        info = "Time step: {} | Action: {} | Total reward: {:.4f}".format(int(self._t[i]), action_str, total_reward)
+        return "\n".join("".join(row) for row in rows) + "\n" + info
+
+    def frames(self, start: int = 0, stop: int = None) -> Iterator[str]:
+        """Lazily yields the text frames of the steps in [start, stop)."""
+        stop = self._len if stop is None else min(stop, self._len)
+        for i in range(start, stop):
+            yield self.render_ansi(i)
+
+    def to_animation_data(self) -> List[tuple]:
+        """Converts the trajectory into the (tile from, tile to, time, action, total reward) frames of fl_plot_run,
+        with coordinates instead of observations."""
+        assert self.desc is not None, "a map is needed to render"
+        coords = [divmod(int(tile), self.desc.shape[1]) for tile in self.tile]
+        total = np.cumsum(self.reward)
+        data = []
+        for i in range(self._len):
+            if self._action[i] == NO_ACTION:
+                data.append((coords[i], 'None', int(self._t[i]), 'None', 0))
+            else:
+                following = coords[i+1] if i + 1 < self._len else coords[i]
+                data.append((coords[i], following, int(self._t[i]), int(self._action[i]), float(total[i])))
+        return data
+
+    def animate(self, as_html: bool = False):
+        """Matplotlib animation of the trajectory (see fl_plot_run). Its frames are drawn lazily, when it is played or saved."""
+        return fl_plot_run(self.desc, *zip(*self.to_animation_data()), as_html=as_html)
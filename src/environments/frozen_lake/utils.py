@@ -4,10 +4,8 @@ from typing import Tuple, List
 from enum import IntEnum
 import gym
 import numpy as np
-from IPython.display import HTML
-import matplotlib.pyplot as plt
-import matplotlib.animation
 from copy import deepcopy
+from argumentation.rules import compile_rules
 
 
 # Frozen Lake observation. E.g., (4,6)
@@ -32,12 +30,119 @@ class Direction(IntEnum):
     LEFT         = 0
     TOP_LEFT     = 1
     TOP          = 2
-    TOP_RIGHT    = 2
+    TOP_RIGHT    = 3
     RIGHT        = 4
     BOTTOM_RIGHT = 5
     BOTTOM       = 6
     BOTTOM_LEFT  = 7
 
+# Integer codes of the tiles, used by the array-based environments. MARGIN pads the map.
+class FLTile(IntEnum):
+    MARGIN = 0
+    START  = 1
+    FROZEN = 2
+    HOLE   = 3
+    GOAL   = 4
+
+fl_tile_codes = {'S': FLTile.START, 'F': FLTile.FROZEN, 'H': FLTile.HOLE, 'G': FLTile.GOAL}
+
+def fl_desc_to_tiles(desc) -> np.ndarray:
+    """Converts a map (list of strings or array of characters/bytes) into an array of FLTile codes."""
+    chars = np.array([list(row) for row in desc]) if isinstance(desc[0], str) else np.asarray(desc)
+    chars = chars.astype('U1')
+    tiles = np.zeros(chars.shape, dtype=np.int8)
+    for char, code in fl_tile_codes.items():
+        tiles[chars == char] = code
+    return tiles
+
+def fl_neighbour_table(map_size: int) -> np.ndarray:
+    """Indices of the 8 neighbours (in Direction order) of every tile in the padded map, flattened.
+
+    Args:
+        map_size (int): size of the map (without padding).
+
+    Returns:
+        np.ndarray: (map_size**2, 8) array of indices into the flattened (map_size+2)x(map_size+2) padded map.
+    """
+    # (row, column) offsets, in Direction order.
+    offsets = np.array([(0, -1), (-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1)])
+    rows, cols = np.divmod(np.arange(map_size * map_size), map_size)
+    return (rows[:, None] + 1 + offsets[:, 0]) * (map_size + 2) + cols[:, None] + 1 + offsets[:, 1]
+
+def fl_transition_table(map_size: int) -> np.ndarray:
+    """Destination of every (tile, action) in a non-slippery map, where moving against the border leaves the agent in place.
+
+    Args:
+        map_size (int): size of the map.
+
+    Returns:
+        np.ndarray: (map_size**2, 4) array, where table[tile, action] is the index of the next tile.
+    """
+    # Row and column displacement of each action (indexed by FLActions).
+    deltas = np.array([(0, -1), (1, 0), (0, 1), (-1, 0)])
+    rows, cols = np.divmod(np.arange(map_size * map_size), map_size)
+    dest_rows = np.clip(rows[:, None] + deltas[:, 0], 0, map_size - 1)
+    dest_cols = np.clip(cols[:, None] + deltas[:, 1], 0, map_size - 1)
+    return dest_rows * map_size + dest_cols
+
+def fl_neighbour_observations(tiles: np.ndarray) -> np.ndarray:
+    """Neighbour part of the observation (safe, holes, margin) for every tile of one or more maps.
+
+    Args:
+        tiles (np.ndarray): (..., n, n) array of FLTile codes.
+
+    Returns:
+        np.ndarray: (..., n*n, 24) Boolean array. Row i is the neighbour observation when the agent is in tile i.
+    """
+    tiles = np.asarray(tiles)
+    map_size = tiles.shape[-1]
+    pad = [(0, 0)] * (tiles.ndim - 2) + [(1, 1), (1, 1)]
+    padded = np.pad(tiles, pad, constant_values=FLTile.MARGIN).reshape(*tiles.shape[:-2], -1)
+    neighbours = padded[..., fl_neighbour_table(map_size)]
+    return np.concatenate([
+        (neighbours == FLTile.START) | (neighbours == FLTile.FROZEN) | (neighbours == FLTile.GOAL),
+        neighbours == FLTile.HOLE,
+        neighbours == FLTile.MARGIN,
+    ], axis=-1)
+
+# Weight of each of the 24 neighbour bits in the packed neighbour code of a compact observation.
+_NEIGHBOUR_WEIGHTS = 1 << np.arange(24, dtype=np.int64)
+
+# Compact observations are int64 arrays [tile index, neighbour code], where bit i of the neighbour code is entry i
+# of the neighbour part (safe, holes, margin) of the full observation. Their cost does not depend on the map size.
+def fl_is_compact(observation) -> bool:
+    """True if the observation is in the compact format [tile index, neighbour code]."""
+    return len(observation) == 2
+
+def fl_pack_neighbours(neighbours: np.ndarray) -> np.ndarray:
+    """Packs Boolean neighbour observations (..., 24) into neighbour codes (...)."""
+    return np.asarray(neighbours, dtype=np.int64) @ _NEIGHBOUR_WEIGHTS
+
+def fl_observation_tile(observation) -> int:
+    """Index of the tile of the agent, for an observation in either format."""
+    if fl_is_compact(observation):
+        return int(observation[0])
+    return int(np.argmax(observation[24:]))
+
+def fl_observation_neighbours(observation) -> np.ndarray:
+    """Neighbour part (safe, holes, margin) of an observation in either format, as a Boolean vector of 24 entries."""
+    if fl_is_compact(observation):
+        return ((int(observation[1]) >> np.arange(24)) & 1).astype(bool)
+    return np.asarray(observation[:24], dtype=bool)
+
+def fl_to_compact(observation: np.ndarray) -> np.ndarray:
+    """Converts full observations (..., 24 + n*n) into compact observations (..., 2)."""
+    observation = np.asarray(observation, dtype=bool)
+    return np.stack([np.argmax(observation[..., 24:], axis=-1), fl_pack_neighbours(observation[..., :24])], axis=-1)
+
+def fl_from_compact(observation: np.ndarray, map_size: int) -> np.ndarray:
+    """Converts compact observations (..., 2) into full observations (..., 24 + map_size**2)."""
+    observation = np.asarray(observation, dtype=np.int64)
+    full = np.zeros((*observation.shape[:-1], 24 + map_size * map_size), dtype=bool)
+    full[..., :24] = (observation[..., 1:2] >> np.arange(24)) & 1
+    np.put_along_axis(full, 24 + observation[..., 0:1], True, axis=-1)
+    return full
+
 arg_actions_naive = {
     'U': FLActions.UP,
     'L': FLActions.LEFT,
@@ -88,7 +193,13 @@ arg_actions_advanced4 = arg_actions_advanced2 | arg_actions_advanced3
 def fl_map_to_str(map):
     return map.astype('U13')
 
-def fl_plot_run(map, stat_from, stat_to, time, act, rew):
+def fl_plot_run(map, stat_from, stat_to, time, act, rew, as_html=True):
+    """Animates a run. States are observations or (row, column) coordinates. With as_html=False, the FuncAnimation
+    is returned instead of serialising every frame with to_jshtml."""
+    # Plotting dependencies are only loaded when rendering.
+    import matplotlib.pyplot as plt
+    import matplotlib.animation
+
     map_size = len(map)
     def init_func():
         for r in range(map_size):
@@ -113,12 +224,10 @@ def fl_plot_run(map, stat_from, stat_to, time, act, rew):
 
         def state_to_indices(state):
             """Transform the one-hot part of the state into coordinates in the map"""
-            if type(state) is str:
+            if type(state) is str or type(state) is tuple:
                 return state
             n = len(map)
-            position = state[24:]
-            index = np.argmax(position, axis=0)
-            return np.unravel_index(index, (n, n))
+            return np.unravel_index(fl_observation_tile(state), (n, n))
 
         map_size = len(map)
         r,c = state_to_indices(stat_from[i])
@@ -148,39 +257,94 @@ def fl_plot_run(map, stat_from, stat_to, time, act, rew):
         interval=100)
     plt.close()
     # ani.save('animation.mp4', fps=20, extra_args=['-vcodec', 'libx264'],)
+    if not as_html:
+        return ani
+    from IPython.display import HTML
     return HTML(ani.to_jshtml())
 
 
+class FLVisitMemory:
+    """Record of the actions taken from each tile in the current episode, with a cost that does not depend on the map size.
+
+    The actions of a tile are stored as a 4-bit mask (bit a is action a). The memory is either bit-packed (one byte per
+    tile, allocated once) or sparse (a dict with the tiles that were visited). In both cases, clear only touches the
+    tiles visited since the last clear, so resetting it costs O(episode length).
+    """
+    def __init__(self, map_size: int, sparse: bool = False):
+        """Initialise the FLVisitMemory.
+
+        Args:
+            map_size (int): size of the map.
+            sparse (bool, optional): if True, only the visited tiles are stored. Defaults to False (one byte per tile).
+        """
+        self.map_size = map_size
+        self.sparse = sparse
+        self._masks = {} if sparse else np.zeros(map_size * map_size, dtype=np.uint8)
+        self._touched = []
+
+    def add(self, tile: int, action: int):
+        """Remembers that action was taken from tile."""
+        if self.sparse:
+            self._masks[tile] = self._masks.get(tile, 0) | (1 << action)
+            return
+        if self._masks[tile] == 0:
+            self._touched.append(tile)
+        self._masks[tile] |= 1 << action
+
+    def actions(self, tile: int) -> int:
+        """Bitmask of the actions taken from tile."""
+        if self.sparse:
+            return self._masks.get(tile, 0)
+        return int(self._masks[tile])
+
+    def visited(self, tile: int) -> bool:
+        """True if any action was taken from tile."""
+        return self.actions(tile) != 0
+
+    def clear(self):
+        """Forgets all the actions."""
+        if self.sparse:
+            self._masks.clear()
+            return
+        self._masks[self._touched] = 0
+        self._touched = []
+
+    def to_array(self) -> np.ndarray:
+        """Dense (map_size**2, 4) Boolean table, as used by FLAAAgent by default."""
+        table = np.zeros((self.map_size * self.map_size, 4), dtype=bool)
+        for tile, mask in (self._masks.items() if self.sparse else zip(self._touched, self._masks[self._touched])):
+            table[tile] = (int(mask) >> np.arange(4)) & 1
+        return table
+
 def fl_observation_to_premises(observation, memory) -> dict:
-    # Extract relevant vectors for convenience.
-    safe = observation[0:8]
-    holes = observation[0:16]
-    margin = observation[16:24]
+    # Extract relevant vectors for convenience (the observation can be full or compact).
+    neighbours = fl_observation_neighbours(observation)
+    safe = neighbours[0:8]
+    holes = neighbours[8:16]
+    margin = neighbours[16:24]
 
     # Get the tile index.
-    tile_idx = np.where(observation[24:])[0][0]
-    # Get the map size.
-    map_size = int(np.sqrt(len(observation)-24))
-
-    # Pad memory and convert to a 3D array for convenience.
-    memory_pad = deepcopy(memory)
-    memory_pad = memory_pad.reshape(map_size, map_size, 4)
-    memory_pad = np.pad(memory_pad, pad_width=((1,1), (1,1), (0,0)))
-    
-    # Get the coordinates of the current tile in the padded memory.
-    row, col = np.unravel_index(tile_idx, (map_size, map_size))
-    tile_idx = (row+1)*(map_size+2) + col + 1
-    row, col = np.unravel_index(tile_idx, (map_size+2, map_size+2))
+    tile_idx = fl_observation_tile(observation)
+
+    # The memory is either a FLVisitMemory or a (map_size**2, 4) Boolean table.
+    # Only the four neighbouring tiles are read: tiles outside the map count as not visited.
+    if isinstance(memory, FLVisitMemory):
+        map_size = memory.map_size
+        visited = memory.visited
+    else:
+        map_size = int(np.sqrt(len(memory)))
+        visited = lambda tile: bool(memory[tile].any())
+    row, col = divmod(tile_idx, map_size)
 
     safe_up = safe[Direction.TOP]
     safe_down = safe[Direction.BOTTOM]
     safe_left = safe[Direction.LEFT]
     safe_right = safe[Direction.RIGHT]
 
-    visited_up = any(memory_pad[row-1, col])
-    visited_down = any(memory_pad[row+1, col])
-    visited_left = any(memory_pad[row, col-1])
-    visited_right = any(memory_pad[row, col+1])
+    visited_up = row > 0 and visited(tile_idx - map_size)
+    visited_down = row < map_size - 1 and visited(tile_idx + map_size)
+    visited_left = col > 0 and visited(tile_idx - 1)
+    visited_right = col < map_size - 1 and visited(tile_idx + 1)
 
     res = {
         'safe_up'    : safe_up,
@@ -191,88 +355,76 @@ def fl_observation_to_premises(observation, memory) -> dict:
         'visited_down'   : visited_down,
         'visited_left'   : visited_left,
         'visited_right'  : visited_right,
+        'hole_up_left'    : holes[Direction.TOP_LEFT],
+        'hole_up_right'   : holes[Direction.TOP_RIGHT],
+        'hole_down_left'  : holes[Direction.BOTTOM_LEFT],
+        'hole_down_right' : holes[Direction.BOTTOM_RIGHT],
     }
     
     return res
 
-def fl_premises_to_args(premises) -> List[str]:
-    args = []
-    if premises['safe_up']:
-        args.append('U')
-    if premises['safe_down']:
-        args.append('D')
-    if premises['safe_left']:
-        args.append('L')
-    if premises['safe_right']:
-        args.append('R')
-
-    if premises['safe_up'] and not premises['visited_up']:
-        args.append('nU')
-    if premises['safe_down'] and not premises['visited_down']:
-        args.append('nD')
-    if premises['safe_left'] and not premises['visited_left']:
-        args.append('nL')
-    if premises['safe_right'] and not premises['visited_right']:
-        args.append('nR')
-
-    # if premises['ul1'] == 'H':
-    #     if premises['u1'] in fl_safe_cells:
-    #         args.append('ul1-U')
-    #     if premises['l1'] in fl_safe_cells:
-    #         args.append('ul1-L')
-
-    # if premises['ur1'] == 'H':
-    #     if premises['u1'] in fl_safe_cells:
-    #         args.append('ur1-U')
-    #     if premises['r1'] in fl_safe_cells:
-    #         args.append('ur1-R')
-
-    # if premises['dl1'] == 'H':
-    #     if premises['d1'] in fl_safe_cells:
-    #         args.append('dl1-D')
-    #     if premises['l1'] in fl_safe_cells:
-    #         args.append('dl1-L')
-
-    # if premises['dr1'] == 'H':
-    #     if premises['d1'] in fl_safe_cells:
-    #         args.append('dr1-D')
-    #     if premises['r1'] in fl_safe_cells:
-    #         args.append('dr1-R')
-            
-
-    # if premises['prev-u']:
-    #     if premises['d1'] in fl_safe_cells:
-    #         args.append('pu1-D')
-    #     if premises['l1'] in fl_safe_cells:
-    #         args.append('pu1-L')
-    #     if premises['r1'] in fl_safe_cells:
-    #         args.append('pu1-R')
-
-    # if premises['prev-d']:
-    #     if premises['u1'] in fl_safe_cells:
-    #         args.append('pd1-U')
-    #     if premises['l1'] in fl_safe_cells:
-    #         args.append('pd1-L')
-    #     if premises['r1'] in fl_safe_cells:
-    #         args.append('pd1-R')
-
-    # if premises['prev-l']:
-    #     if premises['u1'] in fl_safe_cells:
-    #         args.append('pl1-U')
-    #     if premises['d1'] in fl_safe_cells:
-    #         args.append('pl1-D')
-    #     if premises['r1'] in fl_safe_cells:
-    #         args.append('pl1-R')
-
-    # if premises['prev-r']:
-    #     if premises['u1'] in fl_safe_cells:
-    #         args.append('pr1-U')
-    #     if premises['d1'] in fl_safe_cells:
-    #         args.append('pr1-D')
-    #     if premises['l1'] in fl_safe_cells:
-    #         args.append('pl1-L')
-    
-    return args
+# Premises extracted by fl_observation_to_premises. Bit i of a premise vector is fl_premises[i].
+fl_premises = [
+    'safe_up', 'safe_down', 'safe_left', 'safe_right',
+    'visited_up', 'visited_down', 'visited_left', 'visited_right',
+    'hole_up_left', 'hole_up_right', 'hole_down_left', 'hole_down_right',
+]
+
+def fl_batch_premises(observations: np.ndarray, visited: np.ndarray) -> np.ndarray:
+    """Batched fl_observation_to_premises, for many environments at once (e.g., a FrozenLakeVecEnv).
+
+    Args:
+        observations (np.ndarray): (K, 2) compact or (K, 24 + n*n) full observations.
+        visited (np.ndarray): (K, n*n) Boolean array with the tiles each environment has already taken an action from.
+
+    Returns:
+        np.ndarray: (K, len(fl_premises)) Boolean array. Column i is premise fl_premises[i].
+    """
+    observations = np.asarray(observations)
+    n_envs, n_tiles = visited.shape
+    map_size = int(np.sqrt(n_tiles))
+    if observations.shape[1] == 2:
+        tiles = observations[:, 0]
+        neighbours = ((observations[:, 1:2] >> np.arange(24)) & 1).astype(bool)
+    else:
+        tiles = np.argmax(observations[:, 24:], axis=1)
+        neighbours = observations[:, :24].astype(bool)
+    row, col = np.divmod(tiles, map_size)
+    envs = np.arange(n_envs)
+
+    premises = np.empty((n_envs, len(fl_premises)), dtype=bool)
+    premises[:, 0:4] = neighbours[:, [Direction.TOP, Direction.BOTTOM, Direction.LEFT, Direction.RIGHT]]
+    # Tiles outside the map count as not visited (the index is clipped, and masked out).
+    premises[:, 4] = (row > 0) & visited[envs, np.maximum(tiles - map_size, 0)]
+    premises[:, 5] = (row < map_size - 1) & visited[envs, np.minimum(tiles + map_size, n_tiles - 1)]
+    premises[:, 6] = (col > 0) & visited[envs, np.maximum(tiles - 1, 0)]
+    premises[:, 7] = (col < map_size - 1) & visited[envs, np.minimum(tiles + 1, n_tiles - 1)]
+    premises[:, 8:12] = neighbours[:, 8 + np.array([Direction.TOP_LEFT, Direction.TOP_RIGHT, Direction.BOTTOM_LEFT, Direction.BOTTOM_RIGHT])]
+    return premises
+
+# Rules of the arguments (conjunctions of premise literals, see argumentation.rules).
+# The pu1-*, pd1-*, pl1-* and pr1-* families need the previous action, which is not a premise yet.
+fl_argument_rules = {
+    'U': ['safe_up'],
+    'D': ['safe_down'],
+    'L': ['safe_left'],
+    'R': ['safe_right'],
+    'nU': ['safe_up', '~visited_up'],
+    'nD': ['safe_down', '~visited_down'],
+    'nL': ['safe_left', '~visited_left'],
+    'nR': ['safe_right', '~visited_right'],
+    'ul1-U': ['hole_up_left', 'safe_up'],
+    'ul1-L': ['hole_up_left', 'safe_left'],
+    'ur1-U': ['hole_up_right', 'safe_up'],
+    'ur1-R': ['hole_up_right', 'safe_right'],
+    'dl1-D': ['hole_down_left', 'safe_down'],
+    'dl1-L': ['hole_down_left', 'safe_left'],
+    'dr1-D': ['hole_down_right', 'safe_down'],
+    'dr1-R': ['hole_down_right', 'safe_right'],
+}
 
+fl_rules = compile_rules(fl_argument_rules, fl_premises)
 
-    
\ No newline at end of file
+def fl_premises_to_args(premises) -> List[str]:
+    """Valid arguments given the premises, according to fl_argument_rules (use fl_rules to get masks, or batches)."""
+    return fl_rules(premises)
@@ -0,0 +1,137 @@
+import numpy as np
+from typing import List, Tuple
+from environments.frozen_lake.utils import FLActions, FLTile, fl_desc_to_tiles, fl_neighbour_observations, fl_pack_neighbours, fl_transition_table
+
+# Length of the position history used to detect loops (as in FrozenLakeWrapper).
+_HIST_LEN = 6
+
+class FrozenLakeVecEnv:
+    """
+    K non-slippery Frozen Lake environments stepped at once with array operations.
+
+    It reproduces the semantics of new_fl_env (FrozenLakeWrapper + FrozenLakeNeighboursObservationWrapper +
+    FrozenLakeRewardWrapper on top of FrozenLake-v1):
+    - Observations are Boolean vectors concat[safe (8), holes (8), margin (8), one-hot position (n*n)], or
+      [tile index, neighbour code] with compact=True (see fl_is_compact).
+    - The reward is -1 in a hole, 1 in the goal and 0 otherwise.
+    - An episode ends in a hole, in the goal, after max_episode_steps moves, when the agent loops over the same
+      two tiles for 6 steps, or (if multiple_visits is False) when it repeats an action from the same tile.
+      The last two checks do not count towards max_episode_steps, as with gym's TimeLimit.
+    Environments that are done stay frozen (reward 0, done True) until the next reset.
+    """
+    def __init__(self, maps: List, multiple_visits: bool = True, max_episode_steps: int = 100, compact: bool = False):
+        """Initialise the FrozenLakeVecEnv.
+
+        Args:
+            maps (List): K maps of the same size, either as descriptions (e.g., the output of generate_random_map)
+                or as a (K, n, n) array of FLTile codes.
+            multiple_visits (bool, optional): if False, repeating an action from the same tile ends the episode. Defaults to True.
+            max_episode_steps (int, optional): maximum number of moves per episode. Defaults to 100.
+            compact (bool, optional): if True, observations are (K, 2) arrays [tile index, neighbour code]. Defaults to False.
+        """
+        self.compact = compact
+        self.multiple_visits = multiple_visits
+        self.max_episode_steps = max_episode_steps
+        self.set_maps(maps)
+
+    def set_maps(self, maps: List):
+        """Replaces the maps (the number of maps may change). The environments must be reset afterwards."""
+        if isinstance(maps, np.ndarray) and np.issubdtype(maps.dtype, np.integer):
+            tiles = maps.astype(np.int8)
+        else:
+            tiles = np.stack([fl_desc_to_tiles(desc) for desc in maps])
+        self.tiles = tiles
+        self.num_envs, self.map_size = tiles.shape[0], tiles.shape[1]
+        n_tiles = self.map_size * self.map_size
+        self._flat_tiles = tiles.reshape(self.num_envs, n_tiles)
+        self._start = np.argmax(self._flat_tiles == FLTile.START, axis=1)
+
+        # Neighbour part of the observation (safe, holes, margin) for every tile of every map.
+        self._neighbour_obs = fl_neighbour_observations(tiles)
+        self._neighbour_codes = fl_pack_neighbours(self._neighbour_obs)
+
+        self._transitions = fl_transition_table(self.map_size)
+
+        self._obs = np.zeros((self.num_envs, 2), dtype=np.int64) if self.compact else np.zeros((self.num_envs, 24 + n_tiles), dtype=bool)
+        self._envs = np.arange(self.num_envs)
+
+    @property
+    def observation_size(self) -> int:
+        return 2 if self.compact else 24 + self.map_size * self.map_size
+
+    def reset(self) -> np.ndarray:
+        """Resets all the environments.
+
+        Returns:
+            np.ndarray: (K, 24 + n*n) Boolean array (or (K, 2) if compact) with the initial observations.
+        """
+        n_tiles = self.map_size * self.map_size
+        self.s = self._start.copy()
+        self.t = np.zeros(self.num_envs, dtype=int)
+        self.elapsed_steps = np.zeros(self.num_envs, dtype=int)
+        self.dones = np.zeros(self.num_envs, dtype=bool)
+        self.previous_actions = np.zeros((self.num_envs, n_tiles, len(FLActions)), dtype=bool)
+        self.hist = np.full((self.num_envs, _HIST_LEN), -1, dtype=int)
+        self.hist_len = np.zeros(self.num_envs, dtype=int)
+        return self._get_obs()
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, dict]:
+        """Steps every environment that is not done.
+
+        Args:
+            actions (np.ndarray): (K,) array with the action of each environment. It is ignored for environments that are done.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray, dict]: observations (K, 24 + n*n) or (K, 2), rewards (K,), dones (K,) and
+                info with the time step 't' of each environment.
+        """
+        actions = np.asarray(actions, dtype=int)
+        rewards = np.zeros(self.num_envs)
+        live = ~self.dones
+        if not live.any():
+            return self._get_obs(), rewards, self.dones.copy(), {'t': self.t.copy()}
+
+        idx = self._envs[live]
+        s, a = self.s[idx], actions[idx]
+        self.t[idx] += 1
+
+        # Keep the last 6 positions before each step and end the episode if they alternate between (at most) two tiles.
+        hist = np.roll(self.hist[idx], -1, axis=1)
+        hist[:, -1] = s
+        self.hist[idx] = hist
+        self.hist_len[idx] = np.minimum(self.hist_len[idx] + 1, _HIST_LEN)
+        looping = ((self.hist_len[idx] == _HIST_LEN)
+            & (hist[:, 4] == hist[:, 2]) & (hist[:, 2] == hist[:, 0])
+            & (hist[:, 5] == hist[:, 3]) & (hist[:, 3] == hist[:, 1]))
+        if not self.multiple_visits:
+            looping |= self.previous_actions[idx, s, a]
+        self.dones[idx[looping]] = True
+
+        idx, s, a = idx[~looping], s[~looping], a[~looping]
+        self.previous_actions[idx, s, a] = True
+        s = self._transitions[s, a]
+        self.s[idx] = s
+        self.elapsed_steps[idx] += 1
+        tile = self._flat_tiles[idx, s]
+        rewards[idx] = np.where(tile == FLTile.HOLE, -1, np.where(tile == FLTile.GOAL, 1, 0))
+        self.dones[idx] = (tile == FLTile.HOLE) | (tile == FLTile.GOAL) | (self.elapsed_steps[idx] >= self.max_episode_steps)
+
+        return self._get_obs(), rewards, self.dones.copy(), {'t': self.t.copy()}
+
+    def stop(self, envs: np.ndarray):
+        """Ends the episodes of some environments (e.g., when their outcome is already known), as if they were done.
+
+        Args:
+            envs (np.ndarray): indices or Boolean mask of the environments.
+        """
+        self.dones[envs] = True
+
+    def _get_obs(self) -> np.ndarray:
+        if self.compact:
+            self._obs[:, 0] = self.s
+            self._obs[:, 1] = self._neighbour_codes[self._envs, self.s]
+            return self._obs.copy()
+        self._obs[:, :24] = self._neighbour_obs[self._envs, self.s]
+        self._obs[:, 24:] = False
+        self._obs[self._envs, 24 + self.s] = True
+        return self._obs.copy()
@@ -1,11 +1,12 @@
 import numpy as np
-from typing import Tuple
+from typing import List, Tuple
+from collections import deque
 import gym
 import time
 from agents.agent import Agent
 from math import factorial
 
-from environments.frozen_lake.frozen_lake import FrozenLakeWrapper, FrozenLakeNeighboursObservationWrapper, FrozenLakeRewardWrapper
+from environments.frozen_lake.frozen_lake import FrozenLakeEnv, FrozenLakeWrapper, FrozenLakeNeighboursObservationWrapper, FrozenLakeRewardWrapper
 from gym.envs.toy_text.frozen_lake  import generate_random_map
 
 def arrangements(m):
@@ -28,7 +29,10 @@ def run_episode(env: gym.Env,
                 initial_state: gym.Space,
                 is_learning: bool = True,
                 is_animating: bool = False, 
-                is_rendering: bool = False) -> Tuple[gym.Space, float]:
+                is_rendering: bool = False,
+                recorder = None) -> Tuple[gym.Space, float]:
+    # A Trajectory recorder (environments.frozen_lake.trajectory) keeps the tile, action, reward and time of every
+    # step in arrays: unlike is_animating, it is cheap enough for evaluation runs.
     # Initialize reward for episode
     total_reward = 0.0
     # Initialize
@@ -50,11 +54,16 @@ def run_episode(env: gym.Env,
             env.render()
             time.sleep(0.25)
         
-        next_state, reward, done, _ = env.step(current_action)
+        next_state, reward, done, info = env.step(current_action)
+        # A COAAenv with deferred_reward returns a final reward of 0: the real one would never be learnt.
+        assert not (isinstance(info, dict) and 'reward_future' in info), "deferred rewards must be collected (see run_episodes_async)"
         total_reward += reward
 
+        if recorder is not None:
+            recorder.record(current_state, current_action, reward, env.t)
         if is_animating:
-            animation_data.append((current_state, next_state, env.t, current_action, total_reward))
+            # Observations may be views of reused buffers (see FrozenLakeNeighboursObservationWrapper).
+            animation_data.append((np.copy(current_state), np.copy(next_state), env.t, current_action, total_reward))
             
         # Execute the learning and update the state and action
         # ===================================== #
@@ -73,14 +82,67 @@ def run_episode(env: gym.Env,
         env.render()
         time.sleep(0.25)
         # env.close()
+    if recorder is not None:
+        recorder.record(current_state, None, 0, env.t)
     if is_animating:
-            animation_data.append((current_state, None, env.t, None, 0))
+            animation_data.append((np.copy(current_state), None, env.t, None, 0))
 
     return current_state, total_reward, animation_data
 
 
-def new_fl_env(map_size=8, p=0.8, multiple_visits=True):
-    env = gym.make("FrozenLake-v1",  is_slippery=False, desc=generate_random_map(map_size, p))
+def run_episodes_async(make_env, agent: Agent, n_episodes: int, max_pending: int = 256) -> List[float]:
+    """Trains an agent on COAAenv episodes whose final rewards are computed by a RolloutPool (see COAAenv with deferred_reward).
+    The agent learns the intermediate steps as in run_episode, while the final rollouts run in the worker processes.
+    The terminal update of each episode is applied when its reward arrives, so up to max_pending episodes are in flight.
+
+    Args:
+        make_env (Callable): returns the COAAenv of an episode (e.g., with a new map), given the episode index.
+        agent (Agent): the learning agent (e.g., COAAAgent).
+        n_episodes (int): number of episodes.
+        max_pending (int, optional): maximum number of episodes waiting for their reward. Defaults to 256.
+
+    Returns:
+        List[float]: the total reward of each episode.
+    """
+    rewards = [0.0] * n_episodes
+    # (episode, state, action, next_state, future) of the episodes waiting for their reward.
+    pending = deque()
+
+    def finish(episode, state, action, next_state, future):
+        reward = future.result().reward
+        agent.learn(state, action, next_state, reward, True)
+        rewards[episode] += reward
+
+    for episode in range(n_episodes):
+        env = make_env(episode)
+        current_state = env.reset()
+        current_action = agent.select_action(current_state, is_greedy=False)
+        done = False
+        while not done:
+            next_state, reward, done, info = env.step(current_action)
+            rewards[episode] += reward
+            if done and 'reward_future' in info:
+                # Observations are views of reused buffers: keep copies until the reward arrives.
+                pending.append((episode, np.copy(current_state), current_action, np.copy(next_state), info['reward_future']))
+                break
+            next_action = agent.learn(current_state, current_action, next_state, reward, done)
+            current_state, current_action = next_state, next_action
+        while len(pending) > max_pending or (pending and pending[0][-1].done()):
+            finish(*pending.popleft())
+
+    while pending:
+        finish(*pending.popleft())
+    return rewards
+
+def new_fl_env(map_size=8, p=0.8, multiple_visits=True, desc=None, fused=True, compact=False):
+    # A given map (e.g., from a MapBank) avoids generating a random one.
+    if desc is None:
+        desc = generate_random_map(map_size, p)
+    if fused:
+        return FrozenLakeEnv(desc, multiple_visits=multiple_visits, compact=compact)
+    # The original chain of wrappers on top of gym's FrozenLake, with the same behaviour (full observations only).
+    assert not compact, "compact observations need the fused environment"
+    env = gym.make("FrozenLake-v1",  is_slippery=False, desc=desc)
     env = FrozenLakeWrapper(env, multiple_visits=multiple_visits)
     env = FrozenLakeNeighboursObservationWrapper(env)
     env = FrozenLakeRewardWrapper(env)
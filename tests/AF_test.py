@@ -1,6 +1,9 @@
 import unittest
+from unittest import mock
 import numpy as np
-from src.argumentation.utils import construct_all_attacks, order_to_matrix
+from src.argumentation.utils import construct_all_attacks, construct_attack_matrix, construct_conflict_matrix, order_to_matrix, OrderEncoder
+from src.argumentation.classes import ArgumentationFramework, ValuebasedArgumentationFramework
+from src.argumentation.semantics import grounded_extension
 
 class Test(unittest.TestCase):
     def test_construct_all_attacks(self):
@@ -24,6 +27,17 @@ class Test(unittest.TestCase):
         
         self.assertEqual(atts, constructed_atts)
 
+    def test_construct_attack_matrix(self):
+        arg_actions = {'U': 'UP', 'nU': 'UP', 'D': 'DOWN', 'L': 'LEFT'}
+        args, mat = construct_attack_matrix(arg_actions)
+        af = ArgumentationFramework.from_adjacency(args, mat)
+        self.assertEqual(set(af.atts), construct_all_attacks(arg_actions))
+
+        # Only opposite directions are in conflict.
+        args, mat = construct_conflict_matrix(arg_actions, [('UP', 'DOWN')])
+        af = ArgumentationFramework.from_adjacency(args, mat)
+        self.assertEqual(set(af.atts), {('U', 'D'), ('nU', 'D'), ('D', 'U'), ('D', 'nU')})
+
     def test_ordering_matrix_enconding(self):
         args = ['a', 'b', 'c', 'd', 'e']
         order  = ['d','a', 'e', 'b', 'c']
@@ -40,5 +54,121 @@ class Test(unittest.TestCase):
         
         np.testing.assert_array_equal(expected_encoding, encoding)
 
+    def test_order_encoder(self):
+        args = ['a', 'b', 'c', 'd', 'e']
+        order  = ['d','a', 'e', 'b', 'c']
+        encoder = OrderEncoder(args)
+        for _ in range(2):
+            encoder.reset()
+            np.testing.assert_array_equal(order_to_matrix([], args, True), encoder.encoding)
+            for i in range(len(order)):
+                encoder.append(args.index(order[i]))
+                expected_encoding = order_to_matrix(order[:i+1], args, True)
+                np.testing.assert_array_equal(expected_encoding, encoder.encoding)
+                np.testing.assert_array_equal(expected_encoding.all(axis=1), encoder.allowed)
+
+    def test_af_mutation(self):
+        af = ArgumentationFramework(['a', 'b', 'c'], [('a', 'b'), ('b', 'c'), ('c', 'a'), ('d', 'a')])
+        self.assertEqual(af.args, ['a', 'b', 'c', 'd'])
+        self.assertEqual(af.atts, [('a', 'b'), ('b', 'c'), ('c', 'a'), ('d', 'a')])
+
+        af.remove_argument('a')
+        # The order of the remaining arguments is preserved.
+        self.assertEqual(af.args, ['b', 'c', 'd'])
+        self.assertEqual(af.atts, [('b', 'c')])
+        expected_mat = [[(arg1, arg2) == ('b', 'c') for arg2 in af.args] for arg1 in af.args]
+        np.testing.assert_array_equal(expected_mat, af.mat)
+
+        af.add_attack(('e', 'b'))
+        self.assertEqual(af.index('e'), 3)
+        self.assertTrue(af.mat[af.index('e'), af.index('b')])
+        self.assertEqual(af.mat.sum(), 2)
+
+        # Missing attacks raise ValueError, and a batch with a missing attack removes nothing.
+        with self.assertRaises(ValueError):
+            af.remove_attack(('b', 'e'))
+        with self.assertRaises(ValueError):
+            af.remove_attacks([('b', 'c'), ('b', 'e')])
+        self.assertEqual(af.atts, [('b', 'c'), ('e', 'b')])
+        af.remove_attacks([('b', 'c'), ('e', 'b')])
+        self.assertEqual(af.mat.sum(), 0)
+
+        # swap_remove_argument moves the last argument into the freed slot.
+        af = ArgumentationFramework(['a', 'b', 'c', 'd'], [('a', 'b'), ('d', 'c'), ('c', 'a')])
+        af.swap_remove_argument('a')
+        self.assertEqual(af.args, ['d', 'b', 'c'])
+        self.assertEqual(af.atts, [('d', 'c')])
+        np.testing.assert_array_equal([[False, False, True], [False, False, False], [False, False, False]], af.mat)
+
+    def test_af_bulk_construction(self):
+        args = ['a', 'b', 'c', 'd']
+        atts = [('a', 'b'), ('b', 'a'), ('c', 'd'), ('d', 'b')]
+        af = ArgumentationFramework(args, atts)
+
+        af_adj = ArgumentationFramework.from_adjacency(args, af.mat)
+        af_edges = ArgumentationFramework.from_edge_arrays(args, [0, 1, 2, 3], [1, 0, 3, 1])
+        np.testing.assert_array_equal(af.mat, af_adj.mat)
+        np.testing.assert_array_equal(af.mat, af_edges.mat)
+        self.assertEqual(set(atts), set(af_edges.atts))
+
+        af.remove_arguments(['a', 'c'])
+        self.assertEqual(af.args, ['b', 'd'])
+        self.assertEqual(af.atts, [('d', 'b')])
+        np.testing.assert_array_equal([[False, False], [True, False]], af.mat)
+
+    def test_vaf_defeats(self):
+        args = ['a', 'b', 'c']
+        atts = [('a', 'b'), ('b', 'a'), ('b', 'c'), ('c', 'b')]
+        vaf = ValuebasedArgumentationFramework(args, atts, ['b', 'a'])
+
+        np.testing.assert_array_equal([1, 0, 2], vaf.rank)
+        np.testing.assert_array_equal([
+            [False, False, False],
+            [True, False, True],
+            [False, False, False]
+        ], vaf.defeats)
+
+        # Reordering updates the defeats, but the attacks are left untouched.
+        vaf.order = ['c', 'a', 'b']
+        np.testing.assert_array_equal([
+            [False, True, False],
+            [False, False, False],
+            [False, True, False]
+        ], vaf.defeats)
+        self.assertEqual(vaf.mat.sum(), 4)
+
+        # Setting the same order again does not invalidate the defeats (nor the policies compiled from them).
+        version = vaf.version
+        vaf.order = ('c', 'a', 'b')
+        self.assertEqual(vaf.version, version)
+        vaf.order = ['a', 'c', 'b']
+        self.assertNotEqual(vaf.version, version)
+
+        # A VAF is drawn with its defeats, not its attacks.
+        with mock.patch('src.argumentation.classes._draw') as draw:
+            vaf.draw()
+        np.testing.assert_array_equal(vaf.defeats, draw.call_args[0][0])
+        self.assertEqual(draw.call_args[0][1], args)
+
+        with self.assertWarns(DeprecationWarning):
+            ValuebasedArgumentationFramework(args, atts, ['b', 'a'], update_on_init=True)
+
+    def test_af_view(self):
+        args = ['a', 'b', 'c']
+        atts = [('a', 'b'), ('b', 'a'), ('b', 'c'), ('c', 'b')]
+        vaf = ValuebasedArgumentationFramework(args, atts, ['b', 'a', 'c'])
+        vsaf = vaf.view(vaf.mask(['a', 'c']))
+
+        # The view looks like the restricted AF...
+        self.assertEqual(vsaf.args, ['a', 'c'])
+        self.assertEqual(vsaf.atts, [])
+        np.testing.assert_array_equal(np.zeros((2, 2), dtype=bool), vsaf.mat)
+        np.testing.assert_array_equal(np.zeros((2, 2), dtype=bool), vsaf.defeats)
+        # ...but shares the matrices of the VAF.
+        self.assertIs(vsaf.parent_args, vaf.args)
+        self.assertIs(vsaf.parent_defeats, vaf.defeats)
+        self.assertEqual(grounded_extension(vsaf), ['a', 'c'])
+        self.assertEqual(grounded_extension(vaf.view(vaf.mask(['a', 'b']))), ['b'])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,49 @@
+import os
+import random
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from agents.agent import AAAgent
+from argumentation.classes import ValuebasedArgumentationFramework
+
+class ListAgent(AAAgent):
+    """AAAgent whose observations are the lists of valid arguments themselves."""
+    def reset_memory(self):
+        self.memory = []
+
+    def update_memory(self, obs, action):
+        self.memory.append(action)
+
+ARG_ACTIONS = {'R': 2, 'U': 3, 'nU': 3, 'D': 1}
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        # R and U do not attack each other, so both can be in the grounded extension. U and D defeat each other.
+        vaf = ValuebasedArgumentationFramework(list(ARG_ACTIONS), [('U', 'D'), ('D', 'U'), ('R', 'D'), ('D', 'R')], [])
+        self.agent = ListAgent(vaf, ARG_ACTIONS, lambda obs, memory: obs, lambda premises: premises)
+
+    def test_select_actions_matches_select_action(self):
+        obs_batch = [['R', 'U'], ['U', 'R'], [], ['nU'], ['D'], ['U', 'D'], ['nU', 'D', 'R'], []]
+        for seed in range(5):
+            random.seed(seed)
+            batch = self.agent.select_actions(obs_batch)
+            random.seed(seed)
+            sequential = [self.agent.select_action(obs) for obs in obs_batch]
+            np.testing.assert_array_equal(batch, sequential)
+        # Ties between the arguments of the extension are broken by the order of vaf.args: R before U.
+        np.testing.assert_array_equal(batch[:2], [ARG_ACTIONS['R'], ARG_ACTIONS['R']])
+        np.testing.assert_array_equal(batch[3:5], [ARG_ACTIONS['nU'], ARG_ACTIONS['D']])
+
+    def test_random_fallback(self):
+        # Observations without valid arguments (or whose arguments defeat each other) have an empty extension.
+        obs_batch = [[], ['U', 'D']] * 50
+        random.seed(0)
+        n_random_actions = self.agent.n_random_actions
+        actions = self.agent.select_actions(obs_batch)
+        self.assertEqual(self.agent.n_random_actions - n_random_actions, len(obs_batch))
+        self.assertEqual(set(actions.tolist()), set(ARG_ACTIONS.values()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,269 @@
+import itertools
+import os
+import sys
+import unittest
+import warnings
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from environments.co_aa.co_aa import COAAenv, play_game
+from environments.co_aa.reward_cache import RewardCache
+from environments.co_aa.rollout_pool import RolloutPool
+from environments.frozen_lake.evaluation import evaluate_policy, evaluate_vaf
+from environments.co_aa.solvers import OrderingEvaluator, local_search, solve_ordering
+from environments.frozen_lake.utils import fl_observation_to_premises, fl_premises_to_args, arg_actions_advanced3
+from agents.frozen_lake_agent import FLAAAgent
+from argumentation.classes import ArgumentationFramework, ValuebasedArgumentationFramework
+from argumentation.policy import compile_policy
+from argumentation.utils import construct_all_attacks
+from utils import new_fl_env, run_episode, run_episodes_async
+from gym.envs.toy_text.frozen_lake import generate_random_map
+
+ARG_ACTIONS = arg_actions_advanced3
+ARGS = list(ARG_ACTIONS)
+
+def no_arguments(premises):
+    # Module level, so that it can be sent to the workers of a RolloutPool.
+    return []
+
+def play(order, desc, cache=None, premises_to_args=fl_premises_to_args):
+    af = ArgumentationFramework(ARGS, construct_all_attacks(ARG_ACTIONS))
+    vaf = ValuebasedArgumentationFramework(ARGS, af.atts, [])
+    agent = FLAAAgent(vaf, ARG_ACTIONS, fl_observation_to_premises, premises_to_args, len(desc))
+    env = COAAenv(ARGS, ARG_ACTIONS, af, new_fl_env(desc=desc), fl_observation_to_premises, premises_to_args, agent, reward_cache=cache)
+    env.reset()
+    for arg in order:
+        _, reward, done, _ = env.step(ARGS.index(arg))
+    assert done
+    return reward
+
+class FixedOrderAgent:
+    def __init__(self):
+        self.learnt = []
+    def select_action(self, state, is_greedy=False):
+        # The first argument that can still be appended (its row of the encoding is all True).
+        return int(np.flatnonzero(state.all(axis=1))[0])
+    def learn(self, state, action, next_state, reward, done):
+        self.learnt.append((action, reward, done))
+        return None if done else self.select_action(next_state)
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        warnings.filterwarnings('ignore')
+
+    def test_policy_fingerprint(self):
+        af = ArgumentationFramework(ARGS, construct_all_attacks(ARG_ACTIONS))
+        def fingerprint(order, max_table_args=16):
+            vaf = ValuebasedArgumentationFramework(ARGS, af.atts, order)
+            return compile_policy(vaf, ARG_ACTIONS, max_table_args).fingerprint()
+        order = ['nR', 'R', 'nD', 'L', 'U', 'nL', 'nU', 'D']
+        # nR and R promote the same action, so swapping them (next to each other) does not change the policy.
+        swapped = ['R', 'nR', 'nD', 'L', 'U', 'nL', 'nU', 'D']
+        for max_table_args in (16, 0):
+            self.assertEqual(fingerprint(order, max_table_args), fingerprint(swapped, max_table_args))
+            self.assertNotEqual(fingerprint(order, max_table_args), fingerprint(order[::-1], max_table_args))
+        self.assertEqual(fingerprint(['nU', 'U', 'R', 'nR', 'L', 'nL', 'D', 'nD'], 0), fingerprint(['U', 'nU', 'nR', 'R', 'nL', 'L', 'nD', 'D'], 0))
+
+    def test_policy_is_reused_across_episodes(self):
+        af = ArgumentationFramework(ARGS, construct_all_attacks(ARG_ACTIONS))
+        vaf = ValuebasedArgumentationFramework(ARGS, af.atts, [])
+        agent = FLAAAgent(vaf, ARG_ACTIONS, fl_observation_to_premises, fl_premises_to_args, 3)
+        env = COAAenv(ARGS, ARG_ACTIONS, af, new_fl_env(desc=['SFF', 'FHF', 'FFG']), fl_observation_to_premises, fl_premises_to_args, agent)
+        policies = []
+        for _ in range(2):
+            env.reset()
+            for arg in ARGS:
+                env.step(ARGS.index(arg))
+            policies.append(agent.policy)
+        # The same order is set again at the end of the second episode: the compiled policy is not rebuilt.
+        self.assertIs(policies[0], policies[1])
+
+    def test_reward_cache(self):
+        np.random.seed(0)
+        maps = [generate_random_map(6, 0.8) for _ in range(3)]
+        order = ['nR', 'R', 'nD', 'L', 'U', 'nL', 'nU', 'D']
+        swapped = ['R', 'nR', 'nD', 'L', 'U', 'nL', 'nU', 'D']
+        cache = RewardCache()
+        for desc in maps:
+            reward = play(order, desc)
+            self.assertEqual(play(order, desc, cache), reward)
+            self.assertEqual(play(swapped, desc, cache), reward)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (3, 3, 3))
+
+        # The least recently used reward is evicted.
+        small = RewardCache(max_size=2)
+        for desc in maps:
+            play(order, desc, small)
+        self.assertEqual(len(small), 2)
+        play(order, maps[0], small)
+        self.assertEqual(small.hits, 0)
+
+    def test_random_rollouts_are_not_cached(self):
+        # Without valid arguments, every action is random.
+        cache = RewardCache()
+        desc = ['SFF', 'FFF', 'FFG']
+        play(ARGS, desc, cache, premises_to_args=lambda premises: [])
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.misses, 1)
+
+    def test_rollout_pool(self):
+        np.random.seed(1)
+        maps = [generate_random_map(5, 0.8) for _ in range(4)]
+        orders = [list(np.random.permutation(ARGS)) for _ in maps]
+        af = ArgumentationFramework(ARGS, construct_all_attacks(ARG_ACTIONS))
+        with RolloutPool(af, ARG_ACTIONS, fl_observation_to_premises, fl_premises_to_args, processes=2) as pool:
+            rewards = pool.evaluate(orders, maps)
+            self.assertEqual(list(rewards), [play(order, desc) for order, desc in zip(orders, maps)])
+
+        # Random rollouts are reproducible given the seed of the pool.
+        def random_rewards(seed):
+            with RolloutPool(af, ARG_ACTIONS, fl_observation_to_premises, no_arguments, processes=2, seed=seed) as pool:
+                return list(pool.evaluate([ARGS] * 6, [maps[0]] * 6))
+        self.assertEqual(random_rewards(3), random_rewards(3))
+
+    def test_rollout_pool_env(self):
+        np.random.seed(4)
+        maps = [generate_random_map(5, 0.8) for _ in range(3)]
+        af = ArgumentationFramework(ARGS, construct_all_attacks(ARG_ACTIONS))
+        vaf = ValuebasedArgumentationFramework(ARGS, af.atts, [])
+        # The arguments of the env are in another order than af.args, so its action indices differ from the pool's.
+        args = ARGS[::-1]
+        order = ['nR', 'nD', 'R', 'D', 'nL', 'nU', 'L', 'U']
+        with RolloutPool(af, ARG_ACTIONS, fl_observation_to_premises, fl_premises_to_args, processes=2) as pool:
+            for desc in maps:
+                agent = FLAAAgent(vaf, ARG_ACTIONS, fl_observation_to_premises, fl_premises_to_args, 5)
+                env = COAAenv(args, ARG_ACTIONS, af, new_fl_env(desc=desc), fl_observation_to_premises,
+                    fl_premises_to_args, agent, rollout_pool=pool)
+                env.reset()
+                for arg in order:
+                    _, reward, done, info = env.step(args.index(arg))
+                # Without deferred_reward, the final step waits for the game.
+                self.assertTrue(done)
+                self.assertNotIn('reward_future', info)
+                self.assertEqual(reward, play(order, desc))
+
+            agent = FLAAAgent(vaf, ARG_ACTIONS, fl_observation_to_premises, fl_premises_to_args, 5)
+            env = COAAenv(args, ARG_ACTIONS, af, new_fl_env(desc=maps[0]), fl_observation_to_premises,
+                fl_premises_to_args, agent, rollout_pool=pool, deferred_reward=True)
+            state = env.reset()
+            # run_episode would learn a final reward of 0 instead of the deferred one.
+            with self.assertRaises(AssertionError):
+                run_episode(env, FixedOrderAgent(), state)
+
+    def test_run_episodes_async(self):
+        np.random.seed(2)
+        maps = [generate_random_map(5, 0.8) for _ in range(6)]
+        af = ArgumentationFramework(ARGS, construct_all_attacks(ARG_ACTIONS))
+        vaf = ValuebasedArgumentationFramework(ARGS, af.atts, [])
+        cache = RewardCache()
+
+        with RolloutPool(af, ARG_ACTIONS, fl_observation_to_premises, fl_premises_to_args, processes=2) as pool:
+            def make_env(episode):
+                agent = FLAAAgent(vaf, ARG_ACTIONS, fl_observation_to_premises, fl_premises_to_args, 5)
+                return COAAenv(ARGS, ARG_ACTIONS, af, new_fl_env(desc=maps[episode % 3]), fl_observation_to_premises,
+                    fl_premises_to_args, agent, reward_cache=cache, rollout_pool=pool, deferred_reward=True)
+            agent = FixedOrderAgent()
+            rewards = run_episodes_async(make_env, agent, len(maps), max_pending=2)
+        self.assertEqual(len(agent.learnt), len(maps) * len(ARGS))
+        self.assertEqual(sum(done for _, _, done in agent.learnt), len(maps))
+        self.assertEqual(sum(reward for _, reward, done in agent.learnt if done), sum(rewards))
+        # The agent always orders the arguments as in ARGS.
+        self.assertEqual(rewards, [play(ARGS, maps[episode % 3]) for episode in range(len(maps))])
+
+    def test_evaluate_vaf(self):
+        np.random.seed(3)
+        maps = [generate_random_map(size, 0.8) for size in (4, 6, 4, 5, 6, 6)]
+        af = ArgumentationFramework(ARGS, construct_all_attacks(ARG_ACTIONS))
+        for order in (ARGS, ['nR', 'nD', 'R', 'D', 'nL', 'nU', 'L', 'U']):
+            result = evaluate_vaf(order, maps, af, ARG_ACTIONS, rng=np.random.default_rng(0))
+            for k, desc in enumerate(maps):
+                vaf = ValuebasedArgumentationFramework(ARGS, af.atts, order)
+                agent = FLAAAgent(vaf, ARG_ACTIONS, fl_observation_to_premises, fl_premises_to_args, len(desc))
+                reward = play_game(new_fl_env(desc=desc), agent)
+                self.assertEqual(result.n_random_actions[k] == 0, agent.n_random_actions == 0)
+                if agent.n_random_actions == 0:
+                    self.assertEqual(result.rewards[k], reward)
+                    self.assertEqual(result.success[k], reward == 1)
+            # A premises function gives the same results as the compiled rules.
+            slow = evaluate_vaf(order, maps, af, ARG_ACTIONS, fl_premises_to_args, rng=np.random.default_rng(0))
+            np.testing.assert_array_equal(slow.rewards, result.rewards)
+        self.assertEqual(result.success_rate, np.mean(result.success))
+
+    def test_mean_reward_over_maps(self):
+        np.random.seed(4)
+        maps = [generate_random_map(5, 0.8) for _ in range(5)]
+        order = ['nR', 'nD', 'R', 'D', 'nL', 'nU', 'L', 'U']
+        af = ArgumentationFramework(ARGS, construct_all_attacks(ARG_ACTIONS))
+        vaf = ValuebasedArgumentationFramework(ARGS, af.atts, [])
+        agent = FLAAAgent(vaf, ARG_ACTIONS, fl_observation_to_premises, fl_premises_to_args, 5)
+        env = COAAenv(ARGS, ARG_ACTIONS, af, new_fl_env(desc=maps[0]), fl_observation_to_premises, fl_premises_to_args, agent, game_maps=maps)
+        env.reset()
+        for arg in order:
+            _, reward, done, _ = env.step(ARGS.index(arg))
+        self.assertTrue(done)
+        result = evaluate_vaf(order, maps, af, ARG_ACTIONS)
+        self.assertTrue(np.all(result.n_random_actions == 0))
+        self.assertAlmostEqual(reward, result.mean_reward)
+
+        # The maps are played with the premises of fl_observation_to_premises: other extractors are not supported.
+        other_premises = lambda observation, memory: fl_observation_to_premises(observation, memory)
+        with self.assertRaises(AssertionError):
+            COAAenv(ARGS, ARG_ACTIONS, af, new_fl_env(desc=maps[0]), other_premises, fl_premises_to_args, agent, game_maps=maps)
+
+    def test_evaluate_random_actions(self):
+        # Three arguments promote action 0 and one promotes action 1: as with AAAgent, random actions are drawn with repetitions.
+        arg_actions = {'A': 0, 'B': 0, 'C': 0, 'D': 1}
+        vaf = ValuebasedArgumentationFramework(list(arg_actions), [], list(arg_actions))
+        candidates = []
+        class RecordingGenerator:
+            def __init__(self):
+                self._rng = np.random.default_rng(0)
+            def choice(self, a, size=None):
+                candidates.append(np.sort(a).tolist())
+                return self._rng.choice(a, size=size)
+        result = evaluate_policy(compile_policy(vaf, arg_actions), [generate_random_map(4, 0.8)] * 3, no_arguments,
+            rng=RecordingGenerator())
+        self.assertTrue(np.all(result.n_random_actions > 0))
+        self.assertEqual(candidates[0], sorted(arg_actions.values()))
+
+    def test_solve_ordering(self):
+        np.random.seed(5)
+        maps = [generate_random_map(5, 0.7) for _ in range(6)]
+        arg_actions = {arg: ARG_ACTIONS[arg] for arg in ['U', 'nU', 'R', 'nR', 'D', 'nD']}
+        af = ArgumentationFramework(list(arg_actions), construct_all_attacks(arg_actions))
+        evaluator = OrderingEvaluator(af, arg_actions, maps)
+        solution = solve_ordering(evaluator)
+        self.assertTrue(solution.complete)
+        best = max(evaluator.score(order) for order in itertools.permutations(range(len(af.args))))
+        self.assertEqual(solution.score, best)
+        self.assertLess(solution.n_evaluated, 720)
+        self.assertEqual(evaluate_vaf(solution.order, maps, af, arg_actions).mean_reward, solution.score)
+
+        # The search can be stopped at any time.
+        partial = solve_ordering(OrderingEvaluator(af, arg_actions, maps), max_evaluations=5)
+        self.assertFalse(partial.complete)
+        self.assertEqual(sorted(partial.order), sorted(af.args))
+
+    def test_local_search(self):
+        np.random.seed(5)
+        maps = [generate_random_map(5, 0.7) for _ in range(6)]
+        arg_actions = {arg: ARG_ACTIONS[arg] for arg in ['U', 'nU', 'R', 'nR', 'D', 'nD']}
+        af = ArgumentationFramework(list(arg_actions), construct_all_attacks(arg_actions))
+        optimum = solve_ordering(OrderingEvaluator(af, arg_actions, maps)).score
+        initial = ['U', 'R', 'D', 'nU', 'nR', 'nD']
+        for method in ('annealing', 'tabu'):
+            evaluator = OrderingEvaluator(af, arg_actions, maps)
+            solution = local_search(evaluator, method, initial, time_budget=None, patience=40, seed=0)
+            self.assertTrue(solution.complete)
+            # The incremental scores agree with playing all the maps again.
+            self.assertEqual(solution.score, evaluator.score(evaluator.indices(solution.order)))
+            self.assertGreaterEqual(solution.score, evaluator.score(evaluator.indices(initial)))
+            self.assertEqual(solution.score, optimum)
+
+        # The search can be stopped at any time.
+        solution = local_search(OrderingEvaluator(af, arg_actions, maps), max_evaluations=3, seed=0)
+        self.assertFalse(solution.complete)
+        self.assertEqual(sorted(solution.order), sorted(af.args))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,227 @@
+import os
+import sys
+import tempfile
+import unittest
+import warnings
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from environments.frozen_lake.frozen_lake import FrozenLakeEnv, FrozenLakeWrapper, FrozenLakeNeighboursObservationWrapper, FrozenLakeRewardWrapper
+from environments.frozen_lake.vec_env import FrozenLakeVecEnv
+from environments.frozen_lake.map_bank import MapBank, shortest_paths
+from environments.frozen_lake.utils import FLVisitMemory, fl_observation_tile, fl_to_compact, fl_from_compact, fl_observation_to_premises, fl_premises_to_args
+from agents.frozen_lake_agent import FrozenLakeAgent, FrozenLakeSparseAgent, FLRandomAwareAgent
+from environments.frozen_lake.trajectory import Trajectory
+from utils import new_fl_env, run_episode
+from gym.envs.toy_text.frozen_lake import generate_random_map, is_valid
+import gym
+
+def wrapper_env(desc, multiple_visits):
+    env = gym.make("FrozenLake-v1", is_slippery=False, desc=desc)
+    env = FrozenLakeWrapper(env, multiple_visits=multiple_visits)
+    env = FrozenLakeNeighboursObservationWrapper(env)
+    return FrozenLakeRewardWrapper(env)
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        warnings.filterwarnings('ignore')
+
+    def test_vec_env_matches_wrappers(self):
+        np.random.seed(0)
+        rng = np.random.default_rng(0)
+        for multiple_visits in (True, False):
+            maps = [generate_random_map(5, p) for p in (0.6, 0.7, 0.8, 0.9, 1.0, 1.0)]
+            envs = [wrapper_env(desc, multiple_visits) for desc in maps]
+            vec_env = FrozenLakeVecEnv(maps, multiple_visits=multiple_visits)
+            for _ in range(3):
+                obs = vec_env.reset()
+                dones = np.zeros(len(envs), dtype=bool)
+                for k, env in enumerate(envs):
+                    np.testing.assert_array_equal(obs[k], env.reset())
+                for _ in range(150):
+                    # Biased actions, so that some agents reach the goal or exceed the time limit.
+                    actions = rng.choice(4, size=len(envs), p=[0.1, 0.4, 0.4, 0.1])
+                    obs, rewards, vec_dones, info = vec_env.step(actions)
+                    for k, env in enumerate(envs):
+                        if dones[k]:
+                            self.assertTrue(vec_dones[k])
+                            self.assertEqual(rewards[k], 0)
+                            continue
+                        next_state, reward, done, _ = env.step(actions[k])
+                        np.testing.assert_array_equal(obs[k], next_state)
+                        self.assertEqual(rewards[k], reward)
+                        self.assertEqual(vec_dones[k], done)
+                        self.assertEqual(info['t'][k], env.t)
+                        dones[k] = done
+                self.assertTrue(dones.all())
+
+    def test_fused_env_matches_wrappers(self):
+        np.random.seed(2)
+        rng = np.random.default_rng(2)
+        for multiple_visits in (True, False):
+            for p in (0.6, 0.8, 1.0):
+                desc = generate_random_map(5, p)
+                env, fused = wrapper_env(desc, multiple_visits), FrozenLakeEnv(desc, multiple_visits=multiple_visits)
+                for _ in range(3):
+                    np.testing.assert_array_equal(fused.reset(), env.reset())
+                    done = False
+                    while not done:
+                        action = rng.choice(4, p=[0.1, 0.4, 0.4, 0.1])
+                        obs, reward, done, info = fused.step(action)
+                        next_state, expected_reward, expected_done, _ = env.step(action)
+                        np.testing.assert_array_equal(obs, next_state)
+                        self.assertEqual((reward, done, info['t']), (expected_reward, expected_done, env.t))
+                        np.testing.assert_array_equal(fused.previous_actions, env.previous_actions)
+                        self.assertEqual((fused.in_hole(), fused.in_goal()), (env.in_hole(), env.in_goal()))
+
+    def test_compact_observations(self):
+        np.random.seed(3)
+        rng = np.random.default_rng(3)
+        maps = [generate_random_map(6, 0.7) for _ in range(4)]
+        full, compact = FrozenLakeEnv(maps[0]), FrozenLakeEnv(maps[0], compact=True)
+        vec_full, vec_compact = FrozenLakeVecEnv(maps), FrozenLakeVecEnv(maps, compact=True)
+        memory = rng.random((36, 4)) < 0.3
+        obs, compact_obs = full.reset(), compact.reset()
+        vec_obs, vec_compact_obs = vec_full.reset(), vec_compact.reset()
+        for _ in range(20):
+            np.testing.assert_array_equal(fl_to_compact(obs), compact_obs)
+            np.testing.assert_array_equal(fl_from_compact(compact_obs, 6), obs)
+            np.testing.assert_array_equal(fl_to_compact(vec_obs), vec_compact_obs)
+            self.assertEqual(fl_observation_to_premises(compact_obs, memory), fl_observation_to_premises(obs, memory))
+            self.assertEqual(fl_premises_to_args(fl_observation_to_premises(compact_obs, memory)), fl_premises_to_args(fl_observation_to_premises(obs, memory)))
+            action = rng.integers(4)
+            obs, _, done, _ = full.step(action)
+            compact_obs, _, _, _ = compact.step(action)
+            vec_obs, _, _, _ = vec_full.step(np.full(4, action))
+            vec_compact_obs, _, _, _ = vec_compact.step(np.full(4, action))
+            if done:
+                obs, compact_obs = full.reset(), compact.reset()
+
+    def test_agents_accept_compact_observations(self):
+        agent = FrozenLakeAgent(6, 0.1, 0.9, 0.1, full=True)
+        agent.w = np.random.default_rng(4).random(agent.W_SHAPE)
+        env = FrozenLakeEnv(generate_random_map(6, 0.8))
+        obs = env.reset()
+        for action in (1, 2, 1, 2):
+            np.testing.assert_allclose(agent.values(fl_to_compact(obs)), agent.values(obs))
+            obs, _, _, _ = env.step(action)
+        self.assertTrue(agent.is_goal_reached(np.array([35, 0])))
+
+    def test_visit_memory(self):
+        rng = np.random.default_rng(5)
+        dense = rng.random((49, 4)) < 0.2
+        memories = [FLVisitMemory(7), FLVisitMemory(7, sparse=True)]
+        for memory in memories:
+            for tile, action in zip(*np.nonzero(dense)):
+                memory.add(tile, action)
+            np.testing.assert_array_equal(memory.to_array(), dense)
+        env = FrozenLakeEnv(generate_random_map(7, 0.8), compact=True)
+        for tile in range(49):
+            env.reset()
+            env.s = tile
+            obs = env._get_obs()
+            expected = fl_observation_to_premises(obs, dense)
+            for memory in memories:
+                self.assertEqual(fl_observation_to_premises(obs, memory), expected)
+        for memory in memories:
+            memory.clear()
+            self.assertFalse(memory.to_array().any())
+
+    def test_sparse_agent_matches_dense_agent(self):
+        np.random.seed(6)
+        desc = generate_random_map(6, 0.8)
+        dense, sparse = FrozenLakeAgent(6, 0.1, 0.9, 0.1, full=True), FrozenLakeSparseAgent(6, 0.1, 0.9, 0.1, full=True)
+        full_env, compact_env = FrozenLakeEnv(desc), FrozenLakeEnv(desc, compact=True)
+        for _ in range(20):
+            state, compact_state = np.copy(full_env.reset()), np.copy(compact_env.reset())
+            done = False
+            while not done:
+                action = dense.select_action(state, is_greedy=True)
+                next_state, reward, done, _ = full_env.step(action)
+                next_compact_state, _, _, _ = compact_env.step(action)
+                next_state, next_compact_state = np.copy(next_state), np.copy(next_compact_state)
+                # Exploration draws random numbers: keep both agents on the same stream.
+                seed = np.random.randint(1 << 30)
+                np.random.seed(seed)
+                dense.learn(state, action, next_state, reward, done)
+                np.random.seed(seed)
+                sparse.learn(compact_state, action, next_compact_state, reward, done)
+                state, compact_state = next_state, next_compact_state
+        np.testing.assert_allclose(sparse.w, dense.w, atol=1e-5)
+
+        hashed = FrozenLakeSparseAgent(64, 0.1, 0.9, 0.1, full=True, hashed_features=100)
+        self.assertEqual(hashed.W_SHAPE, (124, 4))
+        self.assertTrue(np.all(hashed.features(np.array([4095, 0])) < 124))
+
+    def test_trajectory(self):
+        np.random.seed(7)
+        env = new_fl_env(5, 0.8)
+        agent = FLRandomAwareAgent()
+        trajectory = Trajectory(env.desc, capacity=1)
+        _, total_reward, animation_data = run_episode(env, agent, env.reset(), is_learning=False, is_animating=True, recorder=trajectory)
+        self.assertEqual(len(trajectory), len(animation_data))
+        self.assertEqual(trajectory.tile.tolist(), [fl_observation_tile(frame[0]) for frame in animation_data])
+        self.assertEqual(trajectory.t.tolist(), [frame[2] for frame in animation_data])
+        self.assertEqual(trajectory.action[:-1].tolist(), [frame[3] for frame in animation_data[:-1]])
+        self.assertAlmostEqual(trajectory.reward.sum(), total_reward)
+        self.assertIn('Action: None', list(trajectory.frames())[-1])
+
+        with tempfile.TemporaryDirectory() as path:
+            trajectory.save(os.path.join(path, 'run.npz'))
+            loaded = Trajectory.load(os.path.join(path, 'run.npz'))
+        np.testing.assert_array_equal(loaded.tile, trajectory.tile)
+        np.testing.assert_array_equal(loaded.desc, env.desc)
+        self.assertEqual(loaded.render_ansi(0), trajectory.render_ansi(0))
+
+    def test_neighbour_table_matches_get_neighbours(self):
+        np.random.seed(1)
+        for map_size in (2, 4, 7):
+            env = wrapper_env(generate_random_map(map_size, 0.7), True)
+            env.reset()
+            for s in range(map_size * map_size):
+                neighbours = FrozenLakeNeighboursObservationWrapper.get_neighbours(env.desc, s)
+                expected = np.concatenate([np.isin(neighbours, ['F', 'S', 'G']), neighbours == 'H', neighbours == '0'])
+                env.unwrapped.s = s
+                obs = env.env.observation(None)
+                np.testing.assert_array_equal(obs[:24], expected)
+                self.assertEqual(np.flatnonzero(obs[24:]).tolist(), [s])
+
+    def test_vec_env_time_limit(self):
+        # Walking in circles around a 2x2 square only ends at the time limit.
+        desc = ['SFF', 'FFF', 'FFG']
+        env, vec_env, fused = wrapper_env(desc, True), FrozenLakeVecEnv([desc]), FrozenLakeEnv(desc)
+        env.reset()
+        vec_env.reset()
+        fused.reset()
+        for t in range(100):
+            action = [2, 1, 0, 3][t % 4]
+            _, reward, done, _ = env.step(action)
+            _, rewards, dones, _ = vec_env.step([action])
+            _, fused_reward, fused_done, _ = fused.step(action)
+            self.assertEqual((rewards[0], dones[0]), (reward, done))
+            self.assertEqual((fused_reward, fused_done), (reward, done))
+        self.assertTrue(dones[0])
+        self.assertEqual(vec_env.elapsed_steps[0], 100)
+
+    def test_map_bank(self):
+        with tempfile.TemporaryDirectory() as path:
+            bank = MapBank.build(path, 300, map_size=6, p=0.6, seed=3, only_solvable=False, batch_size=128)
+            for i in range(len(bank)):
+                board = np.array([list(row) for row in bank.desc(i)])
+                self.assertEqual(bank.index['solvable'][i], is_valid(board, 6))
+                self.assertAlmostEqual(bank.index['hole_density'][i], np.mean(board == 'H'))
+            # Without obstacles, the shortest path has 2 * (6 - 1) moves.
+            self.assertEqual(shortest_paths(np.zeros((1, 6, 6), dtype=bool)).tolist(), [10])
+            self.assertTrue(bank.filter(solvable=False).size > 0)
+            np.testing.assert_array_equal(bank.tiles(np.arange(5)), np.stack([bank.tiles(i) for i in range(5)]))
+
+            solvable = MapBank.build(os.path.join(path, 'solvable'), 50, map_size=6, p=0.6, seed=3)
+            self.assertTrue(solvable.index['solvable'].all())
+            indices, strata = solvable.stratified_sample(5, bins=2, rng=np.random.default_rng(0))
+            self.assertTrue(np.all(solvable.index['shortest_path'][indices[strata == 0]] < solvable.index['shortest_path'][indices[strata == 1]].min()))
+            # The same parameters produce the same bank.
+            again = MapBank.build(os.path.join(path, 'again'), 50, map_size=6, p=0.6, seed=3)
+            np.testing.assert_array_equal(again.holes, solvable.holes)
+
+if __name__ == '__main__':
+    unittest.main()
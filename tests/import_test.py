@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Modules imported by the training path (headless rollout workers).
+TRAINING_MODULES = [
+    'utils',
+    'agents.co_aa_agent',
+    'agents.frozen_lake_agent',
+    'environments.co_aa.co_aa',
+    'environments.frozen_lake.frozen_lake',
+    'argumentation.classes',
+    'argumentation.utils',
+    'argumentation.policy',
+    'argumentation.semantics',
+    'argumentation.rules',
+    'environments.frozen_lake.vec_env',
+    'environments.frozen_lake.evaluation',
+    'environments.co_aa.rollout_pool',
+    'environments.co_aa.solvers',
+]
+# Plotting, animation, notebook and graph-drawing dependencies must only be loaded when rendering.
+HEAVY_MODULES = ['matplotlib', 'networkx', 'IPython', 'pandas', 'seaborn']
+# Budget (in seconds) for importing the training path in a fresh interpreter. The default is generous, so that it only
+# catches regressions such as eager heavy imports on loaded CI machines. Set RLAA_IMPORT_BUDGET to tighten it (e.g., 2).
+IMPORT_BUDGET = float(os.environ.get('RLAA_IMPORT_BUDGET', 10))
+
+class Test(unittest.TestCase):
+    def test_headless_imports(self):
+        code = '\n'.join([
+            'import sys, time, warnings',
+            'warnings.filterwarnings("ignore")',
+            'start = time.perf_counter()',
+        ] + ['import {}'.format(module) for module in TRAINING_MODULES] + [
+            'print(time.perf_counter() - start)',
+            'print(" ".join(m for m in {!r} if m in sys.modules))'.format(HEAVY_MODULES),
+        ])
+        out = subprocess.run([sys.executable, '-c', code], cwd=SRC, capture_output=True, text=True, check=True).stdout.splitlines()
+        elapsed, loaded = float(out[0]), out[1].split()
+        self.assertEqual(loaded, [])
+        self.assertLess(elapsed, IMPORT_BUDGET)
+
+if __name__ == '__main__':
+    unittest.main()
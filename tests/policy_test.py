@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from src.argumentation.classes import ValuebasedArgumentationFramework
+from src.argumentation.semantics import grounded_extension
+from src.argumentation.policy import CompiledPolicy, compile_policy, NO_EXTENSION
+from src.argumentation.utils import construct_all_attacks
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.arg_actions = {'U': 3, 'L': 0, 'R': 2, 'D': 1, 'nU': 3, 'nL': 0, 'nR': 2, 'nD': 1}
+        args = list(self.arg_actions)
+        self.vaf = ValuebasedArgumentationFramework(args, construct_all_attacks(self.arg_actions), ['nR', 'nD', 'R', 'D', 'nL', 'nU', 'L', 'U'])
+        rng = np.random.default_rng(0)
+        self.valid = rng.random((200, len(args))) < 0.4
+
+    def expected_actions(self):
+        actions = []
+        for valid in self.valid:
+            ext = grounded_extension(self.vaf, valid)
+            actions.append(self.arg_actions[ext[0]] if len(ext) else NO_EXTENSION)
+        return actions
+
+    def test_compiled_forms(self):
+        expected = self.expected_actions()
+        for max_table_args in (16, 0):
+            policy = compile_policy(self.vaf, self.arg_actions, max_table_args)
+            self.assertEqual(policy.kind, 'table' if max_table_args else 'priority')
+            self.assertEqual(expected, [policy.lookup(valid) for valid in self.valid])
+            self.assertEqual(expected, policy.lookup_batch(self.valid).tolist())
+
+        # Without a total order, the defeats are used.
+        self.vaf.order = ['nR', 'nD']
+        policy = compile_policy(self.vaf, self.arg_actions, 0)
+        self.assertEqual(policy.kind, 'defeats')
+        self.assertEqual(self.expected_actions(), policy.lookup_batch(self.valid).tolist())
+
+    def test_save_load(self):
+        policy = compile_policy(self.vaf, self.arg_actions)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'policy.npz')
+            policy.save(path)
+            loaded = CompiledPolicy.load(path)
+        self.assertEqual(policy.args, loaded.args)
+        np.testing.assert_array_equal(policy.lookup_batch(self.valid), loaded.lookup_batch(self.valid))
+
+if __name__ == '__main__':
+    unittest.main()
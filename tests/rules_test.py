@@ -0,0 +1,46 @@
+import unittest
+import numpy as np
+from src.argumentation.rules import compile_rules
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.rules = compile_rules({
+            'U': ['safe_up'],
+            'nU': ['safe_up', '~visited_up'],
+            'D': ['safe_down'],
+            'x': [],
+        }, ['safe_up', 'visited_up', 'safe_down'])
+
+    def test_evaluate(self):
+        self.assertEqual(self.rules({'safe_up': True, 'visited_up': False}), ['U', 'nU', 'x'])
+        self.assertEqual(self.rules({'safe_up': True, 'visited_up': True, 'safe_down': True}), ['U', 'D', 'x'])
+        # Batches of premise vectors are evaluated at once.
+        premises = np.array([[bool(bits >> i & 1) for i in range(3)] for bits in range(8)])
+        valid = self.rules.evaluate(premises)
+        self.assertEqual(valid.shape, (8, 4))
+        for row in range(8):
+            np.testing.assert_array_equal(valid[row], self.rules.evaluate(premises[row]))
+        np.testing.assert_array_equal(valid[:, 1], premises[:, 0] & ~premises[:, 1])
+
+    def test_mask(self):
+        args = ['D', 'y', 'nU']
+        np.testing.assert_array_equal(self.rules.mask({'safe_up': True, 'safe_down': True}, args), [True, False, True])
+
+    def test_implications(self):
+        implies = self.rules.implications(['U', 'nU', 'D', 'x', 'missing'])
+        # nU is only valid when U is, x is always valid and missing never is.
+        self.assertTrue(implies[1, 0] and not implies[0, 1])
+        np.testing.assert_array_equal(implies[:, 3], [True] * 5)
+        np.testing.assert_array_equal(implies[4], [True] * 5)
+        np.testing.assert_array_equal(implies[:4, 4], [False] * 4)
+        self.assertFalse(implies[0, 2] or implies[2, 0])
+
+    def test_many_premises(self):
+        # With more than 63 premises, the rules are checked on Boolean matrices.
+        premises = ['p{}'.format(i) for i in range(70)]
+        rules = compile_rules({'a': ['p0', '~p69'], 'b': ['p69']}, premises)
+        self.assertEqual(rules({'p0': True}), ['a'])
+        self.assertEqual(rules({'p0': True, 'p69': True}), ['b'])
+
+if __name__ == '__main__':
+    unittest.main()
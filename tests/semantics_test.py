@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+from src.argumentation.classes import ArgumentationFramework, ValuebasedArgumentationFramework
+from src.argumentation.semantics import grounded_mask, grounded_extension, complete_extensions, preferred_extensions, stable_extensions
+
+def as_sets(exts):
+    return sorted(map(frozenset, exts), key=sorted)
+
+class Test(unittest.TestCase):
+    def test_chain(self):
+        af = ArgumentationFramework(['a', 'b', 'c'], [('a', 'b'), ('b', 'c')])
+        self.assertEqual(grounded_extension(af), ['a', 'c'])
+        self.assertEqual(as_sets(complete_extensions(af)), as_sets([['a', 'c']]))
+        self.assertEqual(as_sets(stable_extensions(af)), as_sets([['a', 'c']]))
+
+    def test_mutual_attack(self):
+        af = ArgumentationFramework(['a', 'b', 'c'], [('a', 'b'), ('b', 'a'), ('b', 'c')])
+        self.assertEqual(grounded_extension(af), [])
+        self.assertEqual(as_sets(complete_extensions(af)), as_sets([[], ['a', 'c'], ['b']]))
+        self.assertEqual(as_sets(preferred_extensions(af)), as_sets([['a', 'c'], ['b']]))
+        self.assertEqual(as_sets(stable_extensions(af)), as_sets([['a', 'c'], ['b']]))
+
+    def test_odd_cycle(self):
+        af = ArgumentationFramework(['a', 'b', 'c', 'd'], [('a', 'b'), ('b', 'c'), ('c', 'a'), ('c', 'd')])
+        self.assertEqual(as_sets(complete_extensions(af)), as_sets([[]]))
+        self.assertEqual(as_sets(preferred_extensions(af)), as_sets([[]]))
+        self.assertEqual(stable_extensions(af), [])
+
+    def test_vaf_and_batch(self):
+        vaf = ValuebasedArgumentationFramework(['a', 'b', 'c'], [('a', 'b'), ('b', 'a'), ('b', 'c')], ['b', 'a', 'c'])
+        self.assertEqual(grounded_extension(vaf), ['b'])
+
+        active = np.array([
+            [True, True, True],
+            [True, False, True],
+            [False, False, False],
+        ])
+        expected = np.array([
+            [False, True, False],
+            [True, False, True],
+            [False, False, False],
+        ])
+        np.testing.assert_array_equal(expected, grounded_mask(vaf.defeats, active))
+        self.assertEqual(grounded_extension(vaf, active[1]), ['a', 'c'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import tracemalloc
+import unittest
+import numpy as np
+from src.argumentation.classes import ArgumentationFramework, ValuebasedArgumentationFramework
+from src.argumentation.serialization import save_af, load_af, read_apx, write_apx, read_tgf, write_tgf
+from src.argumentation.utils import construct_all_attacks
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        arg_actions = {'U': 3, 'L': 0, 'R': 2, 'D': 1, 'nU': 3, 'nL': 0, 'nR': 2, 'nD': 1, 'pu1-D': 1}
+        self.vaf = ValuebasedArgumentationFramework(list(arg_actions), construct_all_attacks(arg_actions), ['nR', 'nD', 'R', 'D'])
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_binary(self):
+        path = os.path.join(self.tmp.name, 'vaf.af')
+        for packed in (True, False):
+            for mmap in (True, False):
+                save_af(self.vaf, path, packed)
+                vaf = load_af(path, mmap)
+                self.assertIsInstance(vaf, ValuebasedArgumentationFramework)
+                self.assertEqual(self.vaf.args, vaf.args)
+                self.assertEqual(self.vaf.order, vaf.order)
+                np.testing.assert_array_equal(self.vaf.mat, vaf.mat)
+                np.testing.assert_array_equal(self.vaf.defeats, vaf.defeats)
+                del vaf
+
+        af = ArgumentationFramework(['a', 'b'], [('a', 'b')])
+        save_af(af, path)
+        loaded = load_af(path)
+        self.assertNotIsInstance(loaded, ValuebasedArgumentationFramework)
+        self.assertEqual(loaded.atts, [('a', 'b')])
+
+    def test_adopt_adjacency_without_copy(self):
+        n = 2000
+        adjacency = np.zeros((n, n), dtype=bool)
+        adjacency[0, 1] = True
+        args = [str(i) for i in range(n)]
+        tracemalloc.start()
+        af = ArgumentationFramework.from_adjacency(args, adjacency, copy=False)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        # No NxN buffer is allocated (it would take 4 MB).
+        self.assertLess(peak, n * n // 4)
+        self.assertTrue(np.shares_memory(af.mat, adjacency))
+        self.assertEqual(af.atts, [('0', '1')])
+        af.add_attack(('new', '0'))
+        self.assertEqual(af.index('new'), n)
+        self.assertTrue(af.mat[n, 0] and af.mat[0, 1])
+
+    def test_iccma(self):
+        for ext, write, read in (('apx', write_apx, read_apx), ('tgf', write_tgf, read_tgf)):
+            path = os.path.join(self.tmp.name, 'af.' + ext)
+            write(self.vaf, path)
+            af = read(path)
+            self.assertEqual(self.vaf.args, af.args)
+            np.testing.assert_array_equal(self.vaf.mat, af.mat)
+
+if __name__ == '__main__':
+    unittest.main()